@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import etl
+import synth
+from bundle import build_bundle, ensure_bundle, source_files
+from datasets import DatasetCache
+
+# ---------------------------
+# Benchmark : archive « Tout télécharger »
+# ---------------------------
+#
+# Sur data/ (ou des données synthétiques avec --rows) :
+#   construction : durée et taille de l'archive selon le niveau deflate
+#                  (0 = sans compression, 1 = niveau retenu, 6 = défaut zlib, 9) ;
+#   fraîcheur    : coût de ensure_bundle sans changement, après un simple
+#                  touch des sources (SHA-256 recalculé), après modification ;
+#   octets servis : une archive contre un téléchargement par fichier CSV ;
+#   mémoire      : pic Python (tracemalloc, sous-processus distinct) pour N
+#                  sessions gardant chacune leur copie des CSV (avant) ou
+#                  partageant l'archive du cache de fichiers (après).
+#
+#   python -m benchmarks.bench_bundle --rows 5604600 --sessions 30
+
+LEVELS = [0, 1, 6, 9]
+
+
+def measure_memory(mode: str, data_dir: str, bundle: str, sessions: int) -> dict:
+    cache = DatasetCache(max_bytes=2**40)
+    tracemalloc.start()
+    held = []
+    for _ in range(sessions):
+        if mode == "per_session":
+            copies = []
+            for path in source_files(data_dir):
+                with open(path, "rb") as f:
+                    copies.append(f.read())
+            held.append(copies)
+        else:
+            held.append(cache.get(bundle))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mode": mode, "sessions": sessions, "peak_mb": round(peak / 2**20, 1)}
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, help="Données synthétiques (défaut : data/)")
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--measure", nargs=4, metavar=("MODE", "DATA_DIR", "BUNDLE", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, data_dir, bundle, sessions = args.measure
+        print(json.dumps(measure_memory(mode, data_dir, bundle, int(sessions))))
+        return
+
+    data_dir = etl.DATA_DIR
+    if args.rows:
+        data_dir = os.path.join(args.work_dir, f"rows_{args.rows}")
+        if not os.path.exists(os.path.join(data_dir, "synth.json")):
+            synth.generate(data_dir, args.rows)
+    out_dir = os.path.join(args.work_dir, "bundle")
+    os.makedirs(out_dir, exist_ok=True)
+    sources = source_files(data_dir)
+    source_bytes = sum(os.path.getsize(p) for p in sources)
+    print(f"{data_dir} : {len(sources)} fichiers, {source_bytes / 2**20:.1f} Mo")
+
+    for level in LEVELS:
+        m = build_bundle(data_dir, os.path.join(out_dir, f"level_{level}.zip"), level)
+        print(
+            f"  deflate {level} : {m['built_in_s']:7.3f}s {m['bundle_bytes'] / 2**20:8.1f} Mo "
+            f"({m['bundle_bytes'] / source_bytes:.0%})"
+        )
+
+    bundle = os.path.join(out_dir, "adventureworks_data.zip")
+    if os.path.exists(bundle):
+        os.remove(bundle)
+    first = timed(ensure_bundle, data_dir, bundle)
+    fresh = timed(ensure_bundle, data_dir, bundle)
+    for path in sources:
+        os.utime(path)
+    touched = timed(ensure_bundle, data_dir, bundle)
+    again = timed(ensure_bundle, data_dir, bundle)
+    print(
+        f"  ensure_bundle : construction {first:.3f}s, à jour {fresh * 1000:.2f} ms, "
+        f"après touch {touched:.3f}s (SHA-256, sans reconstruction), puis {again * 1000:.2f} ms"
+    )
+
+    bundle_bytes = os.path.getsize(bundle)
+    print(
+        f"  octets servis : archive {bundle_bytes / 2**20:.1f} Mo en 1 téléchargement, "
+        f"CSV séparés {source_bytes / 2**20:.1f} Mo en {len(sources)} téléchargements "
+        f"({1 - bundle_bytes / source_bytes:.0%} économisés)"
+    )
+
+    for mode in ("per_session", "shared"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_bundle", "--measure", mode, data_dir, bundle, str(args.sessions)],
+            check=True, capture_output=True, text=True,
+        )
+        r = json.loads(out.stdout)
+        print(f"  mémoire {r['mode']:11s} : {r['sessions']} sessions, pic {r['peak_mb']:8.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
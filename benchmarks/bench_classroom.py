@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_rerun import WRAPPER
+from benchmarks.mock_github import start_mock_github
+from spool import DONE, FAILED
+
+# ---------------------------
+# Test de charge : toute une promo dépose en même temps
+# ---------------------------
+#
+# L'application tourne sans navigateur (AppTest), une session par
+# étudiant·e, toutes dans un même processus comme sur le serveur Streamlit :
+# le spool et le worker d'envoi sont partagés. Chaque session ouvre l'onglet
+# de dépôt, remplit le formulaire (notebook + rapport distincts par
+# étudiant·e), puis toutes cliquent « Envoyer » au même instant. Le faux
+# GitHub (processus parent) injecte latence, 409 et limites de débit 403.
+# AppTest n'est pas réentrant (st.secrets et le runtime sont globaux, le
+# script est recompilé à chaque rerun) : les reruns passent un par un, comme
+# des reruns concurrents qui se partagent le GIL ; l'accusé compte l'attente.
+# Le worker d'envoi, lui, tourne en parallèle.
+#
+# Mesures :
+#   accusé     : durée du rerun qui suit le clic (réponse vue par l'étudiant·e) ;
+#   bout en bout : mise en file -> commit sur GitHub ;
+#   erreurs    : erreurs affichées, dépôts en échec ou non envoyés à temps,
+#                dépôts ayant dû être retentés ;
+#   mémoire    : RSS du processus de l'application (pic - départ).
+#
+# Pour comparer deux versions du chemin d'envoi :
+#
+#   git show <commit>:etl_epsi.py > /tmp/etl_epsi_old.py
+#   python -m benchmarks.bench_classroom --students 40 --app etl_epsi.py /tmp/etl_epsi_old.py \
+#       --request-latency 0.05 --conflict-rate 0.1 --rate-limit 300 --rate-window 10
+
+CODE_SAMPLE = "submissions/bedja_sanyidat_20251120_151928/code.ipynb"
+REPORT_SAMPLE = "submissions/bedja_sanyidat_20251120_151928/rapport.pdf"
+SUBMIT_LABEL = "Envoyer sur GitHub"
+SUBMIT_TAB = "Dépôt sur GitHub"
+BARRIER_TIMEOUT_S = 300
+
+RUN_LOCK = threading.Lock()
+
+
+def student_files(i: int) -> tuple[tuple[str, bytes, str], tuple[str, bytes, str]]:
+    # Contenus distincts par étudiant·e : aucun blob n'est réutilisé
+    with open(CODE_SAMPLE, encoding="utf-8") as f:
+        nb = json.load(f)
+    nb["cells"].insert(0, {"cell_type": "markdown", "metadata": {}, "source": [f"# TP ETL – étudiant {i}\n"]})
+    with open(REPORT_SAMPLE, "rb") as f:
+        report = f.read() + f"\n% etudiant {i}\n".encode()
+    return (
+        ("code.ipynb", json.dumps(nb).encode(), "application/x-ipynb+json"),
+        ("rapport.pdf", report, "application/pdf"),
+    )
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0], "max": values[0]}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(q[49], 4), "p95": round(q[94], 4), "p99": round(q[98], 4), "max": round(max(values), 4)}
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline = rss_mb()
+        self.peak = self.baseline
+        self.stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self._thread.join()
+
+
+def spool_rows(spool_dir: str, ids: list[int]) -> list[dict]:
+    # Lecture seule : ouvrir un SubmissionSpool remettrait en file les envois en cours
+    if not ids:
+        return []
+    conn = sqlite3.connect(f"file:{os.path.join(spool_dir, 'spool.sqlite3')}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            f"SELECT id, status, attempts, created_at, updated_at FROM submissions "
+            f"WHERE id IN ({','.join('?' * len(ids))})",
+            ids,
+        )
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def new_session(script: str, secrets: dict) -> AppTest:
+    at = AppTest.from_file(script, default_timeout=300)
+    for key, value in secrets.items():
+        at.secrets[key] = value
+    return at
+
+
+def student(i: int, script: str, secrets: dict, start: threading.Barrier) -> dict:
+    try:
+        code, report = student_files(i)
+        at = new_session(script, secrets)
+        at.session_state["active_tab"] = SUBMIT_TAB
+        with RUN_LOCK:
+            at.run()
+        at.text_input[0].input(f"Etudiant {i}")
+        at.text_input[1].input("ECYB I1")
+        at.file_uploader[0].set_value(code)
+        at.file_uploader[1].set_value(report)
+        at.checkbox[-1].check()
+        submit = next(b for b in at.button if b.label == SUBMIT_LABEL)
+        at.session_state["active_tab"] = SUBMIT_TAB
+    except Exception as e:
+        # Session inutilisable : comptée en erreur, sans bloquer les autres
+        start.wait(BARRIER_TIMEOUT_S)
+        return {"ack_s": None, "script_ms": None, "errors": [f"préparation : {e!r}"], "submission_id": None}
+    start.wait(BARRIER_TIMEOUT_S)
+    began = time.perf_counter()
+    with RUN_LOCK:
+        submit.click().run()
+    ack = time.perf_counter() - began
+    errors = [e.value for e in at.error] + [str(e.value) for e in at.exception]
+    ids = at.session_state["submission_ids"] if "submission_ids" in at.session_state else []
+    if not ids and not errors:
+        errors = ["aucun dépôt enregistré"]
+    return {
+        "ack_s": ack,
+        "script_ms": at.session_state["_bench_script_ms"],
+        "errors": errors,
+        "submission_id": ids[-1] if ids else None,
+    }
+
+
+def measure(app: str, api_url: str, students: int, timeout: float) -> dict:
+    work = tempfile.mkdtemp(prefix="classroom_")
+    script = os.path.join(work, "app.py")
+    with open(script, "w") as f:
+        f.write(WRAPPER.format(app=os.path.abspath(app)))
+    secrets = {
+        "GITHUB_TOKEN": "x",
+        "GITHUB_API_URL": api_url,
+        "SPOOL_DIR": os.path.join(work, "spool"),
+        "METRICS_PATH": os.path.join(work, "metrics.prom"),
+        "METRICS_HISTORY_DIR": os.path.join(work, "history"),
+    }
+    try:
+        # Premier rendu hors mesure : imports, caches et worker d'envoi démarrés
+        with RUN_LOCK:
+            new_session(script, secrets).run()
+        with RssSampler() as memory:
+            start = threading.Barrier(students)
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=students) as pool:
+                results = list(pool.map(lambda i: student(i, script, secrets, start), range(students)))
+            ids = [r["submission_id"] for r in results if r["submission_id"] is not None]
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                rows = spool_rows(secrets["SPOOL_DIR"], ids)
+                if all(r["status"] in (DONE, FAILED) for r in rows):
+                    break
+                time.sleep(0.1)
+            drained = time.perf_counter() - t0
+        rows = spool_rows(secrets["SPOOL_DIR"], ids)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    done = [r for r in rows if r["status"] == DONE]
+    return {
+        "app": app,
+        "students": students,
+        "ack_s": percentiles([r["ack_s"] for r in results if r["ack_s"] is not None]),
+        "script_ms": percentiles([r["script_ms"] for r in results if r["script_ms"] is not None]),
+        "end_to_end_s": percentiles([r["updated_at"] - r["created_at"] for r in done]),
+        "drain_s": round(drained, 3),
+        "app_errors": sum(bool(r["errors"]) for r in results),
+        "error_examples": [e for r in results for e in r["errors"]][:3],
+        "done": len(done),
+        "failed": sum(r["status"] == FAILED for r in rows),
+        "pending": sum(r["status"] not in (DONE, FAILED) for r in rows),
+        "retried": sum(r["attempts"] > 1 for r in rows),
+        "rss_mb": round(memory.peak - memory.baseline, 1),
+    }
+
+
+def rate(count: int, total: int) -> str:
+    return f"{count} ({count / max(total, 1):.0%})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", nargs="+", default=["etl_epsi.py"])
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Attente maximale de fin des envois (s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fenêtre de course des mises à jour de branche (s)")
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--conflict-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requêtes par fenêtre (0 : illimité)")
+    parser.add_argument("--rate-window", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Résultats en JSON (une ligne par version de l'application)")
+    parser.add_argument("--measure", nargs=4, metavar=("APP", "URL", "STUDENTS", "TIMEOUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        app, url, students, timeout = args.measure
+        print(json.dumps(measure(app, url, int(students), float(timeout))))
+        return
+
+    for app in args.app:
+        # Un faux GitHub neuf et un processus d'application par version
+        server, state, api_url = start_mock_github(
+            latency=args.latency, request_latency=args.request_latency, jitter=args.jitter,
+            conflict_rate=args.conflict_rate, rate_limit=args.rate_limit, rate_window=args.rate_window,
+            seed=args.seed,
+        )
+        try:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_classroom", "--measure",
+                 app, api_url, str(args.students), str(args.timeout)],
+                check=True, capture_output=True, text=True,
+            )
+        finally:
+            server.shutdown()
+        r = {**json.loads(out.stdout.strip().splitlines()[-1]), "github": dict(state.stats)}
+        n = r["students"]
+        print(f"{app} : {n} dépôts simultanés, envois terminés en {r['drain_s']:.2f}s")
+        for name, unit in [("ack_s", "s"), ("end_to_end_s", "s"), ("script_ms", "ms")]:
+            p = r[name]
+            if p["p50"] is not None:
+                print(f"  {name:13s} p50={p['p50']:.3f}{unit} p95={p['p95']:.3f}{unit} p99={p['p99']:.3f}{unit} max={p['max']:.3f}{unit}")
+        print(
+            f"  erreurs affichées={rate(r['app_errors'], n)} échecs={rate(r['failed'], n)} "
+            f"non envoyés={rate(r['pending'], n)} retentés={rate(r['retried'], n)} "
+            f"RSS +{r['rss_mb']} Mo"
+        )
+        g = r["github"]
+        print(
+            f"  GitHub : {g['requests']} requêtes, {g['commits']} commits, conflits={g['conflicts']} "
+            f"409 injectés={g['injected_conflicts']} 403 limite={g['rate_limited']}"
+        )
+        for example in r["error_examples"]:
+            print(f"  ! {example}")
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(r) + "\n")
+
+
+if __name__ == "__main__":
+    main()
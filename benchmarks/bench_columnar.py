@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+import pyarrow.compute as pc
+
+import columnar
+import etl
+import synth
+
+# ---------------------------
+# Benchmark : CSV contre copie colonnaire (Arrow projeté en mémoire)
+# ---------------------------
+#
+# Charge toutes les années de ventes et le référentiel clients avec les
+# types de etl.py, selon quatre modes, chacun dans un processus séparé :
+#   csv         : pd.read_csv (analyse du texte à chaque chargement) ;
+#   arrow_build : premier chargement via columnar (lecture CSV + écriture) ;
+#   arrow_read  : chargements suivants, DataFrame pandas depuis la copie ;
+#   arrow_mmap  : table Arrow projetée, sans copie, + un agrégat dessus.
+# Mémoire : pic de RSS au-delà du processus après imports ; « privée » exclut
+# les pages du fichier projeté (partagées, rendues au noyau sans écriture) :
+# c'est ce qui a réellement été copié.
+#
+#   python -m benchmarks.bench_columnar --scales 1 100
+
+MODES = ["csv", "arrow_build", "arrow_read", "arrow_mmap"]
+
+
+def workload(data_dir: str) -> list[tuple[str, dict]]:
+    files = [(p, {"dtype": etl.SALES_DTYPES, "parse_dates": etl.SALES_DATES}) for p in etl.sales_files(data_dir)]
+    files.append((
+        os.path.join(data_dir, etl.CUSTOMER_FILE),
+        {"dtype": etl.CUSTOMER_DTYPES, "parse_dates": etl.CUSTOMER_DATES, "encoding": etl.LOOKUP_ENCODING},
+    ))
+    return files
+
+
+def rss_mb(private: bool = False) -> float:
+    # statm : pages résidentes, dont pages adossées à un fichier
+    with open("/proc/self/statm") as f:
+        resident, shared = map(int, f.read().split()[1:3])
+    return (resident - shared if private else resident) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def measure(mode: str, data_dir: str) -> dict:
+    files = workload(data_dir)
+    if mode == "arrow_build":
+        for path, kwargs in files:
+            target = columnar.arrow_path(path, kwargs)
+            if os.path.exists(target):
+                os.remove(target)
+    baseline, private_baseline = rss_mb(), rss_mb(private=True)
+    start = time.perf_counter()
+    rows = 0
+    kept = []
+    for path, kwargs in files:
+        if mode == "csv":
+            df = pd.read_csv(path, **kwargs)
+        elif mode == "arrow_mmap":
+            df = columnar.open_table(path, **kwargs)
+            if "OrderQuantity" in df.column_names:
+                pc.sum(df["OrderQuantity"])
+        else:
+            df = columnar.read_csv(path, **kwargs)
+        rows += len(df)
+        kept.append(df)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "mode": mode,
+        "rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "rss_mb": round(rss_mb() - baseline, 1),
+        "private_mb": round(rss_mb(private=True) - private_baseline, 1),
+        "peak_mb": round(peak - baseline, 1),
+        "csv_mb": round(sum(os.path.getsize(p) for p, _ in files) / 2**20, 1),
+        "arrow_mb": round(sum(
+            os.path.getsize(columnar.arrow_path(p, k)) for p, k in files
+            if os.path.exists(columnar.arrow_path(p, k))
+        ) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    base_rows = sum(len(etl.extract_sales(p)) for p in etl.sales_files(etl.DATA_DIR))
+    for scale in args.scales:
+        if scale == 1:
+            data_dir = etl.DATA_DIR
+        else:
+            rows = base_rows * scale
+            data_dir = os.path.join(args.work_dir, f"rows_{rows}")
+            if not os.path.exists(os.path.join(data_dir, "synth.json")):
+                synth.generate(data_dir, rows, chunk_rows=args.chunk_rows)
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_columnar", "--measure", mode, data_dir],
+                check=True, capture_output=True, text=True,
+            )
+            r = json.loads(out.stdout)
+            print(
+                f"x{scale:<4d} {r['mode']:12s} {r['rows']:>10,d} lignes "
+                f"durée={r['elapsed_s']:7.3f}s RSS={r['rss_mb']:8.1f} Mo privée={r['private_mb']:8.1f} Mo "
+                f"pic={r['peak_mb']:8.1f} Mo "
+                f"(csv {r['csv_mb']} Mo, arrow {r['arrow_mb']} Mo)"
+            )
+
+
+if __name__ == "__main__":
+    main()
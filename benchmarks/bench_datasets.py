@@ -0,0 +1,94 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from datasets import DatasetCache
+
+# ---------------------------
+# Benchmark : service des fichiers de l'onglet « Jeux de données »
+# ---------------------------
+#
+# Simule N sessions Streamlit qui relancent le script en boucle. Chaque
+# session garde une référence aux octets servis, comme le fait Streamlit
+# jusqu'au rerun suivant. Chaque mode tourne dans son propre processus pour
+# que la mesure de RSS soit isolée.
+#
+#   python -m benchmarks.bench_datasets --sessions 50 --reruns 20
+
+DATA_PATHS = [
+    "data/AdventureWorks Sales Data 2020.csv",
+    "data/AdventureWorks Customer Lookup.csv",
+    "data/AdventureWorks Product Lookup.csv",
+    "data/AdventureWorks Territory Lookup.csv",
+]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_mode(mode: str, sessions: int, reruns: int):
+    cache = DatasetCache()
+
+    def read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    serve = cache.get if mode == "cache" else read_file
+    held: list[list[bytes]] = [[] for _ in range(sessions)]
+    timings: list[float] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session(i: int):
+        barrier.wait()
+        for _ in range(reruns):
+            start = time.perf_counter()
+            held[i] = [serve(path) for path in DATA_PATHS]
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings.append(elapsed)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    timings.sort()
+    print(
+        f"{mode:8s} sessions={sessions} reruns={reruns} "
+        f"rerun moyen={statistics.mean(timings) * 1000:.2f}ms "
+        f"p95={timings[int(len(timings) * 0.95)] * 1000:.2f}ms "
+        f"RSS={rss_mb():.1f}Mo lectures disque="
+        f"{cache.stats['misses'] if mode == 'cache' else len(timings) * len(DATA_PATHS)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--mode", choices=["read", "cache"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.sessions, args.reruns)
+        return
+    for mode in ("read", "cache"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_datasets", "--mode", mode,
+             "--sessions", str(args.sessions), "--reruns", str(args.reruns)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import etl
+
+# ---------------------------
+# Benchmark : pipeline ETL de référence vs version « naïve »
+# ---------------------------
+#
+# La version naïve reprend les motifs vus dans les soumissions : tout en
+# object, to_numeric colonne par colonne dans une boucle, merges chaînés
+# avec conversion de la clé territoire au dernier moment.
+# Chaque mode tourne dans un processus séparé (pic de RSS isolé).
+#
+#   python -m benchmarks.bench_etl --years 2020 2021 2022 --repeat 10
+
+
+def naive_pipeline(sales: pd.DataFrame, data_dir: str) -> pd.DataFrame:
+    customers = pd.read_csv(
+        os.path.join(data_dir, etl.CUSTOMER_FILE), dtype=str, encoding=etl.LOOKUP_ENCODING
+    )
+    products = pd.read_csv(os.path.join(data_dir, etl.PRODUCT_FILE), dtype=str)
+    territories = pd.read_csv(os.path.join(data_dir, etl.TERRITORY_FILE), dtype=str)
+    sales = sales.astype(str)
+    for col in ["ProductKey", "CustomerKey", "TerritoryKey", "OrderLineItem", "OrderQuantity"]:
+        sales[col] = sales[col].apply(lambda v: pd.to_numeric(v, errors="coerce"))
+    for col in ["ProductCost", "ProductPrice", "ProductKey"]:
+        products[col] = products[col].apply(lambda v: pd.to_numeric(v, errors="coerce"))
+    customers["CustomerKey"] = pd.to_numeric(customers["CustomerKey"], errors="coerce")
+    sales["OrderDate"] = pd.to_datetime(sales["OrderDate"])
+    sales = sales[sales["OrderQuantity"] > 0].drop_duplicates(etl.SALES_KEY)
+    df = sales.merge(customers, on="CustomerKey", how="inner")
+    df = df.merge(products, on="ProductKey", how="inner")
+    territories["SalesTerritoryKey"] = territories["SalesTerritoryKey"].astype(int)
+    df = df.merge(territories, left_on="TerritoryKey", right_on="SalesTerritoryKey", how="inner")
+    df["OrderYear"] = df["OrderDate"].dt.year
+    df["LineTotal"] = df["OrderQuantity"] * df["ProductPrice"]
+    df["Margin"] = df["LineTotal"] - df["OrderQuantity"] * df["ProductCost"]
+    return df
+
+
+def run_mode(mode: str, years: list[int], repeat: int, data_dir: str):
+    paths = [os.path.join(data_dir, etl.SALES_FILE.format(year=y)) for y in years]
+    start = time.perf_counter()
+    if mode == "reference":
+        lookups = etl.extract_lookups(data_dir)
+        sales = pd.concat([etl.extract_sales(p) for p in paths] * repeat, ignore_index=True)
+        df = etl.transform(sales, lookups)
+    else:
+        sales = pd.concat([pd.read_csv(p, dtype=str) for p in paths] * repeat, ignore_index=True)
+        df = naive_pipeline(sales, data_dir)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{mode:9s} lignes={len(sales):>9d} durée={elapsed:.2f}s "
+        f"débit={len(sales) / elapsed:,.0f} lignes/s pic RSS={peak_mb:.0f}Mo "
+        f"mémoire table={df.memory_usage(deep=True).sum() / 2**20:.0f}Mo"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[2020, 2021, 2022])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--mode", choices=["naive", "reference"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.years, args.repeat, args.data_dir)
+        return
+    for mode in ("naive", "reference"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_etl", "--mode", mode,
+             "--repeat", str(args.repeat), "--data-dir", args.data_dir,
+             "--years", *map(str, args.years)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
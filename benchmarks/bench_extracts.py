@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import date
+
+import etl
+import synth
+from catalog import CATALOG
+from extracts import ExtractCache, ExtractFilter, ensure_layout, full_scan
+
+# ---------------------------
+# Benchmark : extrait filtré contre relecture complète des CSV
+# ---------------------------
+#
+# Quatre extraits types (un territoire sur un mois, une catégorie sur une
+# année, trois colonnes sur tout l'historique, filtres combinés sur un
+# trimestre), chacun produit en CSV selon trois modes, un processus par mode :
+#   csv_scan  : référence, chaque CSV relu en entier puis filtré en pandas ;
+#   extract   : extracts.ExtractCache, copies triées déjà construites, cache
+#               des extraits vide (élagage années / groupes / colonnes) ;
+#   cached    : même extrait redemandé (signature déjà sur disque).
+# La construction des copies triées est mesurée à part (mode layout).
+#
+#   python -m benchmarks.bench_extracts --scales 1 100
+
+MODES = ["layout", "csv_scan", "extract", "cached"]
+RESULTS = "bench_extracts_results.jsonl"
+
+
+def scenarios(data_dir: str) -> dict[str, ExtractFilter]:
+    # Dernière année : toutes les catégories y sont vendues
+    year = max(CATALOG["sales"].partitions(data_dir))
+    return {
+        "territoire_mois": ExtractFilter(date(year, 3, 1), date(year, 3, 31), ["Northwest"]),
+        "categorie_annee": ExtractFilter(date(year, 1, 1), date(year, 12, 31), categories=["Bikes"]),
+        "colonnes": ExtractFilter(columns=["OrderDate", "ProductKey", "OrderQuantity"]),
+        "combine": ExtractFilter(
+            date(year, 4, 1), date(year, 6, 30), ["France", "Germany"], ["Accessories"],
+            ["OrderDate", "OrderNumber", "ProductKey", "CustomerKey", "OrderQuantity"],
+        ),
+    }
+
+
+def measure(mode: str, data_dir: str, root: str) -> list[dict]:
+    results = []
+    if mode == "layout":
+        shutil.rmtree(root, ignore_errors=True)
+        start = time.perf_counter()
+        layouts = ensure_layout(data_dir, root)
+        results.append({
+            "scenario": "-",
+            "elapsed_s": round(time.perf_counter() - start, 3),
+            "layout_mb": round(sum(os.path.getsize(p) for p in layouts.values()) / 2**20, 1),
+        })
+    else:
+        ensure_layout(data_dir, root)
+        shutil.rmtree(os.path.join(root, "cache"), ignore_errors=True)
+        cache = ExtractCache(root, data_dir)
+        for name, extract_filter in scenarios(data_dir).items():
+            if mode == "cached":
+                cache.get(extract_filter)
+            start = time.perf_counter()
+            if mode == "csv_scan":
+                df = full_scan(extract_filter, data_dir)
+                rows, size = len(df), len(df.to_csv(index=False).encode())
+                info = {}
+            else:
+                path, info = cache.get(extract_filter)
+                rows, size = info["rows"], os.path.getsize(path)
+            results.append({
+                "scenario": name,
+                "elapsed_s": round(time.perf_counter() - start, 4),
+                "rows": rows,
+                "csv_mb": round(size / 2**20, 2),
+                "row_groups_read": info.get("row_groups_read"),
+                "row_groups": info.get("row_groups"),
+            })
+    peak = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return [{"mode": mode, **r, "peak_rss_mb": peak} for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "DATA_DIR", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    base_rows = sum(len(etl.extract_sales(p)) for p in etl.sales_files(etl.DATA_DIR))
+    for scale in args.scales:
+        if scale == 1:
+            data_dir = etl.DATA_DIR
+        else:
+            data_dir = os.path.join(args.work_dir, f"rows_{base_rows * scale}")
+            if not os.path.exists(os.path.join(data_dir, "synth.json")):
+                synth.generate(data_dir, base_rows * scale)
+        root = os.path.join(args.work_dir, f"extracts_{scale}")
+        baseline = {}
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_extracts", "--measure", mode, data_dir, root],
+                check=True, capture_output=True, text=True,
+            )
+            for r in json.loads(out.stdout.strip().splitlines()[-1]):
+                r = {"scale": scale, **r}
+                with open(args.output, "a") as f:
+                    f.write(json.dumps(r) + "\n")
+                if mode == "layout":
+                    print(f"x{scale:<4d} layout   copies triées {r['layout_mb']:.1f} Mo en {r['elapsed_s']:.2f}s")
+                    continue
+                if mode == "csv_scan":
+                    baseline[r["scenario"]] = r
+                versus = ""
+                if r["scenario"] in baseline and mode != "csv_scan":
+                    ref = baseline[r["scenario"]]
+                    if ref["rows"] != r["rows"]:
+                        versus += f" ÉCART {ref['rows']:,d} lignes attendues"
+                    versus += f" x{ref['elapsed_s'] / max(r['elapsed_s'], 1e-4):.1f}"
+                groups = f" groupes {r['row_groups_read']}/{r['row_groups']}" if r["row_groups"] else ""
+                print(
+                    f"x{scale:<4d} {mode:8s} {r['scenario']:16s} {r['rows']:>10,d} lignes "
+                    f"{r['csv_mb']:7.2f} Mo {r['elapsed_s']:8.4f}s{groups}{versus}, pic RSS {r['peak_rss_mb']:.0f} Mo"
+                )
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+import etl
+import synth
+from catalog import CATALOG
+from incremental import IncrementalLoad
+
+# ---------------------------
+# Benchmark : ETL incrémental contre retraitement complet
+# ---------------------------
+#
+# Sur une copie des données synthétiques :
+#   initial  : premier chargement de la table intégrée (IncrementalLoad) ;
+#   jour N   : --rows-per-day nouvelles lignes ajoutées au dernier fichier
+#              de ventes, puis refresh (ne lit que les octets ajoutés) ;
+#   référentiel : prénom modifié pour --changed-customers clients, puis
+#              refresh (seules leurs ventes sont réenrichies) ;
+#   complet  : ce que fait le pipeline aujourd'hui, etl.run_pipeline sur
+#              tout l'historique puis etl.load_sqlite (tout en mémoire :
+#              sauté au-delà de --full-max-rows).
+#
+#   python -m benchmarks.bench_incremental --rows 5604600 --days 5 --rows-per-day 10000
+
+RESULTS = "bench_incremental_results.jsonl"
+
+
+def append_day(path: str, day: int, rows: int):
+    # Nouvelles commandes datées du lendemain de la dernière date du fichier
+    sample = pd.read_csv(path, nrows=rows, dtype={"OrderNumber": "string"})
+    with open(path, "rb") as f:
+        newline = "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+    year = int(os.path.basename(path).rsplit(" ", 1)[1].split(".")[0])
+    sample["OrderNumber"] = f"SOJ{day}-" + sample["OrderNumber"].str[2:]
+    sample["OrderDate"] = (pd.Timestamp(f"{year}-12-31") + pd.Timedelta(days=day)).strftime("%Y-%m-%d")
+    with open(path, "a", newline="") as f:
+        sample.to_csv(f, header=False, index=False, lineterminator=newline)
+
+
+def change_customers(path: str, count: int):
+    df = pd.read_csv(path, dtype=str, encoding=etl.LOOKUP_ENCODING, keep_default_na=False)
+    df.loc[: count - 1, "FirstName"] = df.loc[: count - 1, "FirstName"] + "-MODIFIE"
+    df.to_csv(path, index=False, encoding=etl.LOOKUP_ENCODING)
+
+
+def full_rebuild(data_dir: str, store: str) -> float:
+    start = time.perf_counter()
+    years = list(CATALOG["sales"].partitions(data_dir))
+    if os.path.exists(store):
+        os.remove(store)
+    etl.load_sqlite(etl.run_pipeline(years, data_dir), store)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--rows-per-day", type=int, default=10_000)
+    parser.add_argument("--changed-customers", type=int, default=100)
+    parser.add_argument("--full-max-rows", type=int, default=2_000_000)
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--output", default=RESULTS)
+    args = parser.parse_args()
+
+    source = os.path.join(args.work_dir, f"rows_{args.rows}")
+    if not os.path.exists(os.path.join(source, "synth.json")):
+        synth.generate(source, args.rows)
+    # Les fichiers sont modifiés : on travaille sur une copie des CSV
+    data_dir = os.path.join(args.work_dir, f"incremental_{args.rows}")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+    for name in os.listdir(source):
+        if name.endswith(".csv"):
+            shutil.copy2(os.path.join(source, name), data_dir)
+    store_path = os.path.join(data_dir, "integrated.sqlite3")
+    last_file = CATALOG["sales"].paths(data_dir)[-1]
+    full = args.rows <= args.full_max_rows
+
+    results = []
+
+    def record(step: str, stats: dict, full_s: float | None = None):
+        r = {
+            "rows": args.rows,
+            "step": step,
+            "elapsed_s": stats["elapsed_s"],
+            "rows_in": stats["report"].get("rows_in", 0),
+            "reenriched": stats["reenriched"],
+            "full_s": None if full_s is None else round(full_s, 3),
+        }
+        results.append(r)
+        versus = f", complet {full_s:.2f}s (x{full_s / max(r['elapsed_s'], 1e-6):.0f})" if full_s else ""
+        print(f"{step:12s} {r['elapsed_s']:8.3f}s lignes lues={r['rows_in']:,d} réenrichies={r['reenriched']:,d}{versus}")
+
+    store = IncrementalLoad(store_path)
+    record("initial", store.refresh(data_dir))
+    record("sans changement", store.refresh(data_dir))
+    for day in range(1, args.days + 1):
+        append_day(last_file, day, args.rows_per_day)
+        stats = store.refresh(data_dir)
+        full_s = full_rebuild(data_dir, os.path.join(data_dir, "full.sqlite3")) if full and day == args.days else None
+        record(f"jour {day}", stats, full_s)
+    change_customers(os.path.join(data_dir, etl.CUSTOMER_FILE), args.changed_customers)
+    stats = store.refresh(data_dir)
+    record("référentiel", stats, full_rebuild(data_dir, os.path.join(data_dir, "full.sqlite3")) if full else None)
+    store.close()
+
+    with open(args.output, "a") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+
+
+if __name__ == "__main__":
+    main()
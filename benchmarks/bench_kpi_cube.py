@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import etl
+import synth
+from kpi_cube import KpiCube, sales_year
+
+# ---------------------------
+# Benchmark : cube de KPIs contre recalcul complet
+# ---------------------------
+#
+# Pour chaque facteur d'échelle (données synthétiques, générées une fois) :
+#   - recalcul : pipeline complet sur toutes les années + etl.compute_kpis ;
+#   - cube : construction initiale sans la dernière année, arrivée de la
+#     dernière année (rafraîchissement incrémental), rafraîchissement à vide ;
+#   - lecture des KPIs depuis le cube, vérifiés contre le recalcul.
+# Chaque mode tourne dans un processus séparé (pic de RSS propre).
+#
+#   python -m benchmarks.bench_kpi_cube --rows 1000000 10000000
+
+
+def measure_recompute(data_dir: str) -> dict:
+    start = time.perf_counter()
+    years = [sales_year(p) for p in etl.sales_files(data_dir)]
+    kpis = etl.compute_kpis(etl.run_pipeline(years, data_dir))
+    elapsed = time.perf_counter() - start
+    return {
+        "recompute_s": round(elapsed, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "top_customers": kpis["top_customers"]["Revenue"].round(4).tolist(),
+        "territory_revenue": round(float(kpis["revenue_by_territory"]["Revenue"].sum()), 2),
+    }
+
+
+def measure_cube(data_dir: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Répertoire de travail : référentiels + années en liens symboliques
+        stage = os.path.join(tmp, "data")
+        os.makedirs(stage)
+        files = etl.sales_files(data_dir)
+        for name in os.listdir(data_dir):
+            if name.endswith(".csv") and os.path.join(data_dir, name) != files[-1]:
+                os.symlink(os.path.abspath(os.path.join(data_dir, name)), os.path.join(stage, name))
+        cube = KpiCube(os.path.join(tmp, "cube.sqlite3"))
+
+        start = time.perf_counter()
+        cube.refresh(stage)
+        initial = time.perf_counter() - start
+
+        os.symlink(os.path.abspath(files[-1]), os.path.join(stage, os.path.basename(files[-1])))
+        start = time.perf_counter()
+        stats = cube.refresh(stage)
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cube.refresh(stage)
+        noop = time.perf_counter() - start
+
+        query = []
+        for _ in range(20):
+            start = time.perf_counter()
+            kpis = cube.kpis()
+            query.append(time.perf_counter() - start)
+        cube_size = os.path.getsize(os.path.join(tmp, "cube.sqlite3"))
+        cube.close()
+    return {
+        "initial_s": round(initial, 3),
+        "incremental_s": round(incremental, 3),
+        "incremental_years": stats["added"],
+        "noop_refresh_ms": round(noop * 1000, 2),
+        "query_p50_ms": round(float(np.median(query)) * 1000, 2),
+        "query_max_ms": round(max(query) * 1000, 2),
+        "cube_mb": round(cube_size / 2**20, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "top_customers": kpis["top_customers"]["Revenue"].round(4).tolist(),
+        "territory_revenue": round(float(kpis["revenue_by_territory"]["Revenue"].sum()), 2),
+    }
+
+
+def run_mode(mode: str, data_dir: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_kpi_cube", "--measure", mode, data_dir],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, data_dir = args.measure
+        result = measure_recompute(data_dir) if mode == "recompute" else measure_cube(data_dir)
+        print(json.dumps(result))
+        return
+
+    for rows in args.rows:
+        # Mêmes répertoires que bench_scale : les données déjà générées sont réutilisées
+        data_dir = os.path.join(args.work_dir, f"rows_{rows}")
+        if not os.path.exists(os.path.join(data_dir, "synth.json")):
+            synth.generate(data_dir, rows, chunk_rows=args.chunk_rows)
+        recompute = run_mode("recompute", data_dir)
+        cube = run_mode("cube", data_dir)
+        same = (
+            np.allclose(recompute["top_customers"], cube["top_customers"])
+            and np.isclose(recompute["territory_revenue"], cube["territory_revenue"])
+        )
+        print(
+            f"échelle={rows:>11,d} recalcul={recompute['recompute_s']:.2f}s "
+            f"(RSS {recompute['peak_rss_mb']} Mo) | cube : initial={cube['initial_s']:.2f}s "
+            f"+{cube['incremental_years']}={cube['incremental_s']:.2f}s "
+            f"à vide={cube['noop_refresh_ms']} ms lecture p50={cube['query_p50_ms']} ms "
+            f"max={cube['query_max_ms']} ms taille={cube['cube_mb']} Mo "
+            f"(RSS {cube['peak_rss_mb']} Mo) KPIs identiques={same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.mock_github import start_mock_github
+from github_api import GitHubRepo
+from notebooks import dumps, normalize, strip_notebook
+
+# ---------------------------
+# Benchmark : allègement des notebooks déposés
+# ---------------------------
+#
+# Notebooks synthétiques de taille croissante (cellules de code, aperçus
+# HTML de DataFrame, graphiques PNG en base64). Pour chacun, dans un
+# sous-processus distinct :
+#   json   : json.load du fichier entier puis normalisation (référence) ;
+#   stream : notebooks.strip_notebook, lecture en flux.
+# Pic mémoire Python mesuré par tracemalloc. L'envoi de l'original et de la
+# version allégée vers le faux GitHub est ensuite chronométré.
+#
+#   python -m benchmarks.bench_notebooks --sizes-mb 1 16 64
+
+REPO = "orkhoven/etl_epsi"
+
+
+def make_notebook(path: str, size_mb: float):
+    # Environ 3/4 d'images et 1/4 de tableaux HTML, écrit cellule par cellule
+    cells, size, i = [], 0, 0
+    png = base64.b64encode(os.urandom(150_000)).decode()
+    table = "<table>" + "".join(f"<tr><td>{r}</td><td>{r * 1.5}</td></tr>" for r in range(2000)) + "</table>"
+    while size < size_mb * 2**20:
+        outputs = [{"output_type": "stream", "name": "stdout", "text": [f"cellule {i}\n"]}]
+        if i % 2:
+            outputs.append({
+                "output_type": "display_data", "metadata": {},
+                "data": {"image/png": png, "text/plain": ["<Figure size 640x480>"]},
+            })
+        else:
+            outputs.append({
+                "output_type": "execute_result", "execution_count": i, "metadata": {},
+                "data": {"text/html": [table], "text/plain": ["   a  b\n0  1  2"]},
+            })
+        cell = {
+            "cell_type": "code", "execution_count": i, "metadata": {"colab": {"height": 600}},
+            "source": [f"df_{i} = df.groupby('x').sum()\n", f"df_{i}.plot()\n"], "outputs": outputs,
+        }
+        size += len(json.dumps(cell))
+        cells.append(cell)
+        i += 1
+    nb = {"cells": cells, "metadata": {"colab": {"provenance": []}, "kernelspec": {"name": "python3"}},
+          "nbformat": 4, "nbformat_minor": 0}
+    with open(path, "w") as f:
+        json.dump(nb, f, indent=1)
+
+
+def measure(mode: str, path: str) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if mode == "json":
+            data = dumps(normalize(json.load(f), keep_outputs=False))
+        else:
+            data, _ = strip_notebook(f)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mode": mode, "elapsed_s": round(elapsed, 3), "peak_mb": round(peak / 2**20, 2), "bytes": len(data)}
+
+
+def upload_seconds(api_url: str, dest: str, data) -> float:
+    start = time.perf_counter()
+    GitHubRepo(REPO, "x", api_url=api_url).commit_files({dest: data}, f"Add {dest}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    server, _, api_url = start_mock_github()
+    try:
+        for size in args.sizes_mb:
+            path = os.path.join(args.work_dir, f"notebook_{size:g}mb.ipynb")
+            if not os.path.exists(path):
+                make_notebook(path, size)
+            original = os.path.getsize(path)
+            for mode in ("json", "stream"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_notebooks", "--measure", mode, path],
+                    check=True, capture_output=True, text=True,
+                )
+                r = json.loads(out.stdout)
+                print(
+                    f"{original / 2**20:7.1f} Mo {r['mode']:6s} -> {r['bytes'] / 1024:8.1f} Ko "
+                    f"durée={r['elapsed_s']:.3f}s pic={r['peak_mb']:8.2f} Mo"
+                )
+            with open(path, "rb") as f:
+                stripped, stats = strip_notebook(f)
+            with open(path, "rb") as f:
+                full = upload_seconds(api_url, f"bench/{size:g}mb/original.ipynb", f)
+            light = upload_seconds(api_url, f"bench/{size:g}mb/code.ipynb", io.BytesIO(stripped))
+            print(
+                f"{'':10s} envoi original {full:.3f}s, allégé {light:.3f}s "
+                f"({stats['outputs_removed']}/{stats['outputs']} sorties retirées, "
+                f"{stats['saved_bytes'] / original:.1%} d'octets en moins)"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import etl
+import synth
+from catalog import CATALOG
+from parallel_join import run_parallel
+
+# ---------------------------
+# Benchmark : jointure parallèle, courbe de montée en charge
+# ---------------------------
+#
+# Pour chaque taille de données synthétiques, chaque mode tourne dans un
+# sous-processus distinct (pic RSS du processus et de ses enfants) :
+#   merge    : ce que font les dépôts, pd.merge enchaînés sur les tables
+#              entières (un cœur, copies intermédiaires) ; sauté au-delà de
+#              --merge-max-rows ;
+#   parallel : parallel_join.run_parallel avec 1, 2, 4... processus.
+# Accélération et efficacité sont calculées par rapport à 1 processus, au
+# total et pour les seules étapes parallèles (partitionnement + jointure) :
+# l'extraction des référentiels, faite une fois par le parent, reste séquentielle.
+#
+#   python -m benchmarks.bench_parallel_join --rows 10000000 100000000 --workers 1 2 4 8 16
+
+RESULTS = "bench_parallel_join_results.jsonl"
+
+
+def chained_merge(data_dir: str) -> int:
+    sales = pd.concat([etl.extract_sales(p) for p in CATALOG["sales"].paths(data_dir)], ignore_index=True)
+    customers = etl.extract_customers(os.path.join(data_dir, etl.CUSTOMER_FILE))
+    products = etl.extract_products(os.path.join(data_dir, etl.PRODUCT_FILE))
+    subcategories = etl.extract_subcategories(os.path.join(data_dir, etl.SUBCATEGORY_FILE))
+    categories = etl.extract_categories(os.path.join(data_dir, etl.CATEGORY_FILE))
+    territories = etl.extract_territories(os.path.join(data_dir, etl.TERRITORY_FILE))
+    sales = sales[sales["OrderQuantity"] > 0].drop_duplicates(etl.SALES_KEY)
+    df = (
+        sales.merge(customers, on="CustomerKey")
+        .merge(products, on="ProductKey")
+        .merge(subcategories, on="ProductSubcategoryKey")
+        .merge(categories, on="ProductCategoryKey")
+        .merge(territories, on="TerritoryKey")
+    )
+    df["OrderYear"] = df["OrderDate"].dt.year
+    df["LineTotal"] = df["OrderQuantity"] * df["ProductPrice"]
+    df["Margin"] = df["LineTotal"] - df["OrderQuantity"] * df["ProductCost"]
+    return len(df)
+
+
+def measure(mode: str, data_dir: str, workers: int) -> dict:
+    start = time.perf_counter()
+    if mode == "merge":
+        rows_out = chained_merge(data_dir)
+        report = {}
+    else:
+        _, _, report = run_parallel(data_dir, workers=workers)
+        rows_out = report["rows_out"]
+    elapsed = time.perf_counter() - start
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "mode": mode,
+        "workers": workers,
+        "rows_out": rows_out,
+        "elapsed_s": round(elapsed, 3),
+        "peak_rss_mb": round(peak / 1024, 1),
+        **{k: report[k] for k in ("partitions", "broadcast_s", "partition_s", "join_s") if k in report},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--merge-max-rows", type=int, default=20_000_000)
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "DATA_DIR", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, data_dir, workers = args.measure
+        print(json.dumps(measure(mode, data_dir, int(workers))))
+        return
+
+    print(f"{os.cpu_count()} cœurs")
+    for rows in args.rows:
+        data_dir = os.path.join(args.work_dir, f"rows_{rows}")
+        if not os.path.exists(os.path.join(data_dir, "synth.json")):
+            synth.generate(data_dir, rows)
+        # Copies Arrow construites hors mesure
+        for path in CATALOG["sales"].paths(data_dir):
+            etl.extract_sales(path)
+
+        runs = [("merge", 1)] if rows <= args.merge_max_rows else []
+        runs += [("parallel", w) for w in sorted(set(args.workers))]
+        baseline = parallel_baseline = None
+        for mode, workers in runs:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_parallel_join", "--measure", mode, data_dir, str(workers)],
+                check=True, capture_output=True, text=True,
+            )
+            r = {"rows": rows, **json.loads(out.stdout.strip().splitlines()[-1])}
+            if mode == "parallel":
+                parallel_s = r["partition_s"] + r["join_s"]
+                if baseline is None:
+                    baseline, parallel_baseline = r["elapsed_s"], parallel_s
+                r["speedup"] = round(baseline / r["elapsed_s"], 2)
+                r["efficiency"] = round(r["speedup"] / workers, 2)
+                r["parallel_speedup"] = round(parallel_baseline / parallel_s, 2)
+            with open(args.output, "a") as f:
+                f.write(json.dumps(r) + "\n")
+            scaling = (
+                f" x{r['speedup']:.2f} (efficacité {r['efficiency']:.0%}, étapes parallèles "
+                f"x{r['parallel_speedup']:.2f}, séquentiel {r['broadcast_s']:.2f}s)"
+                if mode == "parallel" else ""
+            )
+            print(
+                f"{rows:>12,d} lignes {mode:8s} {workers:3d} proc. : {r['elapsed_s']:8.2f}s"
+                f"{scaling} pic RSS {r['peak_rss_mb']:.0f} Mo"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import statistics
+import tempfile
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.mock_github import start_mock_github
+
+# ---------------------------
+# Benchmark : coût d'un rerun de l'application par interaction
+# ---------------------------
+#
+# L'application est exécutée sans navigateur (AppTest) contre le faux
+# GitHub. Pour comparer avec une version antérieure du script :
+#
+#   git show <commit>:etl_epsi.py > /tmp/etl_epsi_old.py
+#   python -m benchmarks.bench_rerun --app etl_epsi.py /tmp/etl_epsi_old.py
+#
+# Le temps mesuré est celui du script lui-même (AppTest attend la fin du
+# rerun par pas de 5 ms, le temps total n'est pas exploitable). AppTest ne
+# rejoue pas les fragments isolément : c'est le coût d'un rerun complet, une
+# borne haute pour les interactions internes à un onglet.
+
+# Enveloppe commune à toutes les versions du script, instrumentées ou non
+WRAPPER = """\
+import time
+import streamlit as st
+_code = compile(open({app!r}, encoding="utf-8").read(), {app!r}, "exec")
+_start = time.perf_counter()
+try:
+    exec(_code, {{"__name__": "__main__"}})
+finally:
+    st.session_state["_bench_script_ms"] = (time.perf_counter() - _start) * 1000
+"""
+
+INTERACTIONS = [
+    ("ouverture", None, None),
+    ("onglet données", "Jeux de données", None),
+    ("onglet dépôt", "Dépôt sur GitHub", None),
+    ("saisie formulaire", "Dépôt sur GitHub", "Dupont Alice"),
+]
+
+
+def measure(app: str, api_url: str, repeat: int) -> dict[str, float]:
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(WRAPPER.format(app=os.path.abspath(app)))
+    try:
+        return _measure(f.name, api_url, repeat)
+    finally:
+        os.remove(f.name)
+
+
+def _measure(script: str, api_url: str, repeat: int) -> dict[str, float]:
+    results = {}
+    for name, tab, text in INTERACTIONS:
+        samples = []
+        for _ in range(repeat):
+            at = AppTest.from_file(script, default_timeout=60)
+            at.secrets["GITHUB_TOKEN"] = "x"
+            at.secrets["GITHUB_API_URL"] = api_url
+            at.run()
+            if text is not None:
+                # Formulaire affiché une première fois avant la saisie
+                at.session_state["active_tab"] = tab
+                at.run()
+            if tab is not None:
+                # L'onglet actif est rétabli avant chaque rerun (AppTest ne le conserve pas)
+                at.session_state["active_tab"] = tab
+            if text is None:
+                at.run()
+            else:
+                at.text_input[0].input(text).run()
+            assert not at.exception, at.exception
+            samples.append(at.session_state["_bench_script_ms"])
+        results[name] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", nargs="+", default=["etl_epsi.py"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    server, _, api_url = start_mock_github()
+    try:
+        for app in args.app:
+            results = measure(app, api_url, args.repeat)
+            print(app)
+            for name, ms in results.items():
+                print(f"  {name:20s} {ms:8.1f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import statistics
+import threading
+import time
+
+from sql_sandbox import SANDBOX_DB, QueryError, connect_readonly, ensure_database, run_query
+
+# ---------------------------
+# Benchmark : console SQL partagée sous requêtes abusives
+# ---------------------------
+#
+# Latence d'une requête « normale » (agrégat par catégorie) pendant que
+# d'autres sessions lancent des produits cartésiens. Chaque session a sa
+# propre connexion ; le progress handler coupe les requêtes trop longues,
+# qui ne peuvent donc pas monopoliser la base au-delà du délai fixé.
+
+NORMAL_QUERY = """
+SELECT c.CategoryName, SUM(s.OrderQuantity) AS quantite
+FROM sales s
+JOIN products p ON p.ProductKey = s.ProductKey
+JOIN subcategories sc ON sc.ProductSubcategoryKey = p.ProductSubcategoryKey
+JOIN categories c ON c.ProductCategoryKey = sc.ProductCategoryKey
+GROUP BY c.CategoryName
+"""
+CARTESIAN_QUERY = "SELECT COUNT(*) FROM sales a, sales b"
+
+
+def abusive_session(db: str, timeout_s: float, stop: threading.Event, stats: dict):
+    conn = connect_readonly(db)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            run_query(conn, CARTESIAN_QUERY, timeout_s=timeout_s)
+        except QueryError:
+            stats["interrupted"] += 1
+            stats["interrupt_s"].append(time.perf_counter() - start)
+
+
+def measure(db: str, abusers: int, queries: int, timeout_s: float) -> dict:
+    stop = threading.Event()
+    stats = {"interrupted": 0, "interrupt_s": []}
+    threads = [
+        threading.Thread(target=abusive_session, args=(db, timeout_s, stop, stats))
+        for _ in range(abusers)
+    ]
+    for t in threads:
+        t.start()
+    conn = connect_readonly(db)
+    latencies = []
+    try:
+        for _ in range(queries):
+            start = time.perf_counter()
+            run_query(conn, NORMAL_QUERY, timeout_s=timeout_s)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    latencies.sort()
+    return {
+        "abusers": abusers,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "interrupted": stats["interrupted"],
+        "interrupt_max_s": round(max(stats["interrupt_s"], default=0.0), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=SANDBOX_DB)
+    parser.add_argument("--abusers", type=int, nargs="+", default=[0, 1, 4])
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--timeout-s", type=float, default=1.0)
+    args = parser.parse_args()
+
+    db = ensure_database(path=args.db)
+    for abusers in args.abusers:
+        r = measure(db, abusers, args.queries, args.timeout_s)
+        print(
+            f"{r['abusers']} requête(s) cartésienne(s) en parallèle : "
+            f"p50={r['p50_ms']} ms p95={r['p95_ms']} ms max={r['max_ms']} ms "
+            f"(interrompues={r['interrupted']}, au plus {r['interrupt_max_s']} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
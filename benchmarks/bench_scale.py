@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import etl
+import synth
+
+# ---------------------------
+# Benchmark de montée en charge du pipeline ETL
+# ---------------------------
+#
+# Pour chaque facteur d'échelle : génération (une fois) des données
+# synthétiques, puis exécution par lots des étapes extract / transform /
+# join / kpi dans un processus séparé. Débit et pic de RSS sont ajoutés au
+# fichier de résultats (une ligne JSON par échelle).
+#
+#   python -m benchmarks.bench_scale --rows 1000000 10000000 100000000
+
+
+def run_stages(data_dir: str, chunk_rows: int) -> dict:
+    timings = {"extract": 0.0, "transform": 0.0, "join": 0.0, "kpi": 0.0}
+    report: dict = {}
+
+    start = time.perf_counter()
+    indexed = etl.index_lookups(etl.extract_lookups(data_dir))
+    timings["extract"] += time.perf_counter() - start
+
+    partials = {"month_category": [], "customers": [], "territories": []}
+    for path in etl.sales_files(data_dir):
+        reader = etl.extract_sales(path, chunksize=chunk_rows)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                break
+            t1 = time.perf_counter()
+            chunk = etl.clean_sales(chunk, report)
+            t2 = time.perf_counter()
+            chunk = etl.enrich(chunk, indexed, report)
+            t3 = time.perf_counter()
+            chunk = etl.add_derived_columns(chunk)
+            report["rows_out"] = report.get("rows_out", 0) + len(chunk)
+            t4 = time.perf_counter()
+            # Agrégats partiels par lot, combinés à la fin
+            partials["month_category"].append(
+                chunk.groupby(["OrderMonth", "CategoryName"], observed=True)[
+                    ["LineTotal", "OrderQuantity"]
+                ].sum()
+            )
+            partials["customers"].append(chunk.groupby("CustomerKey")["LineTotal"].sum())
+            partials["territories"].append(
+                chunk.groupby("TerritoryKey")["LineTotal"].sum()
+            )
+            t5 = time.perf_counter()
+            timings["extract"] += t1 - t0
+            timings["transform"] += (t2 - t1) + (t4 - t3)
+            timings["join"] += t3 - t2
+            timings["kpi"] += t5 - t4
+
+    start = time.perf_counter()
+    pd.concat(partials["month_category"]).groupby(level=[0, 1], observed=True).sum()
+    pd.concat(partials["customers"]).groupby(level=0).sum().nlargest(10)
+    pd.concat(partials["territories"]).groupby(level=0).sum()
+    timings["kpi"] += time.perf_counter() - start
+
+    rows = report["rows_in"]
+    return {
+        "rows": rows,
+        "rows_out": report.get("rows_out", 0),
+        "stages_s": {k: round(v, 3) for k, v in timings.items()},
+        "throughput_rows_s": {k: round(rows / v) if v else None for k, v in timings.items()},
+        "total_s": round(sum(timings.values()), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "report": report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--results", default="bench_scale_results.jsonl")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.001)
+    parser.add_argument("--orphan-rate", type=float, default=0.001)
+    parser.add_argument("--bad-quantity-rate", type=float, default=0.001)
+    parser.add_argument("--run-stages", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stages:
+        print(json.dumps(run_stages(args.run_stages, args.chunk_rows)))
+        return
+
+    for rows in args.rows:
+        data_dir = os.path.join(args.work_dir, f"rows_{rows}")
+        if not os.path.exists(os.path.join(data_dir, "synth.json")):
+            synth.generate(
+                data_dir, rows, chunk_rows=args.chunk_rows,
+                duplicate_rate=args.duplicate_rate, orphan_rate=args.orphan_rate,
+                bad_quantity_rate=args.bad_quantity_rate,
+            )
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_scale", "--run-stages", data_dir,
+             "--chunk-rows", str(args.chunk_rows)],
+            check=True, capture_output=True, text=True,
+        )
+        result = json.loads(out.stdout)
+        result.update(scale_rows=rows, at=datetime.now(timezone.utc).isoformat())
+        with open(args.results, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        print(
+            f"échelle={rows:>11,d} total={result['total_s']:.2f}s "
+            + " ".join(f"{k}={v:,}/s" for k, v in result["throughput_rows_s"].items())
+            + f" pic RSS={result['peak_rss_mb']}Mo"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+
+import etl
+import synth
+from catalog import CATALOG
+from sqlite_load import INDEX_COLUMNS, SqliteLoader
+
+# ---------------------------
+# Benchmark : chargeur SQLite contre df.to_sql
+# ---------------------------
+#
+# La table intégrée est produite année par année (hors mesure), puis chargée
+# selon quatre modes, chacun dans un processus séparé :
+#   to_sql         : ce que font les rendus, df.to_sql(if_exists=...) sur une
+#                    connexion par défaut, sans index ;
+#   to_sql_indexed : idem + mêmes index et ANALYZE que le chargeur, pour une
+#                    comparaison à résultat égal ;
+#   loader         : sqlite_load.SqliteLoader (WAL, executemany préparé,
+#                    index et ANALYZE après chargement, une table par année) ;
+#   append         : toutes les années sauf la dernière chargées hors mesure,
+#                    puis ajout de la dernière seule.
+# Débit en lignes/s sur le seul travail SQLite (insertion, puis total avec
+# index et statistiques).
+#
+#   python -m benchmarks.bench_sqlite_load --scales 1 100
+
+MODES = ["to_sql", "to_sql_indexed", "loader", "append"]
+RESULTS = "bench_sqlite_load_results.jsonl"
+
+
+def to_sql(frames, path: str, indexed: bool) -> dict:
+    insert_s = index_s = 0.0
+    rows = 0
+    with sqlite3.connect(path) as conn:
+        for i, df in enumerate(frames):
+            start = time.perf_counter()
+            df.to_sql("sales", conn, if_exists="replace" if i == 0 else "append", index=False)
+            insert_s += time.perf_counter() - start
+            rows += len(df)
+        if indexed:
+            start = time.perf_counter()
+            for column in INDEX_COLUMNS:
+                conn.execute(f'CREATE INDEX "idx_sales_{column}" ON sales ("{column}")')
+            conn.execute("ANALYZE")
+            index_s = time.perf_counter() - start
+    return {"rows": rows, "insert_s": round(insert_s, 3), "index_s": round(index_s, 3)}
+
+
+def measure(mode: str, data_dir: str, db_dir: str) -> dict:
+    years = list(CATALOG["sales"].partitions(data_dir))
+    path = os.path.join(db_dir, f"bench_{mode}.sqlite3")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    frames = (etl.run_pipeline([y], data_dir) for y in years)
+
+    start = time.perf_counter()
+    if mode.startswith("to_sql"):
+        stats = to_sql(frames, path, indexed=mode == "to_sql_indexed")
+    else:
+        loader = SqliteLoader(path)
+        if mode == "append":
+            loader.load(etl.run_pipeline([y], data_dir) for y in years[:-1])
+            frames = iter([etl.run_pipeline([years[-1]], data_dir)])
+            start = time.perf_counter()
+        stats = loader.load(frames)
+        loader.close()
+    elapsed = time.perf_counter() - start
+
+    with sqlite3.connect(path) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    sqlite_s = stats["insert_s"] + stats["index_s"] + stats.get("analyze_s", 0)
+    return {
+        "mode": mode,
+        "rows": stats["rows"],
+        "stored_rows": stored,
+        "insert_s": stats["insert_s"],
+        "index_s": round(stats["index_s"] + stats.get("analyze_s", 0), 3),
+        "sqlite_s": round(sqlite_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "insert_rows_per_s": round(stats["rows"] / stats["insert_s"]) if stats["insert_s"] else 0,
+        "rows_per_s": round(stats["rows"] / sqlite_s) if sqlite_s else 0,
+        "db_mb": round(os.path.getsize(path) / 2**20, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "DATA_DIR", "DB_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    base_rows = sum(len(etl.extract_sales(p)) for p in etl.sales_files(etl.DATA_DIR))
+    for scale in args.scales:
+        if scale == 1:
+            data_dir = etl.DATA_DIR
+        else:
+            data_dir = os.path.join(args.work_dir, f"rows_{base_rows * scale}")
+            if not os.path.exists(os.path.join(data_dir, "synth.json")):
+                synth.generate(data_dir, base_rows * scale)
+        baselines = {}
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sqlite_load", "--measure", mode, data_dir, args.work_dir],
+                check=True, capture_output=True, text=True,
+            )
+            r = {"scale": scale, **json.loads(out.stdout.strip().splitlines()[-1])}
+            if mode.startswith("to_sql"):
+                baselines[mode] = r
+            with open(args.output, "a") as f:
+                f.write(json.dumps(r) + "\n")
+            # Insertion comparée à to_sql, total (index compris) à to_sql_indexed
+            versus = ""
+            if "to_sql" in baselines and not mode.startswith("to_sql"):
+                versus += f" insertion x{r['insert_rows_per_s'] / baselines['to_sql']['insert_rows_per_s']:.2f}"
+            if "to_sql_indexed" in baselines and not mode.startswith("to_sql"):
+                versus += f" total x{r['rows_per_s'] / baselines['to_sql_indexed']['rows_per_s']:.2f}"
+            print(
+                f"x{scale:<4d} {mode:15s} {r['rows']:>10,d} lignes insertion={r['insert_s']:7.2f}s "
+                f"index={r['index_s']:6.2f}s {r['rows_per_s']:>9,d} lignes/s{versus}, "
+                f"base {r['db_mb']:.0f} Mo pic RSS {r['peak_rss_mb']:.0f} Mo"
+            )
+        for mode in args.modes:
+            for suffix in ("", "-wal", "-shm"):
+                path = os.path.join(args.work_dir, f"bench_{mode}.sqlite3{suffix}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import base64
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_github import start_mock_github
+from github_api import GitHubError, GitHubRepo
+
+# ---------------------------
+# Benchmark : dépôt d'une soumission (3 PUT Contents vs 1 commit Git Data)
+# ---------------------------
+#
+#   python -m benchmarks.bench_submission --students 40 --latency 0.05
+
+REPO = "orkhoven/etl_epsi"
+
+
+def _files(i: int) -> dict[str, bytes]:
+    base = f"submissions/etudiant{i}_20250101_000000"
+    return {
+        f"{base}/code.ipynb": os.urandom(64 * 1024),
+        f"{base}/rapport.pdf": os.urandom(256 * 1024),
+        f"{base}/meta.txt": f"Nom complet : etudiant {i}\n".encode(),
+    }
+
+
+def submit_contents(api_url: str, i: int) -> tuple[float, bool]:
+    # Ancien chemin : un PUT (donc un commit) par fichier
+    start = time.perf_counter()
+    ok = True
+    for path, data in _files(i).items():
+        resp = requests.put(
+            f"{api_url}/repos/{REPO}/contents/{path}",
+            headers={"Authorization": "token x"},
+            json={"message": f"Add {path}", "content": base64.b64encode(data).decode()},
+        )
+        ok = ok and resp.status_code in (200, 201)
+    return time.perf_counter() - start, ok
+
+
+def submit_git_data(api_url: str, i: int) -> tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        GitHubRepo(REPO, "x", api_url=api_url).commit_files(_files(i), f"TP ETL - etudiant {i}")
+        ok = True
+    except (GitHubError, requests.RequestException):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run(mode, students: int, latency: float) -> dict:
+    server, state, api_url = start_mock_github(latency=latency)
+    try:
+        with ThreadPoolExecutor(max_workers=students) as pool:
+            results = list(pool.map(lambda i: mode(api_url, i), range(students)))
+    finally:
+        server.shutdown()
+    times = [t for t, _ in results]
+    return {
+        "mean_s": statistics.mean(times),
+        "p50_s": statistics.median(times),
+        "max_s": max(times),
+        "failed": sum(not ok for _, ok in results),
+        "commits": state.stats["commits"],
+        "conflicts": state.stats["conflicts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for name, mode in [("contents_put_x3", submit_contents), ("git_data_commit", submit_git_data)]:
+        r = run(mode, args.students, args.latency)
+        print(
+            f"{name:18s} soumissions={args.students} temps/soumission moyen={r['mean_s']:.3f}s "
+            f"p50={r['p50_s']:.3f}s max={r['max_s']:.3f}s échecs={r['failed']} "
+            f"commits={r['commits']} conflits={r['conflicts']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from benchmarks.mock_github import start_mock_github
+from github_api import GitHubRepo
+
+# ---------------------------
+# Benchmark : mémoire d'un envoi de fichier (bytes + base64 vs flux)
+# ---------------------------
+#
+# Chaque envoi est fait dans un sous-processus distinct : le pic mémoire
+# Python (tracemalloc) ne mesure que l'envoi, le faux GitHub tourne dans le
+# processus parent.
+#
+#   python -m benchmarks.bench_upload --sizes-mb 1 16 64
+#
+# Contrôle (--check) : le pic d'un envoi en flux de CHECK_SIZE_MB doit rester
+# sous CHECK_MAX_RATIO fois la taille du fichier, et le contenu reçu par le
+# faux GitHub doit être identique. L'ancien chemin (base64 du fichier entier)
+# sert de témoin : il doit dépasser la borne. Code de sortie 1 sinon.
+#
+#   python -m benchmarks.bench_upload --check
+
+REPO = "orkhoven/etl_epsi"
+CHECK_SIZE_MB = 32
+CHECK_MAX_RATIO = 0.25
+
+
+def upload_bytes(api_url: str, path: str, dest: str):
+    # Ancien chemin : fichier entier en mémoire, base64 puis JSON en un bloc
+    with open(path, "rb") as f:
+        data = f.read()
+    resp = requests.put(
+        f"{api_url}/repos/{REPO}/contents/{dest}",
+        headers={"Authorization": "token x"},
+        json={"message": f"Add {dest}", "content": base64.b64encode(data).decode()},
+    )
+    resp.raise_for_status()
+    return "contents"
+
+
+def upload_stream(api_url: str, path: str, dest: str):
+    # Chemin du spool : blob envoyé en flux (base64 par blocs) puis un commit
+    with open(path, "rb") as f:
+        GitHubRepo(REPO, "x", api_url=api_url).commit_files({dest: f}, f"Add {dest}")
+    return "blob"
+
+
+def measure(mode: str, api_url: str, size_mb: float) -> dict:
+    h = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
+        remaining = int(size_mb * 2**20)
+        while remaining:
+            block = os.urandom(min(remaining, 1 << 20))
+            h.update(block)
+            f.write(block)
+            remaining -= len(block)
+    dest = f"bench/{mode}_{size_mb:g}mb.bin"
+    try:
+        upload = upload_bytes if mode == "bytes" else upload_stream
+        tracemalloc.start()
+        start = time.perf_counter()
+        api = upload(api_url, f.name, dest)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(f.name)
+    return {"mode": mode, "size_mb": size_mb, "api": api, "dest": dest, "sha256": h.hexdigest(),
+            "elapsed_s": round(elapsed, 3), "peak_mb": round(peak / 2**20, 2)}
+
+
+def run_measure(mode: str, api_url: str, size_mb: float) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_upload", "--measure", mode, api_url, str(size_mb)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def check(api_url: str, state) -> list[str]:
+    # Renvoie la liste des échecs (vide si tout va bien)
+    bound = CHECK_SIZE_MB * CHECK_MAX_RATIO
+    failures = []
+    stream = run_measure("stream", api_url, CHECK_SIZE_MB)
+    print(f"flux   {CHECK_SIZE_MB} Mo : pic {stream['peak_mb']:.2f} Mo (borne {bound:g} Mo)")
+    if stream["peak_mb"] > bound:
+        failures.append(f"envoi en flux : pic {stream['peak_mb']:.2f} Mo > {bound:g} Mo")
+    received = state.files_at().get(stream["dest"])
+    if received is None or hashlib.sha256(received).hexdigest() != stream["sha256"]:
+        failures.append("envoi en flux : contenu reçu différent du fichier")
+    witness = run_measure("bytes", api_url, CHECK_SIZE_MB)
+    print(f"témoin {CHECK_SIZE_MB} Mo : pic {witness['peak_mb']:.2f} Mo")
+    if witness["peak_mb"] <= bound:
+        failures.append(f"témoin base64 entier sous la borne ({witness['peak_mb']:.2f} Mo) : mesure inopérante")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 4, 16, 64])
+    parser.add_argument("--check", action="store_true", help="Contrôle du pic mémoire (code de sortie 1 si dépassé)")
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "URL", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, url, size = args.measure
+        print(json.dumps(measure(mode, url, float(size))))
+        return
+
+    server, state, api_url = start_mock_github()
+    try:
+        if args.check:
+            failures = check(api_url, state)
+            for failure in failures:
+                print(f"ÉCHEC {failure}")
+            sys.exit(1 if failures else 0)
+        for size in args.sizes_mb:
+            for mode in ("bytes", "stream"):
+                r = run_measure(mode, api_url, size)
+                print(
+                    f"{r['size_mb']:>6g} Mo {r['mode']:7s} ({r['api']:8s}) "
+                    f"pic={r['peak_mb']:>8.2f} Mo ({r['peak_mb'] / r['size_mb']:.2f}x) "
+                    f"durée={r['elapsed_s']:.3f}s"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import time
+
+import etl
+import synth
+from kpi_cube import sales_year
+from validation import load_table, validate
+
+# ---------------------------
+# Benchmark : validation d'une table intégrée de plusieurs millions de lignes
+# ---------------------------
+#
+# La table de référence (toutes les années des données synthétiques) est
+# écrite en CSV comme le ferait un·e étudiant·e, relue, puis validée ; le
+# temps de chaque règle est affiché.
+#
+#   python -m benchmarks.bench_validation --rows 1000000 5000000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--work-dir", default="bench_data")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        data_dir = os.path.join(args.work_dir, f"rows_{rows}")
+        if not os.path.exists(os.path.join(data_dir, "synth.json")):
+            synth.generate(data_dir, rows, chunk_rows=args.chunk_rows)
+        output = os.path.join(data_dir, "clean_output.csv")
+        if not os.path.exists(output):
+            years = [sales_year(p) for p in etl.sales_files(data_dir)]
+            etl.load_csv(etl.run_pipeline(years, data_dir), output)
+        lookups = etl.extract_lookups(data_dir)
+
+        start = time.perf_counter()
+        df = load_table(output)
+        loaded = time.perf_counter()
+        report = validate(df, lookups)
+        elapsed = time.perf_counter() - loaded
+        print(f"échelle={rows:,d} : {len(df):,d} lignes, lecture {loaded - start:.2f}s, validation {elapsed:.2f}s")
+        for r in sorted(report, key=lambda r: -r["elapsed_ms"])[:8]:
+            print(f"  {r['rule']:34s} {r['elapsed_ms']:>9.1f} ms  {r['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------
+# Faux serveur GitHub local
+# ---------------------------
+#
+# Implémente le sous-ensemble de l'API utilisé par l'application :
+#   - Contents API : PUT /repos/{o}/{r}/contents/{path}
+#   - Git Data API : refs, commits, blobs, trees (lecture et écriture)
+# Tout est en mémoire. La latence simulée est appliquée entre la lecture et
+# la mise à jour de la tête de branche, ce qui reproduit les 409 des PUT
+# Contents concurrents.
+# Pannes injectables pour les tests de charge : latence réseau (avec
+# gigue) sur chaque requête, 409 aléatoires sur les mises à jour de
+# branche, limite de débit (403 + X-RateLimit-Reset au-delà de rate_limit
+# requêtes par fenêtre de rate_window secondes).
+
+
+def _sha(kind: str, payload: bytes) -> str:
+    return hashlib.sha1(f"{kind} {len(payload)}\0".encode() + payload).hexdigest()
+
+
+class MockGitHubState:
+    def __init__(
+        self,
+        branch: str = "main",
+        latency: float = 0.0,
+        request_latency: float = 0.0,
+        jitter: float = 0.0,
+        conflict_rate: float = 0.0,
+        rate_limit: int = 0,
+        rate_window: float = 60.0,
+        seed: int | None = None,
+    ):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.request_latency = request_latency
+        self.jitter = jitter
+        self.conflict_rate = conflict_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+        self.window_start = time.time()
+        self.window_requests = 0
+        self.blobs: dict[str, bytes] = {}
+        self.trees: dict[str, dict[str, str]] = {}
+        self.commits: dict[str, dict] = {}
+        self.stats = {"requests": 0, "commits": 0, "conflicts": 0, "injected_conflicts": 0, "rate_limited": 0}
+        root_tree = self._put_tree({})
+        root = self._put_commit("initial", root_tree, [])
+        self.refs = {f"heads/{branch}": root}
+        self.branch = branch
+
+    def _put_tree(self, files: dict[str, str]) -> str:
+        sha = _sha("tree", json.dumps(files, sort_keys=True).encode())
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _put_commit(self, message: str, tree: str, parents: list[str]) -> str:
+        payload = json.dumps([message, tree, parents, time.time_ns()]).encode()
+        sha = _sha("commit", payload)
+        self.commits[sha] = {"message": message, "tree": tree, "parents": parents}
+        return sha
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.request_latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def throttle(self) -> float | None:
+        # Fenêtre fixe : renvoie l'instant de réinitialisation si la limite est atteinte
+        if not self.rate_limit:
+            return None
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.rate_window:
+                self.window_start, self.window_requests = now, 0
+            if self.window_requests >= self.rate_limit:
+                self.stats["rate_limited"] += 1
+                return self.window_start + self.rate_window
+            self.window_requests += 1
+            return None
+
+    def inject_conflict(self) -> bool:
+        with self.lock:
+            if self.random.random() < self.conflict_rate:
+                self.stats["injected_conflicts"] += 1
+                return True
+            return False
+
+    def listing(self, sha: str) -> list[dict]:
+        # Vue d'un niveau de l'arbre : les sous-répertoires deviennent des
+        # arbres dont le SHA ne dépend que de leur contenu, comme dans git.
+        entries, subdirs = [], {}
+        for path, blob in sorted(self.trees[sha].items()):
+            head, _, rest = path.partition("/")
+            if rest:
+                subdirs.setdefault(head, {})[rest] = blob
+            else:
+                entries.append({"path": head, "type": "blob", "sha": blob, "size": len(self.blobs[blob])})
+        for name, files in subdirs.items():
+            entries.append({"path": name, "type": "tree", "sha": self._put_tree(files)})
+        return sorted(entries, key=lambda e: e["path"])
+
+    def files_at(self, ref: str | None = None) -> dict[str, bytes]:
+        commit = self.commits[self.refs[f"heads/{ref or self.branch}"]]
+        return {p: self.blobs[s] for p, s in self.trees[commit["tree"]].items()}
+
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    state: MockGitHubState
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status: int, payload: dict, head: bool = False, headers: dict | None = None):
+        raw = b"" if head else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _route(self, method: str):
+        state = self.state
+        with state.lock:
+            state.stats["requests"] += 1
+        delay = state.delay()
+        if delay:
+            time.sleep(delay)
+        reset = state.throttle()
+        if reset is not None:
+            # Corps lu et ignoré : le client peut finir d'envoyer avant la réponse
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            return self._send(
+                403, {"message": "API rate limit exceeded"}, head=method == "HEAD",
+                headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(math.ceil(reset))},
+            )
+        m = re.match(r"^/repos/[^/]+/[^/]+/(.*)$", self.path.split("?")[0])
+        if not m:
+            return self._send(404, {"message": "Not Found"})
+        path = m.group(1)
+
+        if method == "PUT" and path.startswith("contents/"):
+            return self._put_contents(path[len("contents/"):], self._body())
+        if method == "GET" and path.startswith("git/ref/"):
+            ref = path[len("git/ref/"):]
+            with state.lock:
+                if ref not in state.refs:
+                    return self._send(404, {"message": "Not Found"})
+                return self._send(200, {"ref": f"refs/{ref}", "object": {"sha": state.refs[ref]}})
+        if method == "GET" and path.startswith("git/commits/"):
+            sha = path[len("git/commits/"):]
+            with state.lock:
+                commit = state.commits.get(sha)
+            if commit is None:
+                return self._send(404, {"message": "Not Found"})
+            return self._send(200, {"sha": sha, "tree": {"sha": commit["tree"]}})
+        if method == "GET" and path.startswith("git/trees/"):
+            sha = path[len("git/trees/"):]
+            with state.lock:
+                if sha not in state.trees:
+                    return self._send(404, {"message": "Not Found"})
+                return self._send(200, {"sha": sha, "tree": state.listing(sha)})
+        if method in ("GET", "HEAD") and path.startswith("git/blobs/"):
+            sha = path[len("git/blobs/"):]
+            with state.lock:
+                raw = state.blobs.get(sha)
+            if raw is None:
+                return self._send(404, {"message": "Not Found"}, head=method == "HEAD")
+            if method == "HEAD":
+                return self._send(200, {}, head=True)
+            content = base64.b64encode(raw).decode()
+            return self._send(200, {"sha": sha, "size": len(raw), "content": content, "encoding": "base64"})
+        if method == "POST" and path == "git/blobs":
+            raw = base64.b64decode(self._body()["content"])
+            sha = _sha("blob", raw)
+            with state.lock:
+                state.blobs[sha] = raw
+            return self._send(201, {"sha": sha})
+        if method == "POST" and path == "git/trees":
+            body = self._body()
+            with state.lock:
+                files = dict(state.trees.get(body.get("base_tree"), {}))
+                for entry in body["tree"]:
+                    files[entry["path"]] = entry["sha"]
+                sha = state._put_tree(files)
+            return self._send(201, {"sha": sha})
+        if method == "POST" and path == "git/commits":
+            body = self._body()
+            with state.lock:
+                sha = state._put_commit(body["message"], body["tree"], body["parents"])
+            return self._send(201, {"sha": sha})
+        if method == "PATCH" and path.startswith("git/refs/"):
+            ref = path[len("git/refs/"):]
+            body = self._body()
+            time.sleep(state.latency)
+            if state.inject_conflict():
+                return self._send(409, {"message": "Reference cannot be updated"})
+            with state.lock:
+                parents = state.commits[body["sha"]]["parents"]
+                if not body.get("force") and state.refs.get(ref) not in parents:
+                    state.stats["conflicts"] += 1
+                    return self._send(422, {"message": "Update is not a fast forward"})
+                state.refs[ref] = body["sha"]
+                state.stats["commits"] += 1
+            return self._send(200, {"ref": f"refs/{ref}", "object": {"sha": body["sha"]}})
+        return self._send(404, {"message": "Not Found"})
+
+    def _put_contents(self, dest: str, body: dict):
+        state = self.state
+        raw = base64.b64decode(body["content"])
+        ref = f"heads/{state.branch}"
+        with state.lock:
+            parent = state.refs[ref]
+        # Fenêtre de course : GitHub lit la tête, écrit, puis avance la branche
+        time.sleep(state.latency)
+        if state.inject_conflict():
+            return self._send(409, {"message": f"{ref} does not match the expected sha"})
+        with state.lock:
+            if state.refs[ref] != parent:
+                state.stats["conflicts"] += 1
+                return self._send(409, {"message": f"{ref} is at {state.refs[ref]} but expected {parent}"})
+            blob = _sha("blob", raw)
+            state.blobs[blob] = raw
+            files = dict(state.trees[state.commits[parent]["tree"]])
+            files[dest] = blob
+            commit = state._put_commit(body["message"], state._put_tree(files), [parent])
+            state.refs[ref] = commit
+            state.stats["commits"] += 1
+        return self._send(201, {"content": {"path": dest, "sha": blob}, "commit": {"sha": commit}})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_HEAD(self):
+        self._route("HEAD")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+
+def start_mock_github(latency: float = 0.0, branch: str = "main", port: int = 0, **faults):
+    # Démarre le serveur (port libre par défaut) dans un thread démon ; faults :
+    # request_latency, jitter, conflict_rate, rate_limit, rate_window, seed.
+    # Renvoie (serveur, état, url de base de l'API).
+    state = MockGitHubState(branch=branch, latency=latency, **faults)
+    handler = type("Handler", (MockGitHubHandler,), {"state": state})
+    server_cls = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 256})
+    server = server_cls(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur GitHub local")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fenêtre de course des mises à jour de branche (s)")
+    parser.add_argument("--request-latency", type=float, default=0.0, help="Latence de chaque requête (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--conflict-rate", type=float, default=0.0, help="Part de 409 injectés")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requêtes par fenêtre (0 : illimité)")
+    parser.add_argument("--rate-window", type=float, default=60.0)
+    args = parser.parse_args()
+
+    server, _, url = start_mock_github(
+        latency=args.latency, port=args.port, request_latency=args.request_latency, jitter=args.jitter,
+        conflict_rate=args.conflict_rate, rate_limit=args.rate_limit, rate_window=args.rate_window,
+    )
+    print(f"Faux GitHub à l'écoute sur {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+from datasets import KeyedLocks
+from github_api import git_blob_sha
+
+# ---------------------------
+# Cache disque des fichiers déposés, indexé par SHA de blob git
+# ---------------------------
+#
+# Un fichier de dépôt ne change jamais sous un SHA donné : une fois lu sur
+# GitHub, il est gardé sur disque (<racine>/ab/abcdef...) et relu sans appel
+# réseau, y compris après un redémarrage. L'ordre LRU est la date de
+# modification des fichiers (remise à jour à chaque lecture) ; au-delà de
+# max_bytes, les moins récemment lus sont supprimés. Le contenu est
+# revérifié (SHA) à chaque lecture : un fichier tronqué est refetché.
+
+CACHE_DIR = ".blob_cache"
+
+
+class BlobCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = KeyedLocks()
+        os.makedirs(root, exist_ok=True)
+        # Reprise du cache existant, du plus ancien au plus récent
+        found = []
+        for sub in os.scandir(root):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        st = entry.stat()
+                        found.append((st.st_mtime_ns, entry.name, st.st_size))
+        for _, sha, size in sorted(found):
+            self._entries[sha] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha)
+
+    def _read(self, sha: str) -> bytes | None:
+        with self._lock:
+            if sha not in self._entries:
+                return None
+            self._entries.move_to_end(sha)
+        try:
+            with open(self._path(sha), "rb") as f:
+                data = f.read()
+            os.utime(self._path(sha))
+        except OSError:
+            data = None
+        if data is None or git_blob_sha(data) != sha:
+            with self._lock:
+                self._discard(sha)
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return data
+
+    def get(self, sha: str, load: Callable[[str], bytes]) -> bytes:
+        data = self._read(sha)
+        if data is not None:
+            return data
+        # Un seul téléchargement par blob, même si plusieurs sessions l'ouvrent ensemble
+        with self._loading.hold(sha):
+            data = self._read(sha)
+            if data is not None:
+                return data
+            data = load(sha)
+            with self._lock:
+                self.stats["misses"] += 1
+            if git_blob_sha(data) == sha:
+                self._store(sha, data)
+        return data
+
+    def _store(self, sha: str, data: bytes):
+        # Un blob plus gros que le cache entier est servi sans être gardé
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.total_bytes -= self._entries.pop(sha, 0)
+            self._entries[sha] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._discard(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _discard(self, sha: str):
+        size = self._entries.pop(sha, None)
+        if size is None:
+            return
+        self.total_bytes -= size
+        try:
+            os.remove(self._path(sha))
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, sha: str) -> bool:
+        with self._lock:
+            return sha in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="État du cache disque des blobs de dépôts")
+    parser.add_argument("--root", default=CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=256)
+    args = parser.parse_args()
+
+    cache = BlobCache(args.root, int(args.max_mb * 2**20))
+    print(f"{len(cache)} blobs, {cache.total_bytes / 2**20:.1f} Mo / {args.max_mb:g} Mo, évictions : {cache.stats['evictions']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import threading
+import time
+import zipfile
+
+import etl
+from catalog import CATALOG, relations
+from profiles import fingerprint, unchanged
+
+# ---------------------------
+# Archive « Tout télécharger » des jeux de données
+# ---------------------------
+#
+# Tous les fichiers du catalogue dans un seul ZIP, accompagnés d'un
+# catalogue.json (schémas, clés, relations, SHA-256). L'archive est
+# construite une fois sur disque avec une compression rapide (deflate
+# niveau 1 : ZIP lisible partout, contrairement à zstd) et n'est refaite que
+# si le contenu d'un fichier source change : la signature (mtime, taille)
+# est comparée d'abord, le SHA-256 n'est recalculé que si elle a bougé.
+# Le manifeste est écrit à côté de l'archive (<archive>.json).
+
+BUNDLE_VERSION = 1
+BUNDLE_PATH = ".bundle/adventureworks_data.zip"
+COMPRESS_LEVEL = 1
+MANIFEST_SUFFIX = ".json"
+
+_build_lock = threading.Lock()
+
+
+def source_files(data_dir: str = etl.DATA_DIR) -> list[str]:
+    return [p for d in CATALOG.values() for p in d.paths(data_dir) if os.path.exists(p)]
+
+
+def manifest_path(path: str) -> str:
+    return path + MANIFEST_SUFFIX
+
+
+def _read_manifest(path: str) -> dict | None:
+    try:
+        with open(manifest_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(path: str, manifest: dict):
+    tmp = f"{manifest_path(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, manifest_path(path))
+
+
+def _is_fresh(manifest: dict | None, path: str, sources: list[str]) -> bool:
+    # Met à jour les signatures des fichiers au contenu identique (copie, checkout)
+    if (
+        manifest is None or not os.path.exists(path)
+        or manifest.get("version") != BUNDLE_VERSION or manifest.get("level") != COMPRESS_LEVEL
+        or sorted(manifest["files"]) != sorted(os.path.basename(p) for p in sources)
+    ):
+        return False
+    return all(unchanged(manifest["files"][os.path.basename(source)], source) for source in sources)
+
+
+def catalog_document(data_dir: str, files: dict[str, dict]) -> dict:
+    return {
+        "datasets": {
+            d.name: {
+                "label": d.label,
+                "description": d.description,
+                "files": [os.path.basename(p) for p in d.paths(data_dir) if os.path.basename(p) in files],
+                "key": d.key,
+                "schema": d.schema(),
+            }
+            for d in CATALOG.values()
+        },
+        "relations": relations(),
+        "files": files,
+    }
+
+
+def build_bundle(data_dir: str = etl.DATA_DIR, path: str = BUNDLE_PATH, level: int = COMPRESS_LEVEL) -> dict:
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sources = source_files(data_dir)
+    files = {os.path.basename(p): fingerprint(p) for p in sources}
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+        archive.writestr("catalogue.json", json.dumps(catalog_document(data_dir, files), indent=1, ensure_ascii=False))
+        for source in sources:
+            # Copie par blocs depuis le disque : l'archive n'est jamais en mémoire
+            archive.write(source, arcname=os.path.basename(source))
+    os.replace(tmp, path)
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "level": level,
+        "files": files,
+        "source_bytes": sum(e["size"] for e in files.values()),
+        "bundle_bytes": os.path.getsize(path),
+        "built_in_s": round(time.perf_counter() - start, 3),
+    }
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def ensure_bundle(data_dir: str = etl.DATA_DIR, path: str = BUNDLE_PATH) -> str:
+    # Une seule construction à la fois ; les lecteurs gardent l'ancienne archive (os.replace)
+    with _build_lock:
+        manifest = _read_manifest(path)
+        if _is_fresh(manifest, path, source_files(data_dir)):
+            if manifest != _read_manifest(path):
+                _write_manifest(path, manifest)
+        else:
+            build_bundle(data_dir, path)
+    return path
+
+
+def bundle_info(path: str = BUNDLE_PATH) -> dict | None:
+    return _read_manifest(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive ZIP de tous les jeux de données du catalogue")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--output", default=BUNDLE_PATH)
+    parser.add_argument("--force", action="store_true", help="Reconstruire même si l'archive est à jour")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.force:
+        build_bundle(args.data_dir, args.output)
+    else:
+        ensure_bundle(args.data_dir, args.output)
+    info = bundle_info(args.output)
+    print(
+        f"{args.output} : {len(info['files'])} fichiers, {info['source_bytes'] / 2**20:.2f} Mo -> "
+        f"{info['bundle_bytes'] / 2**20:.2f} Mo (construite en {info['built_in_s']}s, "
+        f"appel {time.perf_counter() - start:.3f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import os
+import resource
+import time
+from collections.abc import Iterator
+
+import pandas as pd
+
+import columnar
+import etl
+
+# ---------------------------
+# Catalogue des jeux de données AdventureWorks
+# ---------------------------
+#
+# Décrit chaque fichier de data/ : libellé, schéma (types de etl.py), clé et
+# références vers les autres jeux. Les ventes, un fichier par année, forment
+# une seule table logique : ses partitions sont découvertes sur le disque
+# (toute nouvelle année est prise en compte) et lues paresseusement, par
+# lots typés, depuis les copies Arrow projetées en mémoire (columnar) : seul
+# le lot en cours est matérialisé en pandas, rien n'est concaténé.
+
+CHUNK_ROWS = 100_000
+
+
+class Dataset:
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        file: str,
+        description: str,
+        extract,
+        dtypes: dict[str, str] | None = None,
+        dates: list[str] | None = None,
+        encoding: str | None = None,
+        key: list[str] | None = None,
+        references: dict[str, tuple[str, str]] | None = None,
+    ):
+        self.name = name
+        self.label = label
+        # Nom de fichier, avec {year} pour une table partitionnée par année
+        self.file = file
+        self.description = description
+        self.extract = extract
+        self.dtypes = dtypes or {}
+        self.dates = dates or []
+        self.encoding = encoding
+        self.key = key or []
+        # Colonne -> (jeu référencé, colonne dans ce jeu)
+        self.references = references or {}
+
+    @property
+    def partitioned(self) -> bool:
+        return "{year}" in self.file
+
+    def read_options(self) -> dict:
+        # Mêmes options que les fonctions extract_* de etl.py : la copie
+        # colonnaire est partagée avec le pipeline
+        options = {}
+        if self.dtypes:
+            options["dtype"] = self.dtypes
+        if self.dates:
+            options["parse_dates"] = self.dates
+        if self.encoding:
+            options["encoding"] = self.encoding
+        return options
+
+    def schema(self) -> list[dict]:
+        types = {**{c: "datetime64" for c in self.dates}, **self.dtypes}
+        return [
+            {
+                "colonne": column,
+                "type": kind,
+                "clé": column in self.key,
+                "référence": ".".join(self.references[column]) if column in self.references else "",
+            }
+            for column, kind in types.items()
+        ]
+
+    def partitions(self, data_dir: str = etl.DATA_DIR) -> dict[int, str]:
+        # Année -> fichier ; les fichiers annexes (.profile.json...) sont ignorés
+        if not self.partitioned:
+            return {}
+        prefix, suffix = self.file.split("{year}")
+        found = {}
+        for name in os.listdir(data_dir):
+            middle = name[len(prefix):len(name) - len(suffix)]
+            if name.startswith(prefix) and name.endswith(suffix) and middle.isdigit():
+                found[int(middle)] = os.path.join(data_dir, name)
+        return dict(sorted(found.items()))
+
+    def paths(self, data_dir: str = etl.DATA_DIR) -> list[str]:
+        if self.partitioned:
+            return list(self.partitions(data_dir).values())
+        return [os.path.join(data_dir, self.file)]
+
+    def iter_chunks(
+        self,
+        data_dir: str = etl.DATA_DIR,
+        chunk_rows: int = CHUNK_ROWS,
+        years: list[int] | None = None,
+        columns: list[str] | None = None,
+    ) -> Iterator[pd.DataFrame]:
+        # Générateur de lots typés ; l'index continue d'un lot et d'une année à l'autre
+        if self.partitioned:
+            paths = [p for y, p in self.partitions(data_dir).items() if years is None or y in years]
+        else:
+            paths = self.paths(data_dir)
+        offset = 0
+        for path in paths:
+            table = columnar.open_table(path, **self.read_options())
+            if columns is not None:
+                table = table.select(columns)
+            for start in range(0, table.num_rows, chunk_rows):
+                chunk = columnar.to_pandas(table.slice(start, chunk_rows))
+                chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+                offset += len(chunk)
+                yield chunk
+
+    def num_rows(self, data_dir: str = etl.DATA_DIR, years: list[int] | None = None) -> int:
+        # Lu dans les métadonnées des copies Arrow, sans matérialiser de lignes
+        if self.partitioned:
+            paths = [p for y, p in self.partitions(data_dir).items() if years is None or y in years]
+        else:
+            paths = self.paths(data_dir)
+        return sum(columnar.open_table(p, **self.read_options()).num_rows for p in paths)
+
+    def read(self, data_dir: str = etl.DATA_DIR, years: list[int] | None = None) -> pd.DataFrame:
+        # Table entière en mémoire, avec les nettoyages des fonctions extract_*
+        if not self.partitioned:
+            return self.extract(self.paths(data_dir)[0])
+        paths = [p for y, p in self.partitions(data_dir).items() if years is None or y in years]
+        return pd.concat([self.extract(p) for p in paths], ignore_index=True)
+
+
+CATALOG = {
+    d.name: d
+    for d in [
+        Dataset(
+            "sales", "Ventes (Sales)", etl.SALES_FILE,
+            "Lignes de commande, un fichier par année (ERP).",
+            etl.extract_sales, etl.SALES_DTYPES, etl.SALES_DATES, key=etl.SALES_KEY,
+            references={
+                "OrderDate": ("calendar", "Date"),
+                "ProductKey": ("products", "ProductKey"),
+                "CustomerKey": ("customers", "CustomerKey"),
+                "TerritoryKey": ("territories", "SalesTerritoryKey"),
+            },
+        ),
+        Dataset(
+            "customers", "Clients (Customer Lookup)", etl.CUSTOMER_FILE,
+            "Référentiel clients exporté du CRM (Windows-1252, lignes parasites en fin de fichier).",
+            etl.extract_customers, etl.CUSTOMER_DTYPES, etl.CUSTOMER_DATES, etl.LOOKUP_ENCODING,
+            key=["CustomerKey"],
+        ),
+        Dataset(
+            "products", "Produits (Product Lookup)", etl.PRODUCT_FILE,
+            "Catalogue produits : coût, prix, sous-catégorie.",
+            etl.extract_products, etl.PRODUCT_DTYPES, key=["ProductKey"],
+            references={"ProductSubcategoryKey": ("subcategories", "ProductSubcategoryKey")},
+        ),
+        Dataset(
+            "subcategories", "Sous-catégories (Product Subcategories Lookup)", etl.SUBCATEGORY_FILE,
+            "Sous-catégories de produits et leur catégorie.",
+            etl.extract_subcategories, etl.SUBCATEGORY_DTYPES, key=["ProductSubcategoryKey"],
+            references={"ProductCategoryKey": ("categories", "ProductCategoryKey")},
+        ),
+        Dataset(
+            "categories", "Catégories (Product Categories Lookup)", etl.CATEGORY_FILE,
+            "Catégories de produits (Bikes, Components, Clothing, Accessories).",
+            etl.extract_categories, etl.CATEGORY_DTYPES, key=["ProductCategoryKey"],
+        ),
+        Dataset(
+            "territories", "Territoires (Territory Lookup)", etl.TERRITORY_FILE,
+            "Territoires commerciaux : région, pays, continent.",
+            etl.extract_territories, etl.TERRITORY_DTYPES, key=["SalesTerritoryKey"],
+        ),
+        Dataset(
+            "returns", "Retours (Returns)", etl.RETURNS_FILE,
+            "Retours produits par territoire et par jour.",
+            etl.extract_returns, etl.RETURNS_DTYPES, etl.RETURNS_DATES,
+            references={
+                "ReturnDate": ("calendar", "Date"),
+                "TerritoryKey": ("territories", "SalesTerritoryKey"),
+                "ProductKey": ("products", "ProductKey"),
+            },
+        ),
+        Dataset(
+            "calendar", "Calendrier (Calendar Lookup)", etl.CALENDAR_FILE,
+            "Une ligne par jour de la période couverte.",
+            etl.extract_calendar, dates=etl.CALENDAR_DATES, key=["Date"],
+        ),
+    ]
+}
+
+
+def relations() -> list[dict]:
+    return [
+        {"de": f"{d.name}.{column}", "vers": f"{target}.{target_column}"}
+        for d in CATALOG.values()
+        for column, (target, target_column) in d.references.items()
+    ]
+
+
+def sales_years(data_dir: str = etl.DATA_DIR) -> list[int]:
+    return list(CATALOG["sales"].partitions(data_dir))
+
+
+def iter_sales(
+    data_dir: str = etl.DATA_DIR,
+    years: list[int] | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+    columns: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    return CATALOG["sales"].iter_chunks(data_dir, chunk_rows, years, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalogue des jeux de données AdventureWorks")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--iter-sales", action="store_true", help="Parcourt toutes les ventes par lots")
+    args = parser.parse_args()
+
+    for d in CATALOG.values():
+        paths = [p for p in d.paths(args.data_dir) if os.path.exists(p)]
+        years = f" années {sales_years(args.data_dir)}" if d.partitioned else ""
+        rows = d.num_rows(args.data_dir) if paths else 0
+        print(f"{d.name:14s} {len(paths)} fichier(s){years}, {rows:,d} lignes, clé {d.key}")
+    for r in relations():
+        print(f"  {r['de']} -> {r['vers']}")
+
+    if args.iter_sales:
+        start = time.perf_counter()
+        rows, quantity, chunks = 0, 0, 0
+        for chunk in iter_sales(args.data_dir, chunk_rows=args.chunk_rows):
+            rows += len(chunk)
+            quantity += int(chunk["OrderQuantity"].sum())
+            chunks += 1
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"ventes : {rows:,d} lignes en {chunks} lots, quantité totale {quantity:,d}, "
+            f"{time.perf_counter() - start:.2f}s, pic RSS {peak:.0f} Mo"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datasets import file_signature
+
+# ---------------------------
+# Copies colonnaires des CSV de data/ (Arrow / Parquet)
+# ---------------------------
+#
+# Au premier chargement d'un CSV avec des options de lecture données, le
+# DataFrame obtenu est écrit au format Arrow IPC, sans compression, dans
+# .columnar/ (un sous-dossier par dossier source, hors de data/ : les
+# fichiers servis restent seuls) : les lectures suivantes projettent ce
+# fichier en mémoire (mmap) et les colonnes numériques sont utilisées sans
+# copie ni analyse de texte. La signature (mtime, taille) du CSV est stockée
+# dans les métadonnées : la copie est reconstruite dès que la source change,
+# et les copies périmées du même CSV (autres options de lecture) sont alors
+# supprimées. Une copie Parquet compressée (zstd, dictionnaires) est aussi
+# proposée au téléchargement.
+
+# 2 : un seul lot par fichier (colonnes contiguës, lisibles sans copie)
+COLUMNAR_VERSION = 2
+COLUMNAR_DIR = ".columnar"
+ARROW_SUFFIX = ".arrow"
+PARQUET_SUFFIX = ".parquet"
+PARQUET_COMPRESSION = "zstd"
+# Options de lecture qui produisent un itérateur : pas de copie colonnaire
+STREAMING_OPTIONS = {"chunksize", "iterator", "nrows", "skiprows"}
+# Lecture brute : UTF-8, sinon latin-1 (exports CRM en Windows-1252)
+RAW_OPTIONS = [{"low_memory": False}, {"low_memory": False, "encoding": "latin-1"}]
+
+
+def options_key(read_csv_kwargs: dict) -> str:
+    if not read_csv_kwargs:
+        return ""
+    text = json.dumps(read_csv_kwargs, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode()).hexdigest()[:10]
+
+
+def copy_dir(path: str) -> str:
+    # Un sous-dossier par dossier source : data/ et les jeux synthétiques
+    # des benchmarks contiennent des fichiers de même nom
+    source_dir = os.path.abspath(os.path.dirname(path))
+    key = hashlib.sha1(source_dir.encode()).hexdigest()[:10]
+    return os.path.join(COLUMNAR_DIR, f"{os.path.basename(source_dir)}-{key}")
+
+
+def arrow_path(path: str, read_csv_kwargs: dict | None = None) -> str:
+    key = options_key(read_csv_kwargs or {})
+    name = os.path.basename(path)
+    return os.path.join(copy_dir(path), f"{name}.{key}{ARROW_SUFFIX}" if key else name + ARROW_SUFFIX)
+
+
+def parquet_path(path: str) -> str:
+    return os.path.join(copy_dir(path), os.path.basename(path) + PARQUET_SUFFIX)
+
+
+def _source_metadata(path: str) -> dict[bytes, bytes]:
+    mtime_ns, size = file_signature(path)
+    return {
+        b"columnar_version": str(COLUMNAR_VERSION).encode(),
+        b"source_mtime_ns": str(mtime_ns).encode(),
+        b"source_size": str(size).encode(),
+    }
+
+
+def _is_fresh(metadata: dict[bytes, bytes] | None, path: str) -> bool:
+    if not metadata:
+        return False
+    expected = _source_metadata(path)
+    return all(metadata.get(k) == v for k, v in expected.items())
+
+
+def _tmp_path(target: str) -> str:
+    return f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _open_arrow(target: str) -> pa.Table:
+    # Tampons adossés au fichier projeté : rien n'est copié à l'ouverture
+    return pa.ipc.open_file(pa.memory_map(target)).read_all()
+
+
+def _copy_metadata(target: str) -> dict[bytes, bytes] | None:
+    try:
+        if target.endswith(PARQUET_SUFFIX):
+            return pq.read_schema(target).metadata
+        with pa.memory_map(target) as source:
+            return pa.ipc.open_file(source).schema.metadata
+    except (pa.ArrowInvalid, OSError):
+        return None
+
+
+def remove_stale(path: str):
+    # Copies du même CSV dont la signature ne correspond plus (source modifiée,
+    # version précédente) ; les copies à jour d'autres options sont gardées.
+    # Un lecteur qui projette encore un fichier supprimé le garde jusqu'à sa fermeture.
+    name = os.path.basename(path)
+    directory = copy_dir(path)
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if (
+                entry.name.startswith(name + ".") and entry.name.endswith((ARROW_SUFFIX, PARQUET_SUFFIX))
+                and not _is_fresh(_copy_metadata(entry.path), path)
+            ):
+                with contextlib.suppress(OSError):
+                    os.remove(entry.path)
+    # Anciennes copies écrites à côté du CSV, dans data/
+    source_dir = os.path.dirname(path) or "."
+    for entry in os.scandir(source_dir):
+        if entry.name.startswith(name + ".") and entry.name.endswith((ARROW_SUFFIX, PARQUET_SUFFIX)):
+            with contextlib.suppress(OSError):
+                os.remove(entry.path)
+
+
+def build_arrow(path: str, **read_csv_kwargs) -> pa.Table:
+    df = pd.read_csv(path, **read_csv_kwargs)
+    # Les colonnes texte lues par blocs arrivent morcelées : regroupées pour que
+    # chaque colonne soit un tampon contigu dans le fichier
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    table = table.replace_schema_metadata({**table.schema.metadata, **_source_metadata(path)})
+    target = arrow_path(path, read_csv_kwargs)
+    tmp = _tmp_path(target)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, target)
+        remove_stale(path)
+    except OSError:
+        # Disque en lecture seule : on sert le résultat sans le garder
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return table
+    return _open_arrow(target)
+
+
+def open_table(path: str, **read_csv_kwargs) -> pa.Table:
+    target = arrow_path(path, read_csv_kwargs)
+    if os.path.exists(target):
+        try:
+            table = _open_arrow(target)
+            if _is_fresh(table.schema.metadata, path):
+                return table
+        except (pa.ArrowInvalid, OSError):
+            # Copie tronquée ou illisible : reconstruite ci-dessous
+            pass
+    return build_arrow(path, **read_csv_kwargs)
+
+
+def read_csv(path: str, **read_csv_kwargs):
+    # Remplaçant de pd.read_csv : même résultat (types compris), lu depuis la
+    # copie Arrow. usecols est appliqué sur la copie complète.
+    if STREAMING_OPTIONS & set(read_csv_kwargs):
+        return pd.read_csv(path, **read_csv_kwargs)
+    usecols = read_csv_kwargs.pop("usecols", None)
+    table = open_table(path, **read_csv_kwargs)
+    if usecols is not None:
+        table = table.select([c for c in table.column_names if c in set(usecols)])
+    return to_pandas(table)
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    # Un bloc par colonne : les colonnes numériques et dates restent des vues
+    # (lecture seule) sur les tampons projetés, sans copie ; le texte est converti
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def _read_raw(reader, path: str, **read_csv_kwargs):
+    # Fichier tel que le verront les étudiant·e·s (types déduits), UTF-8 ou
+    # latin-1 : l'encodage d'une copie déjà construite est essayé en premier
+    candidates = sorted(RAW_OPTIONS, key=lambda o: not os.path.exists(arrow_path(path, o)))
+    for options in candidates[:-1]:
+        try:
+            return reader(path, **options, **read_csv_kwargs)
+        except UnicodeDecodeError:
+            pass
+    return reader(path, **candidates[-1], **read_csv_kwargs)
+
+
+def open_raw(path: str) -> pa.Table:
+    return _read_raw(open_table, path)
+
+
+def read_raw(path: str, **read_csv_kwargs) -> pd.DataFrame:
+    return _read_raw(read_csv, path, **read_csv_kwargs)
+
+
+def get_parquet(path: str) -> str:
+    # Copie Parquet proposée au téléchargement, construite depuis la copie Arrow
+    target = parquet_path(path)
+    if os.path.exists(target):
+        try:
+            if _is_fresh(pq.read_schema(target).metadata, path):
+                return target
+        except (pa.ArrowInvalid, OSError):
+            pass
+    table = open_raw(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = _tmp_path(target)
+    pq.write_table(table, tmp, compression=PARQUET_COMPRESSION)
+    os.replace(tmp, target)
+    remove_stale(path)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copies Arrow / Parquet des CSV de data/")
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    for name in sorted(os.listdir(args.data_dir)):
+        if not name.endswith(".csv"):
+            continue
+        path = os.path.join(args.data_dir, name)
+        start = time.perf_counter()
+        target = get_parquet(path)
+        print(
+            f"{name:50s} csv={os.path.getsize(path) / 2**20:7.2f} Mo "
+            f"arrow={open_raw(path).nbytes / 2**20:7.2f} Mo "
+            f"parquet={os.path.getsize(target) / 2**20:7.2f} Mo ({time.perf_counter() - start:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import contextlib
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# ---------------------------
+# Cache partagé des jeux de données
+# ---------------------------
+#
+# Un seul exemplaire de chaque fichier en mémoire pour tout le processus,
+# relu uniquement quand sa signature (mtime, taille) change. Les entrées les
+# moins récemment servies sont évincées au-delà de max_bytes.
+
+
+def file_signature(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class KeyedLocks:
+    # Un verrou par clé en cours de chargement : l'entrée est retirée quand
+    # plus aucun thread ne la tient ni ne l'attend, le dictionnaire ne garde
+    # donc que les chargements en cours
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: dict[str, list] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
+
+    @contextlib.contextmanager
+    def hold(self, key: str):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+class DatasetCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = KeyedLocks()
+
+    def _lookup(self, path: str, signature: tuple[int, int]) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.stats["hits"] += 1
+                return entry[1]
+            return None
+
+    def get(self, path: str) -> bytes:
+        signature = file_signature(path)
+        data = self._lookup(path, signature)
+        if data is not None:
+            return data
+        # Une seule lecture disque par fichier, même si plusieurs sessions arrivent ensemble
+        with self._loading.hold(path):
+            data = self._lookup(path, signature)
+            if data is not None:
+                return data
+            with open(path, "rb") as f:
+                data = f.read()
+            self._store(path, signature, data)
+        return data
+
+    def _store(self, path: str, signature: tuple[int, int], data: bytes):
+        with self._lock:
+            self.stats["misses"] += 1
+            self._discard(path)
+            # Un fichier plus gros que le cache entier est servi sans être gardé
+            if len(data) <= self.max_bytes:
+                self._entries[path] = (signature, data)
+                self.total_bytes += len(data)
+                while self.total_bytes > self.max_bytes:
+                    oldest = next(iter(self._entries))
+                    self._discard(oldest)
+                    self.stats["evictions"] += 1
+
+    def _discard(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= len(entry[1])
@@ -0,0 +1,356 @@
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import columnar
+
+# ---------------------------
+# Pipeline ETL de référence – AdventureWorks
+# ---------------------------
+#
+# Extract : lecture avec des schémas de types explicites (clés int32,
+#           catégories pour les colonnes à faible cardinalité, dates parsées).
+# Transform : nettoyage vectorisé, jointures par index de clé, colonnes
+#             dérivées OrderYear / LineTotal / LineCost / Margin.
+# Load : CSV unique et/ou table SQLite.
+#
+# Les CSV sont lus via columnar.read_csv : après la première lecture, le
+# résultat typé est relu depuis une copie Arrow projetée en mémoire.
+
+DATA_DIR = "data"
+SALES_FILE = "AdventureWorks Sales Data {year}.csv"
+CUSTOMER_FILE = "AdventureWorks Customer Lookup.csv"
+PRODUCT_FILE = "AdventureWorks Product Lookup.csv"
+SUBCATEGORY_FILE = "AdventureWorks Product Subcategories Lookup.csv"
+CATEGORY_FILE = "AdventureWorks Product Categories Lookup.csv"
+TERRITORY_FILE = "AdventureWorks Territory Lookup.csv"
+RETURNS_FILE = "AdventureWorks Returns Data.csv"
+CALENDAR_FILE = "AdventureWorks Calendar Lookup.csv"
+
+# Les exports CRM sont en Windows-1252 (É, è...) et non en UTF-8
+LOOKUP_ENCODING = "latin-1"
+
+SALES_DTYPES = {
+    "OrderNumber": "string",
+    "ProductKey": "int32",
+    "CustomerKey": "int32",
+    "TerritoryKey": "int32",
+    "OrderLineItem": "int32",
+    "OrderQuantity": "int32",
+}
+SALES_DATES = ["OrderDate", "StockDate"]
+SALES_KEY = ["OrderNumber", "OrderLineItem"]
+
+CUSTOMER_DTYPES = {
+    # Lue comme texte : l'export contient des lignes parasites en fin de fichier
+    "CustomerKey": "string",
+    "Prefix": "category",
+    "FirstName": "string",
+    "LastName": "string",
+    "MaritalStatus": "category",
+    "Gender": "category",
+    "EmailAddress": "string",
+    "AnnualIncome": "float64",
+    "TotalChildren": "float32",
+    "EducationLevel": "category",
+    "Occupation": "category",
+    "HomeOwner": "category",
+}
+CUSTOMER_DATES = ["BirthDate"]
+
+PRODUCT_DTYPES = {
+    "ProductKey": "int32",
+    "ProductSubcategoryKey": "int32",
+    "ProductSKU": "string",
+    "ProductName": "string",
+    "ModelName": "category",
+    "ProductDescription": "string",
+    "ProductColor": "category",
+    "ProductSize": "category",
+    "ProductStyle": "category",
+    "ProductCost": "float64",
+    "ProductPrice": "float64",
+}
+SUBCATEGORY_DTYPES = {
+    "ProductSubcategoryKey": "int32",
+    "SubcategoryName": "category",
+    "ProductCategoryKey": "int32",
+}
+CATEGORY_DTYPES = {"ProductCategoryKey": "int32", "CategoryName": "category"}
+TERRITORY_DTYPES = {
+    "SalesTerritoryKey": "int32",
+    "Region": "category",
+    "Country": "category",
+    "Continent": "category",
+}
+RETURNS_DTYPES = {"TerritoryKey": "int32", "ProductKey": "int32", "ReturnQuantity": "int32"}
+RETURNS_DATES = ["ReturnDate"]
+CALENDAR_DATES = ["Date"]
+
+# Colonnes des référentiels reportées dans la table intégrée
+CUSTOMER_COLUMNS = ["FirstName", "LastName", "Gender", "MaritalStatus", "AnnualIncome"]
+PRODUCT_COLUMNS = [
+    "ProductName", "ProductSKU", "ProductCost", "ProductPrice", "SubcategoryName", "CategoryName",
+]
+TERRITORY_COLUMNS = ["Region", "Country", "Continent"]
+
+
+# ---------------------------
+# E – Extract
+# ---------------------------
+
+def sales_files(data_dir: str = DATA_DIR) -> list[str]:
+    # Un fichier de ventes par année ; les fichiers annexes (.profile.json...) sont ignorés
+    prefix, suffix = SALES_FILE.split("{year}")
+    return sorted(
+        os.path.join(data_dir, f) for f in os.listdir(data_dir)
+        if f.startswith(prefix) and f.endswith(suffix)
+    )
+
+
+def extract_sales(path: str, **read_csv_kwargs) -> pd.DataFrame:
+    return columnar.read_csv(path, dtype=SALES_DTYPES, parse_dates=SALES_DATES, **read_csv_kwargs)
+
+
+def extract_customers(path: str) -> pd.DataFrame:
+    df = columnar.read_csv(
+        path, dtype=CUSTOMER_DTYPES, parse_dates=CUSTOMER_DATES, encoding=LOOKUP_ENCODING
+    )
+    # Conversion de la clé en une seule passe ; les lignes non numériques sont écartées
+    keys = pd.to_numeric(df["CustomerKey"], errors="coerce")
+    df = df[keys.notna()].assign(CustomerKey=keys[keys.notna()].astype("int32"))
+    return df.drop_duplicates("CustomerKey").reset_index(drop=True)
+
+
+def extract_products(path: str) -> pd.DataFrame:
+    return columnar.read_csv(path, dtype=PRODUCT_DTYPES)
+
+
+def extract_subcategories(path: str) -> pd.DataFrame:
+    return columnar.read_csv(path, dtype=SUBCATEGORY_DTYPES)
+
+
+def extract_categories(path: str) -> pd.DataFrame:
+    return columnar.read_csv(path, dtype=CATEGORY_DTYPES)
+
+
+def extract_territories(path: str) -> pd.DataFrame:
+    # La clé s'appelle SalesTerritoryKey dans le référentiel, TerritoryKey dans les ventes
+    df = columnar.read_csv(path, dtype=TERRITORY_DTYPES)
+    return df.rename(columns={"SalesTerritoryKey": "TerritoryKey"})
+
+
+def extract_returns(path: str) -> pd.DataFrame:
+    return columnar.read_csv(path, dtype=RETURNS_DTYPES, parse_dates=RETURNS_DATES)
+
+
+def extract_calendar(path: str) -> pd.DataFrame:
+    return columnar.read_csv(path, parse_dates=CALENDAR_DATES)
+
+
+def extract_lookups(data_dir: str = DATA_DIR) -> dict[str, pd.DataFrame]:
+    return {
+        "customers": extract_customers(os.path.join(data_dir, CUSTOMER_FILE)),
+        "products": build_products(
+            extract_products(os.path.join(data_dir, PRODUCT_FILE)),
+            extract_subcategories(os.path.join(data_dir, SUBCATEGORY_FILE)),
+            extract_categories(os.path.join(data_dir, CATEGORY_FILE)),
+        ),
+        "territories": extract_territories(os.path.join(data_dir, TERRITORY_FILE)),
+    }
+
+
+# ---------------------------
+# T – Transform
+# ---------------------------
+
+def clean_sales(sales: pd.DataFrame, report: dict | None = None) -> pd.DataFrame:
+    report = report if report is not None else {}
+    report["rows_in"] = report.get("rows_in", 0) + len(sales)
+
+    invalid_qty = sales["OrderQuantity"].to_numpy() <= 0
+    missing = sales[SALES_KEY + ["OrderDate"]].isna().any(axis=1).to_numpy()
+    keep = ~(invalid_qty | missing)
+    report["invalid_quantity"] = report.get("invalid_quantity", 0) + int(invalid_qty.sum())
+    report["missing_values"] = report.get("missing_values", 0) + int((missing & ~invalid_qty).sum())
+    sales = sales[keep]
+
+    duplicated = sales.duplicated(SALES_KEY).to_numpy()
+    report["duplicates"] = report.get("duplicates", 0) + int(duplicated.sum())
+    return sales[~duplicated]
+
+
+def build_products(
+    products: pd.DataFrame, subcategories: pd.DataFrame, categories: pd.DataFrame
+) -> pd.DataFrame:
+    # Produit -> sous-catégorie -> catégorie, sur des référentiels indexés par clé
+    products = lookup_join(
+        products, subcategories.set_index("ProductSubcategoryKey"), "ProductSubcategoryKey",
+        ["SubcategoryName", "ProductCategoryKey"], how="left",
+    )
+    return lookup_join(
+        products, categories.set_index("ProductCategoryKey"), "ProductCategoryKey",
+        ["CategoryName"], how="left",
+    )
+
+
+def lookup_join(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    key: str,
+    columns: list[str],
+    how: str = "inner",
+    report: dict | None = None,
+) -> pd.DataFrame:
+    # Jointure par position : right est indexé sur sa clé (unique), on calcule
+    # une fois les positions des clés de gauche puis on prend les colonnes.
+    positions = right.index.get_indexer(left[key].to_numpy())
+    found = positions >= 0
+    if report is not None:
+        report[f"orphan_{key}"] = report.get(f"orphan_{key}", 0) + int((~found).sum())
+    if how == "inner" and not found.all():
+        left = left[found]
+        positions = positions[found]
+    out = {}
+    for col in columns:
+        values = right[col]
+        if how == "left" and not found.all():
+            taken = values.iloc[np.where(found, positions, 0)].reset_index(drop=True)
+            out[col] = taken.where(found)
+        else:
+            out[col] = values.iloc[positions].reset_index(drop=True)
+    return pd.concat([left.reset_index(drop=True), pd.DataFrame(out)], axis=1)
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    qty = df["OrderQuantity"].to_numpy()
+    line_total = qty * df["ProductPrice"].to_numpy()
+    line_cost = qty * df["ProductCost"].to_numpy()
+    return df.assign(
+        OrderYear=df["OrderDate"].dt.year.astype("int16"),
+        OrderMonth=df["OrderDate"].dt.to_period("M").astype("string"),
+        LineTotal=line_total,
+        LineCost=line_cost,
+        Margin=line_total - line_cost,
+    )
+
+
+def index_lookups(lookups: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    # Indexation une fois pour toutes, réutilisable sur chaque lot de ventes
+    return {
+        "customers": lookups["customers"].set_index("CustomerKey"),
+        "products": lookups["products"].set_index("ProductKey"),
+        "territories": lookups["territories"].set_index("TerritoryKey"),
+    }
+
+
+def enrich(
+    sales: pd.DataFrame, indexed: dict[str, pd.DataFrame], report: dict | None = None
+) -> pd.DataFrame:
+    df = lookup_join(sales, indexed["customers"], "CustomerKey", CUSTOMER_COLUMNS, report=report)
+    df = lookup_join(df, indexed["products"], "ProductKey", PRODUCT_COLUMNS, report=report)
+    return lookup_join(df, indexed["territories"], "TerritoryKey", TERRITORY_COLUMNS, report=report)
+
+
+def transform(
+    sales: pd.DataFrame, lookups: dict[str, pd.DataFrame], report: dict | None = None
+) -> pd.DataFrame:
+    report = report if report is not None else {}
+    df = clean_sales(sales, report)
+    df = enrich(df, index_lookups(lookups), report)
+    df = add_derived_columns(df)
+    report["rows_out"] = report.get("rows_out", 0) + len(df)
+    return df
+
+
+# ---------------------------
+# L – Load
+# ---------------------------
+
+def load_csv(df: pd.DataFrame, path: str):
+    df.to_csv(path, index=False)
+
+
+def load_sqlite(df: pd.DataFrame, path: str, table: str = "sales"):
+    with sqlite3.connect(path) as conn:
+        df.to_sql(table, conn, if_exists="replace", index=False, chunksize=50_000)
+
+
+# ---------------------------
+# KPIs
+# ---------------------------
+
+def kpi_revenue_by_month_category(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df.groupby(["OrderMonth", "CategoryName"], observed=True)
+        .agg(Revenue=("LineTotal", "sum"), Quantity=("OrderQuantity", "sum"))
+        .reset_index()
+    )
+
+
+def kpi_top_customers(df: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    return (
+        df.groupby("CustomerKey")
+        .agg(Revenue=("LineTotal", "sum"))
+        .nlargest(n, "Revenue")
+        .reset_index()
+    )
+
+
+def kpi_revenue_by_territory(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df.groupby(["TerritoryKey", "Region", "Country"], observed=True)
+        .agg(Revenue=("LineTotal", "sum"))
+        .reset_index()
+        .sort_values("Revenue", ascending=False, ignore_index=True)
+    )
+
+
+def compute_kpis(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    return {
+        "revenue_by_month_category": kpi_revenue_by_month_category(df),
+        "top_customers": kpi_top_customers(df),
+        "revenue_by_territory": kpi_revenue_by_territory(df),
+    }
+
+
+# ---------------------------
+# Pipeline complet
+# ---------------------------
+
+def run_pipeline(
+    years=(2020,), data_dir: str = DATA_DIR, report: dict | None = None
+) -> pd.DataFrame:
+    report = report if report is not None else {}
+    lookups = extract_lookups(data_dir)
+    sales = pd.concat(
+        [extract_sales(os.path.join(data_dir, SALES_FILE.format(year=y))) for y in years],
+        ignore_index=True,
+    )
+    return transform(sales, lookups, report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline ETL de référence AdventureWorks")
+    parser.add_argument("--years", type=int, nargs="+", default=[2020])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default="clean_adventureworks_sales_2020.csv")
+    parser.add_argument("--sqlite", help="Base SQLite optionnelle (table sales)")
+    args = parser.parse_args()
+
+    report: dict = {}
+    df = run_pipeline(args.years, args.data_dir, report)
+    load_csv(df, args.output)
+    if args.sqlite:
+        load_sqlite(df, args.sqlite)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    for name, kpi in compute_kpis(df).items():
+        print(f"\n{name}\n{kpi.head(10).to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    main()
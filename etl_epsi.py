@@ -1,10 +1,33 @@
 import streamlit as st
 import os
-import base64
-import requests
-from datetime import datetime, timezone
+import time
+import functools
+import hmac
+import io
+import math
+import uuid
+from typing import BinaryIO
+from datetime import date, datetime, timezone
 import re
 
+import requests
+
+from blob_cache import CACHE_DIR as DEFAULT_BLOB_CACHE_DIR, BlobCache
+from bundle import BUNDLE_PATH as DEFAULT_BUNDLE_PATH, bundle_info, ensure_bundle
+from catalog import CATALOG, relations
+from columnar import get_parquet
+from datasets import DatasetCache
+from extracts import EXTRACT_DIR as DEFAULT_EXTRACT_DIR, ExtractCache, ExtractFilter, filter_options
+from github_api import GITHUB_API_URL, GitHubError, GitHubRepo, make_session
+from metrics import HISTORY_DAYS as DEFAULT_HISTORY_DAYS, HISTORY_INTERVAL as DEFAULT_HISTORY_INTERVAL
+from metrics import MetricsDumper, MetricsRegistry, SessionTracker
+from notebooks import MAX_OUTPUT_BYTES, MAX_TOTAL_OUTPUT_BYTES, NotebookError, preview_cells, strip_notebook
+from pdf_text import PdfError, extract_text
+from profiles import get_profile
+from spool import DONE, FAILED, SubmissionSpool, UploadWorker
+from sql_sandbox import QueryError, connect_readonly, ensure_database, run_query, schema
+from submission_index import INDEX_PATH, SubmissionIndex
+
 # ---------------------------
 # CONFIG
 # ---------------------------
@@ -16,14 +39,59 @@ st.set_page_config(
 
 GITHUB_REPO = "orkhoven/etl_epsi"
 GITHUB_TOKEN = st.secrets["GITHUB_TOKEN"]
+GITHUB_BRANCH = st.secrets.get("GITHUB_BRANCH", "main")
+GITHUB_API = st.secrets.get("GITHUB_API_URL", GITHUB_API_URL)
 SUBMISSIONS_DIR = "submissions"
-
-DATA_FILES = [
-    ("Ventes 2020 (Sales)", "data/AdventureWorks Sales Data 2020.csv"),
-    ("Clients (Customer Lookup)", "data/AdventureWorks Customer Lookup.csv"),
-    ("Produits (Product Lookup)", "data/AdventureWorks Product Lookup.csv"),
-    ("Territoires (Territory Lookup)", "data/AdventureWorks Territory Lookup.csv"),
-]
+SPOOL_DIR = st.secrets.get("SPOOL_DIR", ".spool")
+UPLOAD_WORKERS = int(st.secrets.get("UPLOAD_WORKERS", 4))
+DATASET_CACHE_MB = int(st.secrets.get("DATASET_CACHE_MB", 64))
+# Archive « Tout télécharger » : construite sur disque, refaite si une source change
+BUNDLE_PATH = st.secrets.get("BUNDLE_PATH", DEFAULT_BUNDLE_PATH)
+# Extraits filtrés des ventes : copies triées et résultats gardés sur disque
+EXTRACT_DIR = st.secrets.get("EXTRACT_DIR", DEFAULT_EXTRACT_DIR)
+EXTRACT_CACHE_MB = int(st.secrets.get("EXTRACT_CACHE_MB", 512))
+# Tailles maximales acceptées, vérifiées avant toute écriture ou envoi
+MAX_CODE_MB = float(st.secrets.get("MAX_CODE_MB", 20))
+MAX_REPORT_MB = float(st.secrets.get("MAX_REPORT_MB", 20))
+# Sorties de notebook conservées au dépôt (au-delà : remplacées par un message)
+NOTEBOOK_MAX_OUTPUT_BYTES = int(st.secrets.get("NOTEBOOK_MAX_OUTPUT_BYTES", MAX_OUTPUT_BYTES))
+NOTEBOOK_MAX_TOTAL_OUTPUT_BYTES = int(st.secrets.get("NOTEBOOK_MAX_TOTAL_OUTPUT_BYTES", MAX_TOTAL_OUTPUT_BYTES))
+# Affiche dans la barre latérale le coût de chaque exécution (script / onglet)
+SHOW_TIMINGS = bool(st.secrets.get("SHOW_TIMINGS", False))
+TIMINGS_KEPT = 100
+# Onglet d'administration (métriques) : visible après saisie de ce mot de passe
+ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD", "")
+# Export Prometheus écrit périodiquement sur disque (+ historique journalier)
+METRICS_PATH = st.secrets.get("METRICS_PATH", ".metrics/metrics.prom")
+METRICS_HISTORY_DIR = st.secrets.get("METRICS_HISTORY_DIR", ".metrics/history")
+METRICS_DUMP_INTERVAL = float(st.secrets.get("METRICS_DUMP_INTERVAL", 30))
+# Historique : un instantané toutes les METRICS_HISTORY_INTERVAL s, gardé METRICS_HISTORY_DAYS jours
+METRICS_HISTORY_INTERVAL = float(st.secrets.get("METRICS_HISTORY_INTERVAL", DEFAULT_HISTORY_INTERVAL))
+METRICS_HISTORY_DAYS = int(st.secrets.get("METRICS_HISTORY_DAYS", DEFAULT_HISTORY_DAYS))
+# Console SQL : base partagée en lecture seule, requêtes bornées en temps et en lignes
+SANDBOX_DB = st.secrets.get("SANDBOX_DB", ".sandbox/adventureworks.sqlite3")
+SQL_TIMEOUT_S = float(st.secrets.get("SQL_TIMEOUT_S", 5))
+SQL_MAX_ROWS = int(st.secrets.get("SQL_MAX_ROWS", 10_000))
+SQL_PAGE_ROWS = int(st.secrets.get("SQL_PAGE_ROWS", 200))
+SQL_EXAMPLE = """SELECT c.CategoryName, COUNT(*) AS lignes, SUM(s.OrderQuantity) AS quantite
+FROM sales s
+JOIN products p ON p.ProductKey = s.ProductKey
+JOIN subcategories sc ON sc.ProductSubcategoryKey = p.ProductSubcategoryKey
+JOIN categories c ON c.ProductCategoryKey = sc.ProductCategoryKey
+GROUP BY c.CategoryName
+ORDER BY quantite DESC"""
+# Revue des dépôts (formateur) : index local paginé, fichiers lus à l'ouverture
+# d'un dépôt puis gardés dans un cache disque borné (clé : SHA du blob)
+SUBMISSION_INDEX = st.secrets.get("SUBMISSION_INDEX", INDEX_PATH)
+BLOB_CACHE_DIR = st.secrets.get("BLOB_CACHE_DIR", DEFAULT_BLOB_CACHE_DIR)
+BLOB_CACHE_MB = int(st.secrets.get("BLOB_CACHE_MB", 256))
+REVIEW_PAGE_SIZE = int(st.secrets.get("REVIEW_PAGE_SIZE", 20))
+# Ligne de meta.txt qui situe le notebook original gardé dans le spool
+ORIGINAL_NOTEBOOK_RE = re.compile(r"^Notebook original : .*\b([0-9a-f]{64})\s*$", re.MULTILINE)
+
+RERUN_START = time.perf_counter()
+
+DATA_DIR = "data"
 
 
 # ---------------------------
@@ -39,30 +107,186 @@ def slugify(text: str, default: str = "etudiant") -> str:
     return text or default
 
 
-def upload_to_github_bytes(
-    file_bytes: bytes,
-    dest_path: str,
-    repo: str,
-    token: str,
-    commit_msg: str | None = None
-) -> int:
-    api_url = f"https://api.github.com/repos/{repo}/contents/{dest_path}"
+def too_large(uploaded_file, limit_mb: float) -> bool:
+    # UploadedFile.size est connu sans lire le contenu
+    return uploaded_file is not None and uploaded_file.size > limit_mb * 2**20
+
+
+def prepare_code(code_file, keep_original: bool) -> tuple[bytes | BinaryIO, dict | None]:
+    # Notebook allégé (sorties plafonnées, métadonnées normalisées) sauf si
+    # l'original est demandé ; un notebook illisible est envoyé tel quel
+    code_file.seek(0)
+    if keep_original or not code_file.name.lower().endswith(".ipynb"):
+        return code_file, None
+    metrics = get_metrics()
+    try:
+        with metrics.histogram("notebook_strip_seconds", "Allègement d'un notebook déposé").time():
+            data, stats = strip_notebook(
+                code_file,
+                max_output_bytes=NOTEBOOK_MAX_OUTPUT_BYTES,
+                max_total_output_bytes=NOTEBOOK_MAX_TOTAL_OUTPUT_BYTES,
+            )
+    except NotebookError as e:
+        st.warning(f"Notebook envoyé sans allègement ({e}).")
+        code_file.seek(0)
+        return code_file, None
+    metrics.counter(
+        "notebook_bytes_saved_total", "Octets de notebook non envoyés grâce à l'allègement"
+    ).inc(max(stats["saved_bytes"], 0))
+    return data, stats
+
+
+def record_timing(section: str, seconds: float):
+    timings = st.session_state.setdefault("rerun_timings", [])
+    timings.append({"section": section, "ms": round(seconds * 1000, 2), "at": time.time()})
+    del timings[:-TIMINGS_KEPT]
+    get_metrics().histogram(
+        "app_rerun_seconds", "Durée des exécutions du script et des onglets", ("section",)
+    ).observe(seconds, section=section)
+    get_session_tracker().touch(st.session_state.setdefault("session_id", uuid.uuid4().hex))
+
+
+def timed(section: str):
+    # Mesure chaque exécution de la fonction (y compris les reruns de fragment)
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_timing(section, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@st.cache_resource
+def get_metrics() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    MetricsDumper(
+        registry, METRICS_PATH, METRICS_DUMP_INTERVAL, METRICS_HISTORY_DIR,
+        METRICS_HISTORY_INTERVAL, METRICS_HISTORY_DAYS,
+    ).start()
+    return registry
+
+
+@st.cache_resource
+def get_session_tracker() -> SessionTracker:
+    tracker = SessionTracker()
+    get_metrics().gauge(
+        "app_active_sessions", "Sessions actives (vues depuis moins de 5 min)", tracker.active
+    )
+    return tracker
+
+
+@st.cache_resource
+def get_upload_worker() -> UploadWorker:
+    # Un seul spool et un seul worker par processus, partagés par toutes les sessions
+    github = GitHubRepo(
+        GITHUB_REPO,
+        GITHUB_TOKEN,
+        branch=GITHUB_BRANCH,
+        api_url=GITHUB_API,
+        session=make_session(UPLOAD_WORKERS),
+        max_file_bytes=int(max(MAX_CODE_MB, MAX_REPORT_MB) * 2**20),
+        metrics=get_metrics(),
+    )
+    return UploadWorker(
+        SubmissionSpool(SPOOL_DIR), github, max_workers=UPLOAD_WORKERS, metrics=get_metrics()
+    ).start()
+
+
+@st.cache_resource
+def get_dataset_cache() -> DatasetCache:
+    return DatasetCache(max_bytes=DATASET_CACHE_MB * 1024 * 1024)
 
-    content_b64 = base64.b64encode(file_bytes).decode("utf-8")
 
-    headers = {"Authorization": f"token {token}"}
-    data = {
-        "message": commit_msg or f"Add {dest_path}",
-        "content": content_b64,
-    }
+def parquet_data(path: str) -> bytes:
+    # Copie Parquet construite au premier téléchargement, puis servie depuis le cache
+    return get_dataset_cache().get(get_parquet(path))
 
-    resp = requests.put(api_url, headers=headers, json=data)
 
-    if resp.status_code not in (200, 201):
-        st.error(f"Erreur GitHub ({resp.status_code}) pour {dest_path} : {resp.text}")
-    else:
-        st.info(f"Fichier envoyé : {dest_path}")
-    return resp.status_code
+def bundle_data() -> bytes:
+    # Vérification de fraîcheur (signatures) à chaque clic ; les octets sont
+    # partagés par toutes les sessions via le cache de fichiers
+    with get_metrics().histogram("bundle_ensure_seconds", "Vérification / construction de l'archive").time():
+        path = ensure_bundle(DATA_DIR, BUNDLE_PATH)
+    return get_dataset_cache().get(path)
+
+
+@st.cache_resource
+def get_extract_cache() -> ExtractCache:
+    return ExtractCache(EXTRACT_DIR, DATA_DIR, EXTRACT_CACHE_MB * 1024 * 1024)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def extract_options() -> dict:
+    return filter_options(DATA_DIR)
+
+
+def prepare_extract(extract_filter: ExtractFilter, fmt: str) -> dict:
+    # Produit une fois par signature de filtre, pour toutes les sessions
+    start = time.perf_counter()
+    _, info = get_extract_cache().get(extract_filter, fmt)
+    get_metrics().histogram(
+        "extract_seconds", "Préparation d'un extrait filtré", ("cache",)
+    ).observe(time.perf_counter() - start, cache="hit" if info["cached"] else "miss")
+    return info
+
+
+def extract_data(extract_filter: ExtractFilter, fmt: str) -> bytes:
+    path, _ = get_extract_cache().get(extract_filter, fmt)
+    return get_dataset_cache().get(path)
+
+
+def served(kind: str, load, *args) -> bytes:
+    # Octets envoyés par type de téléchargement (csv, parquet, archive, extrait)
+    data = load(*args)
+    get_metrics().counter(
+        "dataset_bytes_served_total", "Octets de jeux de données téléchargés", ("format",)
+    ).inc(len(data), format=kind)
+    return data
+
+
+@st.cache_resource
+def get_sandbox_db() -> str:
+    # Base construite une fois par processus (ou reprise si les CSV n'ont pas changé)
+    return ensure_database(path=SANDBOX_DB)
+
+
+def get_sql_connection():
+    # Une connexion légère par session, ouverte au premier usage de la console
+    if "sql_conn" not in st.session_state:
+        st.session_state["sql_conn"] = connect_readonly(get_sandbox_db())
+    return st.session_state["sql_conn"]
+
+
+@st.cache_resource
+def get_review_repo() -> GitHubRepo:
+    # Lecture seule (arbres, blobs) : client distinct de celui du worker d'envoi
+    return GitHubRepo(
+        GITHUB_REPO, GITHUB_TOKEN, branch=GITHUB_BRANCH, api_url=GITHUB_API, metrics=get_metrics()
+    )
+
+
+@st.cache_resource
+def get_submission_index() -> SubmissionIndex:
+    return SubmissionIndex(SUBMISSION_INDEX)
+
+
+@st.cache_resource
+def get_blob_cache() -> BlobCache:
+    return BlobCache(BLOB_CACHE_DIR, BLOB_CACHE_MB * 1024 * 1024)
+
+
+def blob_data(sha: str) -> bytes:
+    # Disque si le blob a déjà été ouvert (par n'importe quelle session), sinon GitHub
+    cache = get_blob_cache()
+    source = "cache" if sha in cache else "github"
+    with get_metrics().histogram(
+        "review_blob_seconds", "Lecture d'un fichier de dépôt", ("source",)
+    ).time(source=source):
+        return cache.get(sha, get_review_repo().blob)
 
 
 # ---------------------------
@@ -80,15 +304,42 @@ selcuk_orkun@yahoo.com
 """
 )
 
-tab_story, tab_instructions, tab_data, tab_submit = st.tabs(
-    ["Contexte & histoire", "Consignes & livrables", "Jeux de données", "Dépôt sur GitHub"]
-)
+def render_profile(path: str):
+    # Profil précalculé (fichier .profile.json), recalculé seulement si le CSV change
+    profile = get_profile(path)
+    columns = profile["columns"]
+    rows = f"{profile['rows']:,}".replace(",", " ")
+    with st.expander(f"Profil : {rows} lignes, {len(columns)} colonnes"):
+        st.dataframe(
+            [
+                {
+                    "colonne": c["name"], "type": c["dtype"], "renseignées": c["non_null"],
+                    "manquantes": c["nulls"], "distinctes": c["unique"],
+                    "min": "" if c["min"] is None else str(c["min"]),
+                    "max": "" if c["max"] is None else str(c["max"]),
+                }
+                for c in columns
+            ],
+            hide_index=True,
+        )
+        defects = {k: v for k, v in profile["defects"].items() if v}
+        if defects:
+            st.markdown("**Défauts détectés** : " + ", ".join(f"`{k}` = {v}" for k, v in defects.items()))
+        else:
+            st.caption("Aucun défaut détecté parmi les contrôles automatiques.")
+
+
+# Chaque onglet est un fragment : une interaction dans un onglet (saisie,
+# envoi du formulaire, actualisation) ne réexécute que cet onglet. Seul
+# l'onglet ouvert est exécuté (voir la construction des onglets en bas).
 
 # ---------------------------
 # Onglet 1 – Contexte & histoire
 # ---------------------------
 
-with tab_story:
+@st.fragment
+@timed("contexte")
+def render_story():
     st.header("Contexte : l’entreprise AdventureWorks")
 
     st.markdown(
@@ -137,7 +388,9 @@ Ce que vous faites ici en Python sera **rejoué avec un outil ETL** lors de la s
 # Onglet 2 – Consignes & livrables
 # ---------------------------
 
-with tab_instructions:
+@st.fragment
+@timed("consignes")
+def render_instructions():
     st.header("Consignes pour les étudiant·e·s")
 
     st.markdown(
@@ -229,41 +482,129 @@ Le dépôt sur GitHub est géré automatiquement par cette application.
 # Onglet 3 – Jeux de données
 # ---------------------------
 
-with tab_data:
+def render_file(path: str):
+    if not os.path.exists(path):
+        st.warning(
+            f"Fichier introuvable : {path}. "
+            "Le formateur doit ajouter ce fichier dans le répertoire de l’application."
+        )
+        return
+    # Contenu lu seulement au clic (thread séparé), sans rerun de la page
+    st.download_button(
+        label=f"Télécharger : {os.path.basename(path)}",
+        data=functools.partial(served, "csv", get_dataset_cache().get, path),
+        file_name=os.path.basename(path),
+        mime="text/csv",
+        on_click="ignore",
+    )
+    st.download_button(
+        label="Format Parquet (colonnes typées, compressé)",
+        data=functools.partial(served, "parquet", parquet_data, path),
+        file_name=os.path.splitext(os.path.basename(path))[0] + ".parquet",
+        mime="application/vnd.apache.parquet",
+        on_click="ignore",
+    )
+    st.caption(f"Fichier trouvé : {path}")
+    render_profile(path)
+
+
+def render_extract():
+    st.subheader("Extrait filtré des ventes")
+    options = extract_options()
+    if not options["years"]:
+        return
+    st.caption(
+        "Seules les lignes et colonnes choisies sont lues côté serveur ; "
+        "un extrait déjà demandé (par vous ou un autre groupe) est servi immédiatement."
+    )
+    first, last = date(min(options["years"]), 1, 1), date(max(options["years"]), 12, 31)
+    with st.form("extract_form"):
+        period = st.date_input("Période (OrderDate)", value=(first, last), min_value=first, max_value=last)
+        regions = st.multiselect("Régions (TerritoryKey)", options["regions"], placeholder="Toutes")
+        categories = st.multiselect("Catégories de produits", options["categories"], placeholder="Toutes")
+        columns = st.multiselect("Colonnes", options["columns"], default=options["columns"])
+        fmt = st.radio("Format", ["csv", "parquet"], horizontal=True)
+        submitted = st.form_submit_button("Préparer l’extrait")
+    # Période en cours de saisie (une seule date) : jusqu'à la fin des données
+    start, end = (tuple(period) + (last,))[:2] if period else (first, last)
+    extract_filter = ExtractFilter(
+        start if start > first else None, end if end < last else None, regions, categories, columns
+    )
+    if not columns:
+        st.warning("Choisissez au moins une colonne.")
+        return
+    with st.spinner("Préparation de l’extrait…"):
+        info = prepare_extract(extract_filter, fmt) if submitted else get_extract_cache().info(extract_filter, fmt)
+    if info is None:
+        return
+    rows = f"{info['rows']:,}".replace(",", " ")
+    st.caption(
+        f"{rows} lignes, {info['bytes'] / 2**20:.2f} Mo – années lues : "
+        f"{', '.join(map(str, info['years'])) or 'aucune'}, groupes de lignes lus : "
+        f"{info['row_groups_read']}/{info['row_groups']}"
+    )
+    st.download_button(
+        label=f"Télécharger l’extrait ({fmt})",
+        data=functools.partial(served, "extrait", extract_data, extract_filter, fmt),
+        file_name=f"sales_extrait.{fmt}",
+        mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+        on_click="ignore",
+    )
+
+
+@st.fragment
+@timed("donnees")
+def render_data():
     st.header("Jeux de données pour le TP")
 
+    files = "\n".join(
+        f"- `{d.file.replace('{year}', '<année>')}`" + (" (un fichier par année)" if d.partitioned else "")
+        for d in CATALOG.values()
+    )
     st.markdown(
-        """
-Les fichiers utilisés dans ce TP doivent être placés dans le dossier `data/` de l’application Streamlit  
+        f"""
+Les fichiers utilisés dans ce TP doivent être placés dans le dossier `{DATA_DIR}/` de l’application Streamlit  
 avec les noms suivants :
 
-- `AdventureWorks Sales Data 2020.csv`  
-- `AdventureWorks Customer Lookup.csv`  
-- `AdventureWorks Product Lookup.csv`  
-- `AdventureWorks Territory Lookup.csv`
+{files}
 
 Pour chaque jeu de données ci-dessous, si le fichier existe côté serveur, un bouton de téléchargement est affiché.
+Chaque fichier est aussi proposé au format Parquet, plus léger et déjà typé (`pd.read_parquet`).
 Sinon, un message indique au formateur qu’il doit ajouter le fichier correspondant.
 """
     )
-
-    for label, path in DATA_FILES:
-        st.subheader(label)
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                data_bytes = f.read()
-            st.download_button(
-                label=f"Télécharger : {os.path.basename(path)}",
-                data=data_bytes,
-                file_name=os.path.basename(path),
-                mime="text/csv"
-            )
-            st.caption(f"Fichier trouvé : {path}")
+    st.download_button(
+        label="Tout télécharger (.zip)",
+        data=functools.partial(served, "zip", bundle_data),
+        file_name=os.path.basename(BUNDLE_PATH),
+        mime="application/zip",
+        on_click="ignore",
+        type="primary",
+    )
+    info = bundle_info(BUNDLE_PATH)
+    size = f" ({info['bundle_bytes'] / 2**20:.1f} Mo)" if info else ""
+    st.caption(f"Tous les fichiers CSV ci-dessous et un catalogue.json (schémas, relations, SHA-256){size}.")
+    with st.expander("Relations entre les jeux de données"):
+        st.dataframe(relations(), hide_index=True)
+    render_extract()
+
+    for dataset in CATALOG.values():
+        st.subheader(dataset.label)
+        st.caption(dataset.description)
+        with st.expander(f"Schéma : {len(dataset.schema())} colonnes"):
+            st.dataframe(dataset.schema(), hide_index=True)
+        if dataset.partitioned:
+            partitions = dataset.partitions(DATA_DIR)
+            if not partitions:
+                st.warning(
+                    f"Aucun fichier {dataset.file.replace('{year}', '<année>')} dans {DATA_DIR}/. "
+                    "Le formateur doit ajouter au moins une année."
+                )
+            for year, path in partitions.items():
+                st.markdown(f"**Année {year}**")
+                render_file(path)
         else:
-            st.warning(
-                f"Fichier introuvable : {path}. "
-                "Le formateur doit ajouter ce fichier dans le répertoire de l’application."
-            )
+            render_file(dataset.paths(DATA_DIR)[0])
 
     st.info(
         "Les données AdventureWorks peuvent être récupérées depuis Kaggle ou un dépôt GitHub, "
@@ -274,7 +615,9 @@ Sinon, un message indique au formateur qu’il doit ajouter le fichier correspon
 # Onglet 4 – Dépôt sur GitHub
 # ---------------------------
 
-with tab_submit:
+@st.fragment
+@timed("depot")
+def render_submit():
     st.header("Dépôt de votre travail sur GitHub")
 
     st.markdown(
@@ -298,13 +641,24 @@ L’application créera automatiquement une entrée dans le dépôt GitHub du fo
         code_file = st.file_uploader(
             "Notebook ou script Python",
             type=["ipynb", "py"],
-            help="Fichier principal contenant votre code (obligatoire)."
+            help=f"Fichier principal contenant votre code (obligatoire, {MAX_CODE_MB:g} Mo max)."
         )
 
         report_file = st.file_uploader(
             "Rapport (1 page max)",
             type=["pdf", "md", "txt", "docx"],
-            help="Court rapport expliquant vos choix de nettoyage et d’intégration (optionnel mais recommandé)."
+            help=(
+                "Court rapport expliquant vos choix de nettoyage et d’intégration "
+                f"(optionnel mais recommandé, {MAX_REPORT_MB:g} Mo max)."
+            )
+        )
+
+        keep_original = st.checkbox(
+            "Envoyer le notebook original (sorties et métadonnées comprises)",
+            help=(
+                "Par défaut, les sorties volumineuses (tableaux, images), les compteurs "
+                "d’exécution et les métadonnées de l’éditeur sont retirés avant l’envoi."
+            ),
         )
 
         confirm = st.checkbox("Je confirme que ces fichiers constituent ma soumission pour ce TP.")
@@ -316,40 +670,34 @@ L’application créera automatiquement une entrée dans le dépôt GitHub du fo
             st.error("Vous devez cocher la case de confirmation avant d’envoyer.")
         elif not code_file:
             st.error("Le fichier de code (notebook ou script Python) est obligatoire.")
+        elif too_large(code_file, MAX_CODE_MB):
+            st.error(f"Le fichier de code dépasse la taille maximale de {MAX_CODE_MB:g} Mo.")
+        elif too_large(report_file, MAX_REPORT_MB):
+            st.error(f"Le rapport dépasse la taille maximale de {MAX_REPORT_MB:g} Mo.")
         else:
             try:
                 now = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
                 student_slug = slugify(student_name)
                 base_dir = f"{SUBMISSIONS_DIR}/{student_slug}_{now}"
 
-                results = []
+                files = {}
 
-                # Fichier de code
-                code_bytes = code_file.read()
+                # Fichier de code : notebook allégé, sinon UploadedFile passé
+                # tel quel, copié par blocs
                 code_ext = os.path.splitext(code_file.name)[1]
-                code_dest = f"{base_dir}/code{code_ext}"
-                status_code_code = upload_to_github_bytes(
-                    file_bytes=code_bytes,
-                    dest_path=code_dest,
-                    repo=GITHUB_REPO,
-                    token=GITHUB_TOKEN,
-                    commit_msg=f"TP ETL - code - {student_name}"
-                )
-                results.append(("code", status_code_code))
+                code_data, notebook_stats = prepare_code(code_file, keep_original)
+                files[f"{base_dir}/code{code_ext}"] = code_data
+                worker = get_upload_worker()
+                if notebook_stats is not None:
+                    # L'original reste sur le serveur, téléchargeable depuis la revue
+                    code_file.seek(0)
+                    original_sha, _ = worker.spool.archive(code_file)
 
                 # Rapport (optionnel)
                 if report_file is not None:
-                    report_bytes = report_file.read()
                     report_ext = os.path.splitext(report_file.name)[1]
-                    report_dest = f"{base_dir}/rapport{report_ext}"
-                    status_code_report = upload_to_github_bytes(
-                        file_bytes=report_bytes,
-                        dest_path=report_dest,
-                        repo=GITHUB_REPO,
-                        token=GITHUB_TOKEN,
-                        commit_msg=f"TP ETL - rapport - {student_name}"
-                    )
-                    results.append(("rapport", status_code_report))
+                    report_file.seek(0)
+                    files[f"{base_dir}/rapport{report_ext}"] = report_file
 
                 # Métadonnées
                 meta_content = (
@@ -359,26 +707,392 @@ L’application créera automatiquement une entrée dans le dépôt GitHub du fo
                     f"Commentaire : {comment}\n"
                     f"Date (UTC) : {datetime.now(timezone.utc).isoformat()}\n"
                 )
-                meta_bytes = meta_content.encode("utf-8")
-                meta_dest = f"{base_dir}/meta.txt"
-                status_code_meta = upload_to_github_bytes(
-                    file_bytes=meta_bytes,
-                    dest_path=meta_dest,
-                    repo=GITHUB_REPO,
-                    token=GITHUB_TOKEN,
-                    commit_msg=f"TP ETL - meta - {student_name}"
+                if notebook_stats is not None:
+                    meta_content += (
+                        f"Notebook : allégé au dépôt ({notebook_stats['outputs_removed']} sortie(s) retirée(s)), "
+                        f"original de {notebook_stats['original_bytes']} octets, "
+                        f"sha256 {notebook_stats['original_sha256']}\n"
+                        f"Notebook original : conservé sur le serveur de l’application, "
+                        f"{worker.spool.original_path(original_sha)}\n"
+                    )
+                files[f"{base_dir}/meta.txt"] = meta_content.encode("utf-8")
+
+                # Écriture dans le spool local, l'envoi GitHub se fait en arrière-plan
+                with get_metrics().histogram(
+                    "submission_enqueue_seconds", "Écriture d'un dépôt dans le spool local"
+                ).time():
+                    submission_id = worker.spool.enqueue(files, f"TP ETL - {student_name}")
+                worker.notify()
+                st.session_state.setdefault("submission_ids", []).append(submission_id)
+
+                st.success(
+                    f"Votre dépôt n°{submission_id} a bien été reçu. "
+                    "Il sera envoyé sur GitHub dans quelques instants."
                 )
-                results.append(("meta", status_code_meta))
-
-                ok = all(code in (200, 201) for _, code in results)
-                if ok:
-                    st.success("Votre dépôt a bien été envoyé sur GitHub.")
-                    for label, code in results:
-                        st.write(f"- {label} → statut GitHub : {code}")
-                else:
-                    st.error("Une erreur est survenue lors de l’envoi sur GitHub.")
-                    for label, code in results:
-                        st.write(f"- {label} → statut GitHub : {code}")
+                for dest in files:
+                    st.write(f"- {dest}")
+                if notebook_stats is not None:
+                    saved = notebook_stats["saved_bytes"]
+                    st.info(
+                        f"Notebook allégé : {notebook_stats['original_bytes'] / 1024:.1f} Ko → "
+                        f"{notebook_stats['stripped_bytes'] / 1024:.1f} Ko "
+                        f"({saved / max(notebook_stats['original_bytes'], 1):.0%} de moins, "
+                        f"{notebook_stats['outputs_removed']} sortie(s) retirée(s)). "
+                        "L’original est conservé sur le serveur ; cochez « Envoyer le notebook "
+                        "original » pour le déposer tel quel."
+                    )
 
             except Exception as e:
-                st.error(f"Erreur lors de l’envoi sur GitHub : {e}")
+                st.error(f"Erreur lors de l’enregistrement du dépôt : {e}")
+
+    # Suivi des envois
+    worker = get_upload_worker()
+    st.subheader("Suivi des envois")
+    st.metric("Dépôts en attente d’envoi", worker.spool.depth())
+    my_ids = st.session_state.get("submission_ids", [])
+    if my_ids:
+        for item in worker.spool.status(my_ids):
+            line = f"Dépôt n°{item['id']} – {item['status']} ({item['attempts']} tentative(s))"
+            if item["status"] == DONE:
+                st.write(f"{line} – commit {item['commit_sha'][:7]}")
+            elif item["status"] == FAILED:
+                st.error(f"{line} – {item['last_error']}")
+            else:
+                st.write(line)
+        if st.button("Actualiser le statut"):
+            st.rerun(scope="fragment")
+
+
+# ---------------------------
+# Onglet 5 – Console SQL
+# ---------------------------
+
+def execute_sql(sql: str, page: int):
+    histogram = get_metrics().histogram(
+        "sql_query_seconds", "Durée des requêtes de la console SQL", ("status",)
+    )
+    start = time.perf_counter()
+    try:
+        result = run_query(
+            get_sql_connection(), sql, page=page, page_size=SQL_PAGE_ROWS,
+            max_rows=SQL_MAX_ROWS, timeout_s=SQL_TIMEOUT_S,
+        )
+    except QueryError as e:
+        status = "timeout" if time.perf_counter() - start >= SQL_TIMEOUT_S else "erreur"
+        histogram.observe(time.perf_counter() - start, status=status)
+        st.session_state["sql_result"] = {"error": str(e)}
+        return
+    histogram.observe(result["elapsed_s"], status="ok")
+    st.session_state["sql_result"] = {"sql": sql, **result}
+
+
+@st.fragment
+@timed("sql")
+def render_sql():
+    st.header("Console SQL sur les données AdventureWorks")
+    st.markdown(
+        f"""
+Les fichiers du dossier `data/` sont chargés dans une base SQLite **en lecture seule**
+(tables `sales`, `customers`, `products`, …, dates au format `AAAA-MM-JJ`).
+Seules les requêtes `SELECT` / `WITH` sont acceptées ; chaque requête est interrompue
+après **{SQL_TIMEOUT_S:g} s** et le résultat est limité à **{SQL_MAX_ROWS} lignes**,
+affichées par pages de {SQL_PAGE_ROWS}.
+"""
+    )
+    try:
+        conn = get_sql_connection()
+    except Exception as e:
+        st.warning(f"Base SQL indisponible : {e}")
+        return
+
+    with st.expander("Schéma des tables"):
+        st.dataframe(
+            [
+                {"table": table, "colonne": name, "type": type_}
+                for table, columns in schema(conn).items()
+                for name, type_ in columns
+            ],
+            hide_index=True,
+        )
+
+    st.text_area("Requête", SQL_EXAMPLE, height=180, key="sql_query")
+    # Requêtes lancées dans les callbacks : le résultat est prêt avant l'affichage
+    st.button(
+        "Exécuter", type="primary",
+        on_click=lambda: execute_sql(st.session_state["sql_query"], 0),
+    )
+
+    result = st.session_state.get("sql_result")
+    if result is None:
+        return
+    if "error" in result:
+        st.error(result["error"])
+        return
+
+    first = result["offset"] + 1 if result["rows"] else 0
+    last = result["offset"] + len(result["rows"])
+    st.caption(f"Lignes {first} à {last} – {result['elapsed_s'] * 1000:.1f} ms")
+    st.dataframe(
+        [dict(zip(result["columns"], row)) for row in result["rows"]],
+        hide_index=True,
+    )
+    if result["capped"]:
+        st.info(f"Résultat tronqué à {SQL_MAX_ROWS} lignes : affinez la requête (WHERE, GROUP BY).")
+    col1, col2 = st.columns(2)
+    # Pagination : la même requête est réexécutée pour la page voisine seulement
+    col1.button(
+        "Page précédente", disabled=result["page"] == 0,
+        on_click=execute_sql, args=(result["sql"], result["page"] - 1),
+    )
+    col2.button(
+        "Page suivante", disabled=not result["has_more"],
+        on_click=execute_sql, args=(result["sql"], result["page"] + 1),
+    )
+
+
+# ---------------------------
+# Onglet 6 – Administration (formateur)
+# ---------------------------
+
+@st.fragment
+@timed("admin")
+def render_admin():
+    st.header("Suivi de l’application")
+    registry = get_metrics()
+    worker = get_upload_worker()
+
+    col1, col2 = st.columns(2)
+    col1.metric("Sessions actives", get_session_tracker().active())
+    col2.metric("Dépôts en attente d’envoi", worker.spool.depth())
+
+    metrics = {m.name: m for m in registry.metrics()}
+    st.subheader("Appels à l’API GitHub")
+    calls = metrics.get("github_requests_total")
+    if calls is not None:
+        st.dataframe(
+            [{**dict(zip(calls.labels, k)), "appels": int(v)} for k, v in sorted(calls.samples().items())],
+            hide_index=True,
+        )
+    for name, title in [
+        ("github_request_seconds", "Latence des appels GitHub"),
+        ("submission_attempt_seconds", "Durée d’une tentative d’envoi"),
+        ("submission_end_to_end_seconds", "Délai de bout en bout (file → commit)"),
+        ("submission_enqueue_seconds", "Écriture dans le spool"),
+        ("app_rerun_seconds", "Exécutions du script"),
+        ("sql_query_seconds", "Requêtes de la console SQL"),
+        ("notebook_strip_seconds", "Allègement des notebooks déposés"),
+        ("bundle_ensure_seconds", "Archive « Tout télécharger » (vérification / construction)"),
+        ("review_blob_seconds", "Fichiers de dépôts ouverts (cache disque / GitHub)"),
+        ("extract_seconds", "Extraits filtrés des ventes (cache / production)"),
+    ]:
+        if name in metrics:
+            st.subheader(title)
+            st.dataframe(metrics[name].summary(), hide_index=True)
+    served_bytes = metrics.get("dataset_bytes_served_total")
+    if served_bytes is not None:
+        st.subheader("Téléchargements de jeux de données")
+        st.dataframe(
+            [{"format": k[0], "Mo": round(v / 2**20, 2)} for k, v in sorted(served_bytes.samples().items())],
+            hide_index=True,
+        )
+    saved = metrics.get("notebook_bytes_saved_total")
+    if saved is not None:
+        st.metric("Octets de notebook économisés", f"{sum(saved.samples().values()) / 2**20:.2f} Mo")
+    outcomes = metrics.get("submission_attempts_total")
+    if outcomes is not None:
+        st.subheader("Issue des tentatives d’envoi")
+        st.dataframe(
+            [{"issue": k[0], "tentatives": int(v)} for k, v in sorted(outcomes.samples().items())],
+            hide_index=True,
+        )
+
+    st.subheader("Derniers dépôts")
+    st.dataframe(worker.spool.status(limit=50), hide_index=True)
+
+    with st.expander("Export Prometheus"):
+        text = registry.render()
+        st.code(text, language="text")
+        st.download_button("Télécharger metrics.prom", text, file_name="metrics.prom", on_click="ignore")
+    if st.button("Écrire l’export sur disque maintenant"):
+        registry.write(METRICS_PATH, METRICS_HISTORY_DIR, METRICS_HISTORY_DAYS)
+        st.info(f"Export écrit dans {METRICS_PATH}")
+
+
+# ---------------------------
+# Onglet 7 – Revue des dépôts (formateur)
+# ---------------------------
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def notebook_preview(sha: str) -> list[dict]:
+    # Dérivés gardés en mémoire par SHA : réouvrir un dépôt ne reparse rien
+    return preview_cells(io.BytesIO(blob_data(sha)))
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def pdf_preview(sha: str) -> str:
+    return extract_text(blob_data(sha))
+
+
+def sync_submissions():
+    # Incrémental : 3 appels si rien n'a bougé sous submissions/
+    try:
+        st.session_state["review_sync"] = get_submission_index().sync_github(get_review_repo())
+    except (GitHubError, requests.RequestException) as e:
+        # Réseau coupé ou délai dépassé : même message qu'une erreur de l'API
+        st.session_state["review_sync"] = {"error": str(e)}
+
+
+def set_review_page(page: int):
+    st.session_state["review_page"] = page
+
+
+def render_blob(file: dict):
+    ext, sha = file["extension"], file["sha"]
+    if ext == ".ipynb":
+        for cell in notebook_preview(sha):
+            if cell["type"] == "markdown":
+                st.markdown(cell["source"])
+                continue
+            st.code(cell["source"], language="python")
+            for output in cell["outputs"]:
+                st.text(output)
+    elif ext == ".py":
+        st.code(blob_data(sha).decode("utf-8", "replace"), language="python")
+    elif ext == ".pdf":
+        st.text(pdf_preview(sha) or "(aucun texte extrait : document scanné ?)")
+    elif ext in (".txt", ".md", ".csv"):
+        st.text(blob_data(sha)[:64 * 1024].decode("utf-8", "replace"))
+    else:
+        st.caption("Aperçu indisponible pour ce type de fichier.")
+
+
+def original_notebook(files: list[dict]) -> str | None:
+    # Chemin du notebook original dans le spool, si meta.txt en signale un
+    meta = next((f for f in files if f["name"] == "meta.txt"), None)
+    if meta is None or not any(f["extension"] == ".ipynb" for f in files):
+        return None
+    match = ORIGINAL_NOTEBOOK_RE.search(blob_data(meta["sha"]).decode("utf-8", "replace"))
+    return get_upload_worker().spool.original_path(match[1]) if match else None
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def render_submission(submission: dict):
+    st.markdown(
+        f"**E-mail** : {submission['email'] or '–'}  \n"
+        f"**Dossier** : `{submission['folder']}`"
+    )
+    if submission["comment"]:
+        st.caption(submission["comment"])
+    files = get_submission_index().files(submission["folder"])
+    try:
+        original = original_notebook(files)
+    except (GitHubError, requests.RequestException):
+        original = None
+    for file in files:
+        if file["name"] == "meta.txt":
+            continue
+        st.markdown(f"**{file['name']}** – {file['size'] / 1024:.1f} Ko")
+        try:
+            render_blob(file)
+        except (NotebookError, PdfError) as e:
+            st.warning(f"Lecture impossible : {e}")
+        except (GitHubError, requests.RequestException) as e:
+            st.error(f"Téléchargement impossible : {e}")
+            continue
+        st.download_button(
+            "Télécharger",
+            data=functools.partial(blob_data, file["sha"]),
+            file_name=file["name"],
+            key=f"review_download_{submission['folder']}_{file['name']}",
+            on_click="ignore",
+        )
+        if original is not None and file["extension"] == ".ipynb":
+            st.download_button(
+                "Télécharger l’original (sorties comprises)",
+                data=functools.partial(read_file, original),
+                file_name=f"{os.path.splitext(file['name'])[0]}.original.ipynb",
+                key=f"review_original_{submission['folder']}_{file['name']}",
+                on_click="ignore",
+            )
+
+
+@st.fragment
+@timed("revue")
+def render_review():
+    st.header("Revue des dépôts")
+    if "review_sync" not in st.session_state:
+        sync_submissions()
+    sync = st.session_state["review_sync"]
+    if "error" in sync:
+        st.warning(f"Synchronisation avec GitHub impossible : {sync['error']}")
+    index = get_submission_index()
+
+    col1, col2 = st.columns([3, 1])
+    group = col1.selectbox(
+        "Groupe", ["Tous", *index.groups()], key="review_group",
+        on_change=set_review_page, args=(0,),
+    )
+    col2.button("Synchroniser", on_click=sync_submissions)
+    group = None if group == "Tous" else group
+
+    total = index.count(group)
+    pages = max(1, math.ceil(total / REVIEW_PAGE_SIZE))
+    page = min(st.session_state.get("review_page", 0), pages - 1)
+    cache = get_blob_cache()
+    st.caption(
+        f"{total} dépôt(s) – page {page + 1}/{pages} – cache disque : {len(cache)} fichiers, "
+        f"{cache.total_bytes / 2**20:.1f} / {BLOB_CACHE_MB} Mo ({cache.stats['hits']} lectures, "
+        f"{cache.stats['misses']} téléchargements)"
+    )
+    # Contenus lus seulement pour les dépôts ouverts (expander.open)
+    for submission in index.submissions(group, REVIEW_PAGE_SIZE, page * REVIEW_PAGE_SIZE):
+        label = (
+            f"{submission['name'] or submission['student_slug']} – "
+            f"{submission['group_name'] or 'sans groupe'} – {submission['submitted_at'] or submission['timestamp']}"
+        )
+        expander = st.expander(label, key=f"review_{submission['folder']}", on_change="rerun")
+        if expander.open:
+            with expander:
+                render_submission(submission)
+
+    col1, col2 = st.columns(2)
+    col1.button("Page précédente", disabled=page == 0, on_click=set_review_page, args=(page - 1,))
+    col2.button("Page suivante", disabled=page >= pages - 1, on_click=set_review_page, args=(page + 1,))
+
+
+# ---------------------------
+# Onglets
+# ---------------------------
+
+TABS = [
+    ("Contexte & histoire", render_story),
+    ("Consignes & livrables", render_instructions),
+    ("Jeux de données", render_data),
+    ("Dépôt sur GitHub", render_submit),
+    ("Console SQL", render_sql),
+]
+
+if ADMIN_PASSWORD:
+    with st.sidebar.expander("Espace formateur"):
+        password = st.text_input("Mot de passe", type="password", key="admin_password")
+    if password and hmac.compare_digest(password, ADMIN_PASSWORD):
+        TABS.append(("Administration", render_admin))
+        TABS.append(("Revue des dépôts", render_review))
+
+# on_change="rerun" : l'onglet actif est connu côté serveur (tab.open), les
+# onglets masqués ne sont pas exécutés
+tabs = st.tabs([label for label, _ in TABS], key="active_tab", on_change="rerun")
+for tab, (_, render) in zip(tabs, TABS):
+    if tab.open:
+        with tab:
+            render()
+
+record_timing("script", time.perf_counter() - RERUN_START)
+
+if SHOW_TIMINGS:
+    with st.sidebar.expander("Temps d’exécution", expanded=True):
+        st.dataframe(st.session_state["rerun_timings"][::-1][:20], hide_index=True)
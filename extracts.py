@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import columnar
+import etl
+from catalog import CATALOG
+from datasets import KeyedLocks, file_signature
+
+# ---------------------------
+# Extraits filtrés des ventes (période, région, catégorie, colonnes)
+# ---------------------------
+#
+# Chaque fichier Sales Data <année>.csv a une copie Parquet de travail
+# triée par TerritoryKey puis OrderDate, découpée en petits groupes de
+# lignes : les statistiques min/max de chaque groupe suffisent à écarter
+# ceux qui ne peuvent pas contenir de ligne du territoire ou de la période
+# demandés. Un extrait ne lit donc que :
+#   - les années qui recoupent la période (élagage des partitions) ;
+#   - dans ces années, les groupes de lignes retenus par les statistiques ;
+#   - dans ces groupes, les colonnes demandées et celles des filtres.
+# Région et catégorie sont traduites en listes de clés (TerritoryKey,
+# ProductKey) via les référentiels. Les lignes sont rendues dans l'ordre
+# du CSV (colonne _row de la copie).
+#
+# Le résultat est gardé sur disque sous la signature du filtre (filtre
+# normalisé + signatures des fichiers sources) : un même extrait demandé
+# par plusieurs sessions n'est produit qu'une fois. Les extraits les moins
+# récemment servis sont supprimés au-delà de max_bytes.
+
+EXTRACT_DIR = ".extracts"
+LAYOUT_VERSION = 1
+ROW_GROUP_ROWS = 16_384
+SORT_KEYS = ["TerritoryKey", "OrderDate"]
+ROW_COLUMN = "_row"
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+# Fichiers des référentiels utilisés pour traduire région et catégorie
+TERRITORY_LOOKUP_FILES = [etl.TERRITORY_FILE]
+CATEGORY_LOOKUP_FILES = [etl.PRODUCT_FILE, etl.SUBCATEGORY_FILE, etl.CATEGORY_FILE]
+
+_layout_lock = threading.Lock()
+_extract_lock = threading.Lock()
+_extracting = KeyedLocks()
+
+
+class ExtractFilter:
+    def __init__(
+        self,
+        start: date | None = None,
+        end: date | None = None,
+        regions: list[str] | None = None,
+        categories: list[str] | None = None,
+        columns: list[str] | None = None,
+    ):
+        # Bornes incluses ; listes vides ou None = pas de filtre
+        self.start = start
+        self.end = end
+        self.regions = sorted(regions or [])
+        self.categories = sorted(categories or [])
+        self.columns = list(columns or [])
+
+    def key(self) -> dict:
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "regions": self.regions,
+            "categories": self.categories,
+            "columns": self.columns,
+        }
+
+
+# ---------------------------
+# Copie Parquet triée (une par année)
+# ---------------------------
+
+def layout_path(root: str, year: int) -> str:
+    return os.path.join(root, "layout", f"sales_{year}.parquet")
+
+
+def _layout_metadata(path: str) -> dict[bytes, bytes]:
+    mtime_ns, size = file_signature(path)
+    return {
+        b"layout_version": str(LAYOUT_VERSION).encode(),
+        b"row_group_rows": str(ROW_GROUP_ROWS).encode(),
+        b"source_mtime_ns": str(mtime_ns).encode(),
+        b"source_size": str(size).encode(),
+    }
+
+
+def build_layout(path: str, target: str) -> str:
+    # Lignes numérotées dans l'ordre du CSV, puis triées pour les statistiques
+    table = columnar.open_table(path, **CATALOG["sales"].read_options())
+    table = table.append_column(ROW_COLUMN, pa.array(range(table.num_rows), pa.uint32()))
+    table = table.sort_by([(c, "ascending") for c in SORT_KEYS])
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_layout_metadata(path)})
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS, compression=columnar.PARQUET_COMPRESSION)
+    os.replace(tmp, target)
+    return target
+
+
+def ensure_layout(data_dir: str = etl.DATA_DIR, root: str = EXTRACT_DIR, years: list[int] | None = None) -> dict[int, str]:
+    # Année -> copie triée, reconstruite seulement si le CSV de l'année a changé
+    layouts = {}
+    with _layout_lock:
+        for year, path in CATALOG["sales"].partitions(data_dir).items():
+            if years is not None and year not in years:
+                continue
+            target = layout_path(root, year)
+            try:
+                metadata = pq.read_schema(target).metadata or {}
+            except (OSError, pa.ArrowInvalid):
+                metadata = {}
+            expected = _layout_metadata(path)
+            if any(metadata.get(k) != v for k, v in expected.items()):
+                build_layout(path, target)
+            layouts[year] = target
+    return layouts
+
+
+# ---------------------------
+# Référentiels : région / catégorie -> clés
+# ---------------------------
+
+def _lookup_paths(data_dir: str, files: list[str]) -> list[str]:
+    return [os.path.join(data_dir, f) for f in files]
+
+
+def territory_keys(regions: list[str], data_dir: str = etl.DATA_DIR) -> list[int]:
+    territories = etl.extract_territories(os.path.join(data_dir, etl.TERRITORY_FILE))
+    return sorted(int(k) for k in territories.loc[territories["Region"].isin(regions), "TerritoryKey"])
+
+
+def category_products(categories: list[str], data_dir: str = etl.DATA_DIR) -> list[int]:
+    products = etl.build_products(*(
+        extract(path)
+        for extract, path in zip(
+            [etl.extract_products, etl.extract_subcategories, etl.extract_categories],
+            _lookup_paths(data_dir, CATEGORY_LOOKUP_FILES),
+        )
+    ))
+    return sorted(int(k) for k in products.loc[products["CategoryName"].isin(categories), "ProductKey"])
+
+
+def sales_columns(data_dir: str = etl.DATA_DIR) -> list[str]:
+    # Colonnes dans l'ordre du CSV, lues dans la copie Arrow de la première année
+    paths = CATALOG["sales"].paths(data_dir)
+    return columnar.open_table(paths[0], **CATALOG["sales"].read_options()).column_names if paths else []
+
+
+def filter_options(data_dir: str = etl.DATA_DIR) -> dict:
+    # Valeurs proposées dans l'onglet Données
+    territories = etl.extract_territories(os.path.join(data_dir, etl.TERRITORY_FILE))
+    categories = etl.extract_categories(os.path.join(data_dir, etl.CATEGORY_FILE))
+    years = list(CATALOG["sales"].partitions(data_dir))
+    return {
+        "years": years,
+        "regions": sorted(territories["Region"].astype(str).unique()),
+        "categories": sorted(categories["CategoryName"].astype(str).unique()),
+        "columns": sales_columns(data_dir),
+    }
+
+
+# ---------------------------
+# Extraction
+# ---------------------------
+
+def _years(extract_filter: ExtractFilter, years: list[int]) -> list[int]:
+    low = extract_filter.start.year if extract_filter.start else min(years, default=0)
+    high = extract_filter.end.year if extract_filter.end else max(years, default=0)
+    return [y for y in years if low <= y <= high]
+
+
+def _expression(extract_filter: ExtractFilter, data_dir: str) -> tuple[ds.Expression | None, list[str]]:
+    # Prédicat sur les seules colonnes des ventes, et colonnes qu'il faut lire pour l'évaluer
+    conditions = []
+    if extract_filter.start:
+        start = datetime.combine(extract_filter.start, datetime.min.time())
+        conditions.append(("OrderDate", ds.field("OrderDate") >= pa.scalar(start)))
+    if extract_filter.end:
+        # Borne de fin incluse : toute la journée
+        end = datetime.combine(extract_filter.end + timedelta(days=1), datetime.min.time())
+        conditions.append(("OrderDate", ds.field("OrderDate") < pa.scalar(end)))
+    if extract_filter.regions:
+        keys = territory_keys(extract_filter.regions, data_dir)
+        conditions.append(("TerritoryKey", ds.field("TerritoryKey").isin(pa.array(keys, pa.int32()))))
+    if extract_filter.categories:
+        keys = category_products(extract_filter.categories, data_dir)
+        conditions.append(("ProductKey", ds.field("ProductKey").isin(pa.array(keys, pa.int32()))))
+    expression = None
+    for _, condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression, list(dict.fromkeys(column for column, _ in conditions))
+
+
+def scan(extract_filter: ExtractFilter, data_dir: str = etl.DATA_DIR, root: str = EXTRACT_DIR) -> tuple[pa.Table, dict]:
+    # Table Arrow de l'extrait, plus le détail de ce qui a été lu
+    years = _years(extract_filter, list(CATALOG["sales"].partitions(data_dir)))
+    layouts = ensure_layout(data_dir, root, years)
+    expression, filter_columns = _expression(extract_filter, data_dir)
+    columns = extract_filter.columns or sales_columns(data_dir)
+    stats = {"years": years, "row_groups": 0, "row_groups_read": 0, "rows_read": 0}
+    parts = []
+    for year in years:
+        fragment = next(ds.dataset(layouts[year], format="parquet").get_fragments())
+        needed = list(dict.fromkeys(columns + filter_columns + [ROW_COLUMN]))
+        stats["row_groups"] += fragment.num_row_groups
+        # Groupes dont les min/max ne peuvent pas satisfaire le filtre : jamais lus
+        groups = fragment.split_by_row_group(expression) if expression is not None else [fragment]
+        ids = [g.id for fragment_group in groups for g in fragment_group.row_groups]
+        if not ids:
+            continue
+        stats["row_groups_read"] += len(ids)
+        table = pq.ParquetFile(layouts[year]).read_row_groups(ids, columns=needed)
+        stats["rows_read"] += table.num_rows
+        if expression is not None:
+            table = table.filter(expression)
+        table = table.sort_by(ROW_COLUMN).select(columns)
+        parts.append(table.replace_schema_metadata(None))
+    if not parts:
+        # Aucune ligne : seulement l'en-tête
+        return pa.table({c: pa.array([], pa.null()) for c in columns}), stats
+    return pa.concat_tables(parts), stats
+
+
+def write_extract(table: pa.Table, target: str, fmt: str):
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if fmt == "parquet":
+        pq.write_table(table, tmp, compression=columnar.PARQUET_COMPRESSION)
+    else:
+        # Même présentation que les CSV d'origine (dates sans heure, texte sans guillemets)
+        table.to_pandas().to_csv(tmp, index=False)
+    os.replace(tmp, target)
+
+
+def signature(extract_filter: ExtractFilter, fmt: str = "csv", data_dir: str = etl.DATA_DIR) -> str:
+    # Filtre normalisé + signatures des CSV utilisés : un fichier modifié change la clé
+    years = _years(extract_filter, list(CATALOG["sales"].partitions(data_dir)))
+    partitions = CATALOG["sales"].partitions(data_dir)
+    sources = [partitions[y] for y in years]
+    if extract_filter.regions:
+        sources += _lookup_paths(data_dir, TERRITORY_LOOKUP_FILES)
+    if extract_filter.categories:
+        sources += _lookup_paths(data_dir, CATEGORY_LOOKUP_FILES)
+    document = {
+        "version": LAYOUT_VERSION,
+        "format": fmt,
+        "filter": extract_filter.key(),
+        "sources": {os.path.basename(p): file_signature(p) for p in sources},
+    }
+    return hashlib.sha1(json.dumps(document, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ExtractCache:
+    def __init__(self, root: str = EXTRACT_DIR, data_dir: str = etl.DATA_DIR, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.directory = os.path.join(root, "cache")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key + FORMATS[fmt])
+
+    def info(self, extract_filter: ExtractFilter, fmt: str = "csv") -> dict | None:
+        # Détail d'un extrait déjà produit (None s'il faut le produire)
+        path = self._path(signature(extract_filter, fmt, self.data_dir), fmt)
+        try:
+            with open(path + ".json", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return info if os.path.exists(path) else None
+
+    def get(self, extract_filter: ExtractFilter, fmt: str = "csv") -> tuple[str, dict]:
+        key = signature(extract_filter, fmt, self.data_dir)
+        path = self._path(key, fmt)
+        # Un même extrait demandé par plusieurs sessions n'est produit qu'une fois
+        with _extracting.hold(path):
+            info = self.info(extract_filter, fmt)
+            if info is not None:
+                os.utime(path)
+                with _extract_lock:
+                    self.stats["hits"] += 1
+                return path, {**info, "cached": True}
+            start = time.perf_counter()
+            table, info = scan(extract_filter, self.data_dir, self.root)
+            info["scan_s"] = round(time.perf_counter() - start, 3)
+            write_extract(table, path, fmt)
+            info.update(
+                rows=table.num_rows,
+                bytes=os.path.getsize(path),
+                elapsed_s=round(time.perf_counter() - start, 3),
+                filter=extract_filter.key(),
+            )
+            with open(path + ".json", "w", encoding="utf-8") as f:
+                json.dump(info, f)
+            with _extract_lock:
+                self.stats["misses"] += 1
+                self._evict(keep=path)
+        return path, {**info, "cached": False}
+
+    def _evict(self, keep: str):
+        # LRU sur la date de modification (remise à jour à chaque service)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and os.path.splitext(entry.name)[1] in FORMATS.values():
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, entry.path, st.st_size))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for victim in (path, path + ".json"):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.stats["evictions"] += 1
+
+
+def full_scan(extract_filter: ExtractFilter, data_dir: str = etl.DATA_DIR) -> pd.DataFrame:
+    # Référence : chaque CSV relu en entier, filtré en pandas
+    keys = territory_keys(extract_filter.regions, data_dir) if extract_filter.regions else None
+    products = category_products(extract_filter.categories, data_dir) if extract_filter.categories else None
+    parts = []
+    for path in CATALOG["sales"].partitions(data_dir).values():
+        df = pd.read_csv(path, dtype=etl.SALES_DTYPES, parse_dates=etl.SALES_DATES)
+        mask = pd.Series(True, index=df.index)
+        if extract_filter.start:
+            mask &= df["OrderDate"] >= pd.Timestamp(extract_filter.start)
+        if extract_filter.end:
+            mask &= df["OrderDate"] < pd.Timestamp(extract_filter.end + timedelta(days=1))
+        if keys is not None:
+            mask &= df["TerritoryKey"].isin(keys)
+        if products is not None:
+            mask &= df["ProductKey"].isin(products)
+        df = df[mask]
+        parts.append(df[extract_filter.columns] if extract_filter.columns else df)
+    return pd.concat(parts, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrait filtré des ventes (lecture des seuls groupes utiles)")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--root", default=EXTRACT_DIR)
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--regions", nargs="+")
+    parser.add_argument("--categories", nargs="+")
+    parser.add_argument("--columns", nargs="+")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    args = parser.parse_args()
+
+    extract_filter = ExtractFilter(args.start, args.end, args.regions, args.categories, args.columns)
+    path, info = ExtractCache(args.root, args.data_dir).get(extract_filter, args.format)
+    print(
+        f"{path} : {info['rows']:,d} lignes, {info['bytes'] / 2**20:.2f} Mo, années {info['years']}, "
+        f"groupes lus {info['row_groups_read']}/{info['row_groups']} ({info['rows_read']:,d} lignes lues), "
+        f"{info['elapsed_s']:.3f}s{' (cache)' if info['cached'] else ''}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import base64
+import email.utils
+import hashlib
+import io
+import json
+import random
+import time
+from typing import BinaryIO
+
+import requests
+
+from metrics import MetricsRegistry
+
+# ---------------------------
+# Client GitHub (API Git Data)
+# ---------------------------
+#
+# Une soumission = un seul commit : on crée les blobs, un arbre basé sur
+# l'arbre courant, un commit, puis on avance la référence de branche une
+# seule fois. Si la branche a bougé entre-temps (autre étudiant·e), on
+# rejoue uniquement arbre + commit sur la nouvelle tête : les blobs sont
+# réutilisés tels quels.
+
+GITHUB_API_URL = "https://api.github.com"
+
+# Codes renvoyés par GitHub quand la mise à jour de ref n'est pas un fast-forward
+REF_CONFLICT_CODES = (409, 422)
+
+# GitHub refuse tout blob de plus de BLOB_MAX_BYTES
+BLOB_MAX_BYTES = 100 << 20
+# Lecture par blocs multiples de 3 octets : le base64 se concatène sans padding
+STREAM_CHUNK_BYTES = 3 << 18
+
+
+class FileTooLargeError(ValueError):
+    def __init__(self, path: str, size: int, limit: int):
+        super().__init__(
+            f"{path} : {size / 2**20:.1f} Mo, au-delà de la limite de {limit / 2**20:.0f} Mo"
+        )
+        self.path = path
+        self.size = size
+        self.limit = limit
+
+
+class GitHubError(RuntimeError):
+    def __init__(
+        self, status_code: int, message: str, retry_after: float | None = None, ref_conflict: bool = False
+    ):
+        super().__init__(f"Erreur GitHub ({status_code}) : {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+        # Mise à jour de ref refusée (branche avancée) : à rejouer plus tard
+        self.ref_conflict = ref_conflict
+
+    @property
+    def retryable(self) -> bool:
+        if self.ref_conflict:
+            return True
+        # 403 n'est temporaire que s'il s'agit d'une limite de débit
+        if self.status_code == 403:
+            return self.retry_after is not None
+        return self.status_code == 429 or self.status_code >= 500
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    if "Retry-After" in resp.headers:
+        # Nombre de secondes ou date HTTP (RFC 9110)
+        value = resp.headers["Retry-After"].strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    if resp.headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in resp.headers:
+        return max(0.0, float(resp.headers["X-RateLimit-Reset"]) - time.time())
+    return None
+
+
+def git_blob_sha(data: bytes) -> str:
+    # Même identifiant que celui d'un blob git, calculable hors ligne
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+
+def stream_size(stream: BinaryIO) -> int:
+    # Taille restante à partir de la position courante, sans rien lire
+    start = stream.tell()
+    size = stream.seek(0, io.SEEK_END) - start
+    stream.seek(start)
+    return size
+
+
+def git_blob_sha_stream(stream: BinaryIO, size: int) -> str:
+    start = stream.tell()
+    h = hashlib.sha1(f"blob {size}\0".encode())
+    for block in iter(lambda: stream.read(STREAM_CHUNK_BYTES), b""):
+        h.update(block)
+    stream.seek(start)
+    return h.hexdigest()
+
+
+class Base64JSONBody:
+    # Corps JSON {..., "content": "<base64>"} produit à la volée à partir d'un
+    # flux : seul un bloc encodé est en mémoire à la fois. La longueur est
+    # connue d'avance, requests envoie donc un Content-Length classique.
+    def __init__(self, stream: BinaryIO, size: int, fields: dict):
+        self._prefix = json.dumps({**fields, "content": ""})[:-2].encode()
+        self._stream = stream
+        self._length = len(self._prefix) + 4 * ((size + 2) // 3) + 2
+        self._buffer = bytearray(self._prefix)
+        self._done = False
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, n: int = -1) -> bytes:
+        while not self._done and (n < 0 or len(self._buffer) < n):
+            block = self._stream.read(STREAM_CHUNK_BYTES)
+            if block:
+                self._buffer += base64.b64encode(block)
+            else:
+                self._buffer += b'"}'
+                self._done = True
+        n = len(self._buffer) if n < 0 else n
+        out = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return out
+
+
+def make_session(pool_size: int = 4) -> requests.Session:
+    # Session partagée : connexions HTTPS réutilisées entre les envois
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class GitHubRepo:
+    def __init__(
+        self,
+        repo: str,
+        token: str,
+        branch: str = "main",
+        api_url: str = GITHUB_API_URL,
+        session: requests.Session | None = None,
+        timeout: float = 30.0,
+        max_file_bytes: int = BLOB_MAX_BYTES,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_file_bytes = min(max_file_bytes, BLOB_MAX_BYTES)
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+        }
+        # Blobs dont on sait qu'ils existent déjà dans le dépôt
+        self.known_blobs: set[str] = set()
+        self.metrics = metrics
+        if metrics is not None:
+            labels = ("method", "endpoint", "status")
+            self._calls = metrics.counter(
+                "github_requests_total", "Appels à l'API GitHub", labels
+            )
+            self._latency = metrics.histogram(
+                "github_request_seconds", "Durée des appels à l'API GitHub", labels
+            )
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        url = f"{self.api_url}/repos/{self.repo}/{path}"
+        kwargs.setdefault("headers", self.headers)
+        start = time.perf_counter()
+        status = "erreur_reseau"
+        try:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            if self.metrics is not None:
+                # Point d'accès sans SHA ni chemin de fichier : cardinalité bornée
+                parts = path.split("/")
+                endpoint = "/".join(parts[:2]) if parts[0] == "git" else parts[0]
+                labels = {"method": method, "endpoint": endpoint, "status": status}
+                self._calls.inc(**labels)
+                self._latency.observe(time.perf_counter() - start, **labels)
+
+    def _request(self, method: str, path: str, expected=(200, 201), **kwargs) -> dict:
+        resp = self._send(method, path, **kwargs)
+        if resp.status_code not in expected:
+            raise GitHubError(resp.status_code, resp.text, retry_after=_retry_after(resp))
+        return resp.json() if resp.content else {}
+
+    def head(self) -> tuple[str, str]:
+        ref = self._request("GET", f"git/ref/heads/{self.branch}")
+        commit_sha = ref["object"]["sha"]
+        commit = self._request("GET", f"git/commits/{commit_sha}")
+        return commit_sha, commit["tree"]["sha"]
+
+    def tree(self, sha: str) -> list[dict]:
+        return self._request("GET", f"git/trees/{sha}")["tree"]
+
+    def blob(self, sha: str) -> bytes:
+        return base64.b64decode(self._request("GET", f"git/blobs/{sha}")["content"])
+
+    def has_blob(self, sha: str) -> bool:
+        # HEAD : réponse sans corps, on ne télécharge pas le contenu
+        resp = self._send("HEAD", f"git/blobs/{sha}")
+        if resp.status_code not in (200, 404):
+            raise GitHubError(resp.status_code, resp.text, retry_after=_retry_after(resp))
+        return resp.status_code == 200
+
+    def check_size(self, path: str, size: int):
+        if size > self.max_file_bytes:
+            raise FileTooLargeError(path, size, self.max_file_bytes)
+
+    def create_blob(self, data: bytes | BinaryIO) -> str:
+        stream = io.BytesIO(data) if isinstance(data, bytes) else data
+        body = Base64JSONBody(stream, stream_size(stream), {"encoding": "base64"})
+        sha = self._request(
+            "POST", "git/blobs", data=body, headers={**self.headers, "Content-Type": "application/json"}
+        )["sha"]
+        self.known_blobs.add(sha)
+        return sha
+
+    def ensure_blob(self, data: bytes | BinaryIO) -> tuple[str, bool]:
+        # Renvoie (sha, envoyé ?) : un contenu déjà présent n'est pas renvoyé
+        if isinstance(data, bytes):
+            sha = git_blob_sha(data)
+        else:
+            sha = git_blob_sha_stream(data, stream_size(data))
+        if sha in self.known_blobs or self.has_blob(sha):
+            self.known_blobs.add(sha)
+            return sha, False
+        return self.create_blob(data), True
+
+    def commit_blobs(self, blobs: dict[str, str], message: str, max_attempts: int = 8) -> dict:
+        # blobs : chemin dans le dépôt -> SHA du blob déjà créé
+        entries = [
+            {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+            for path, sha in blobs.items()
+        ]
+        attempt = 0
+        while True:
+            attempt += 1
+            parent_sha, base_tree = self.head()
+            tree = self._request(
+                "POST", "git/trees", json={"base_tree": base_tree, "tree": entries}
+            )
+            commit = self._request(
+                "POST",
+                "git/commits",
+                json={"message": message, "tree": tree["sha"], "parents": [parent_sha]},
+            )
+            try:
+                self._request(
+                    "PATCH",
+                    f"git/refs/heads/{self.branch}",
+                    json={"sha": commit["sha"], "force": False},
+                )
+            except GitHubError as e:
+                if e.status_code in REF_CONFLICT_CODES:
+                    if attempt < max_attempts:
+                        # Attente aléatoire pour désynchroniser les dépôts concurrents
+                        time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+                        continue
+                    e.ref_conflict = True
+                raise
+            return {"sha": commit["sha"], "attempts": attempt}
+
+    def commit_files(
+        self, files: dict[str, bytes | BinaryIO], message: str, max_attempts: int = 8
+    ) -> dict:
+        # Les contenus peuvent être des bytes ou des flux binaires positionnables
+        # (fichiers ouverts, UploadedFile de Streamlit) lus par blocs.
+        start = time.perf_counter()
+        sizes = {
+            path: len(data) if isinstance(data, bytes) else stream_size(data)
+            for path, data in files.items()
+        }
+        # Toutes les tailles sont vérifiées avant le premier octet envoyé
+        for path, size in sizes.items():
+            self.check_size(path, size)
+        blobs, uploaded_bytes, reused = {}, 0, 0
+        for path, data in files.items():
+            blobs[path], uploaded = self.ensure_blob(data)
+            if uploaded:
+                uploaded_bytes += sizes[path]
+            else:
+                reused += 1
+        result = self.commit_blobs(blobs, message, max_attempts=max_attempts)
+        result["elapsed"] = time.perf_counter() - start
+        result["paths"] = list(files)
+        result["uploaded_bytes"] = uploaded_bytes
+        result["reused_blobs"] = reused
+        return result
@@ -0,0 +1,323 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import etl
+from datasets import file_sha256
+from validation import REVENUE_COLUMNS, summarize, validate
+
+# ---------------------------
+# Correction automatique des soumissions
+# ---------------------------
+#
+# Chaque soumission (code.py ou code.ipynb) est exécutée dans un
+# sous-processus isolé (répertoire temporaire, limites CPU / mémoire /
+# taille de fichier, délai maximal) avec les fichiers de data/ à portée de
+# main. La table produite (CSV ou SQLite) est relue et les trois KPIs du TP
+# sont comparés à ceux du pipeline de référence ; la table est aussi
+# contrôlée par les règles de validation.py (types, doublons, clés...).
+# Les résultats sont mis en cache par hash (code + jeux de données + limites) :
+# seules les soumissions modifiées sont réexécutées.
+
+GRADER_VERSION = "2"
+SUBMISSIONS_DIR = "submissions"
+CACHE_DIR = ".grader_cache"
+GRADED_FILES = [
+    etl.SALES_FILE.format(year=2020),
+    etl.CUSTOMER_FILE,
+    etl.PRODUCT_FILE,
+    etl.SUBCATEGORY_FILE,
+    etl.CATEGORY_FILE,
+    etl.TERRITORY_FILE,
+]
+OUTPUT_CSV = "clean_adventureworks_sales_2020.csv"
+REL_TOLERANCE = 1e-3
+
+
+class OutputError(ValueError):
+    pass
+
+
+# Environnement d'exécution des notebooks hors Colab / Jupyter
+NOTEBOOK_PRELUDE = '''\
+import sys, types
+def display(*args, **kwargs):
+    for a in args:
+        print(a)
+_colab = types.ModuleType("google.colab")
+_colab.files = types.SimpleNamespace(upload=lambda *a, **k: {}, download=lambda *a, **k: None)
+sys.modules.setdefault("google", types.ModuleType("google"))
+sys.modules["google.colab"] = _colab
+'''
+
+
+def notebook_to_script(raw: bytes) -> str:
+    nb = json.loads(raw)
+    parts = [NOTEBOOK_PRELUDE]
+    for cell in nb.get("cells", []):
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source", "")
+        source = "".join(source) if isinstance(source, list) else source
+        # Commandes shell et magics IPython neutralisées
+        lines = [
+            f"# {line}" if line.lstrip().startswith(("!", "%")) else line
+            for line in source.splitlines()
+        ]
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts) + "\n"
+
+
+def find_code(folder: str) -> str | None:
+    for name in ("code.py", "code.ipynb"):
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# Les limites sont posées par le processus enfant lui-même avant d'exécuter
+# le code (preexec_fn n'est pas sûr depuis un pool de threads)
+LAUNCHER = """\
+import resource, runpy, sys
+cpu, mem, fsize = map(int, sys.argv[1:4])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+sys.argv = ["submission.py"]
+runpy.run_path("submission.py", run_name="__main__")
+"""
+
+
+def run_submission(
+    code_path: str, data_dir: str, timeout: int, memory_mb: int, file_mb: int
+) -> tuple[dict, pd.DataFrame | None]:
+    with open(code_path, "rb") as f:
+        raw = f.read()
+    script = notebook_to_script(raw) if code_path.endswith(".ipynb") else raw.decode("utf-8", "replace")
+
+    workdir = tempfile.mkdtemp(prefix="grade_")
+    try:
+        # Les fichiers sont accessibles à la racine et sous data/, comme dans Colab ou le dépôt.
+        # Copies propres au bac à sable : un lien vers data/ laisserait le code
+        # étudiant réécrire les jeux de données du dépôt
+        os.makedirs(os.path.join(workdir, "data"))
+        for name in GRADED_FILES:
+            copy = os.path.join(workdir, "data", name)
+            shutil.copyfile(os.path.join(data_dir, name), copy)
+            os.link(copy, os.path.join(workdir, name))
+        with open(os.path.join(workdir, "submission.py"), "w") as f:
+            f.write(script)
+
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": workdir,
+            "MPLBACKEND": "Agg",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(
+                [sys.executable, "-c", LAUNCHER, str(timeout), str(memory_mb << 20), str(file_mb << 20)],
+                cwd=workdir, env=env, capture_output=True, timeout=timeout,
+                start_new_session=True,
+            )
+            status = "ok" if proc.returncode == 0 else "error"
+            stderr = proc.stderr.decode("utf-8", "replace")[-2000:]
+        except subprocess.TimeoutExpired:
+            status, stderr = "timeout", ""
+        result = {"status": status, "duration_s": round(time.perf_counter() - start, 2), "stderr": stderr}
+        try:
+            output = load_output(workdir)
+        except OutputError as e:
+            # Table produite mais illisible (vide, CSV mal formé...) : soumission en échec
+            result.update(status="bad_output", output=e.args[0], output_error=e.args[1])
+            return result, None
+        result["output"] = output[0] if output else None
+        return result, output[1] if output else None
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def load_output(workdir: str) -> tuple[str, pd.DataFrame] | None:
+    # OutputError(nom, message) si la table existe mais ne peut pas être relue
+    path = os.path.join(workdir, OUTPUT_CSV)
+    candidates = [path] if os.path.exists(path) else sorted(glob.glob(os.path.join(workdir, "clean*.csv")))
+    if candidates:
+        name = os.path.basename(candidates[0])
+        try:
+            return name, pd.read_csv(candidates[0])
+        except (ValueError, OSError) as e:
+            # EmptyDataError, ParserError, UnicodeDecodeError sont des ValueError
+            raise OutputError(name, f"{type(e).__name__}: {e}") from e
+    for db in sorted(glob.glob(os.path.join(workdir, "*.db")) + glob.glob(os.path.join(workdir, "*.sqlite"))):
+        try:
+            with sqlite3.connect(db) as conn:
+                tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+                if tables:
+                    return f"{os.path.basename(db)}:{tables[0]}", pd.read_sql(f'SELECT * FROM "{tables[0]}"', conn)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            raise OutputError(os.path.basename(db), f"{type(e).__name__}: {e}") from e
+    return None
+
+
+# ---------------------------
+# Comparaison des KPIs
+# ---------------------------
+
+def reference_kpis(data_dir: str, products: pd.DataFrame) -> dict[str, pd.Series]:
+    return student_kpis(etl.run_pipeline((2020,), data_dir), products)
+
+
+def student_kpis(df: pd.DataFrame, products: pd.DataFrame) -> dict[str, pd.Series] | None:
+    # Les KPIs sont recalculés à partir des clés de la table produite : la
+    # catégorie est retrouvée via ProductKey, quel que soit le nommage choisi.
+    columns = {c.lower(): c for c in df.columns}
+    revenue = next((columns[c] for c in REVENUE_COLUMNS if c in columns), None)
+    territory = columns.get("territorykey") or columns.get("salesterritorykey")
+    needed = [revenue, columns.get("orderdate"), columns.get("productkey"), columns.get("customerkey"), territory]
+    if any(c is None for c in needed):
+        return None
+    revenue, order_date, product, customer, territory = needed
+    data = pd.DataFrame({
+        "Revenue": pd.to_numeric(df[revenue], errors="coerce"),
+        "Month": pd.to_datetime(df[order_date], errors="coerce").dt.to_period("M").astype("string"),
+        "ProductKey": pd.to_numeric(df[product], errors="coerce"),
+        "CustomerKey": pd.to_numeric(df[customer], errors="coerce"),
+        "TerritoryKey": pd.to_numeric(df[territory], errors="coerce"),
+    })
+    category = products.set_index("ProductKey")["CategoryName"].astype("string")
+    data["Category"] = category.reindex(data["ProductKey"]).to_numpy()
+    return {
+        "revenue_by_month_category": data.groupby(["Month", "Category"])["Revenue"].sum(),
+        "top_customers": data.groupby("CustomerKey")["Revenue"].sum().nlargest(10),
+        "revenue_by_territory": data.groupby("TerritoryKey")["Revenue"].sum(),
+    }
+
+
+def compare_kpis(student: dict | None, reference: dict) -> dict:
+    if student is None:
+        return {name: {"ok": False, "reason": "colonnes manquantes"} for name in reference}
+    out = {}
+    for name, ref in reference.items():
+        got = student[name]
+        if name == "top_customers":
+            overlap = len(set(ref.index) & set(got.index))
+            out[name] = {"ok": overlap == len(ref), "overlap": overlap}
+            continue
+        aligned = got.reindex(ref.index).fillna(0).to_numpy()
+        expected = ref.to_numpy()
+        err = float(np.max(np.abs(aligned - expected) / np.maximum(np.abs(expected), 1.0)))
+        out[name] = {"ok": err <= REL_TOLERANCE, "max_rel_error": round(err, 6)}
+    return out
+
+
+# ---------------------------
+# Orchestration
+# ---------------------------
+
+def grade_all(
+    submissions_dir: str = SUBMISSIONS_DIR,
+    data_dir: str = etl.DATA_DIR,
+    jobs: int | None = None,
+    timeout: int = 300,
+    memory_mb: int = 4096,
+    file_mb: int = 1024,
+    cache_dir: str = CACHE_DIR,
+) -> list[dict]:
+    os.makedirs(cache_dir, exist_ok=True)
+    dataset_hash = hashlib.sha256(
+        "".join(file_sha256(os.path.join(data_dir, n)) for n in GRADED_FILES).encode()
+    ).hexdigest()
+    settings = f"{GRADER_VERSION}:{timeout}:{memory_mb}:{file_mb}:{dataset_hash}"
+
+    todo, results = [], []
+    for folder in sorted(glob.glob(os.path.join(submissions_dir, "*", ""))):
+        slug = os.path.basename(os.path.normpath(folder))
+        code = find_code(folder)
+        if code is None:
+            results.append({"submission": slug, "status": "no_code", "cached": False})
+            continue
+        key = hashlib.sha256(f"{settings}:{file_sha256(code)}".encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                results.append({**json.load(f), "submission": slug, "cached": True})
+        else:
+            todo.append((slug, code, cache_path))
+
+    if todo:
+        lookups = etl.extract_lookups(data_dir)
+        products = lookups["products"]
+        reference = reference_kpis(data_dir, products)
+
+        def grade(item):
+            slug, code, cache_path = item
+            try:
+                result, table = run_submission(code, data_dir, timeout, memory_mb, file_mb)
+                kpis = student_kpis(table, products) if table is not None else None
+                result["kpis"] = compare_kpis(kpis, reference)
+                result["score"] = sum(k["ok"] for k in result["kpis"].values())
+                if table is not None:
+                    result["validation"] = validate(table, lookups)
+                    result["rules"] = summarize(result["validation"])
+            except Exception as e:
+                # Une soumission qui fait échouer le correcteur n'arrête pas le lot ;
+                # résultat non mis en cache : elle sera retentée au prochain passage
+                return {
+                    "status": "grader_error", "error": f"{type(e).__name__}: {e}", "score": 0,
+                    "submission": slug, "cached": False,
+                }
+            with open(cache_path, "w") as f:
+                json.dump(result, f)
+            return {**result, "submission": slug, "cached": False}
+
+        # Chaque tâche lance son propre sous-processus : le pool borne leur nombre
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            results.extend(pool.map(grade, todo))
+    return sorted(results, key=lambda r: r["submission"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Correction automatique des soumissions")
+    parser.add_argument("--submissions", default=SUBMISSIONS_DIR)
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--timeout", type=int, default=300)
+    parser.add_argument("--memory-mb", type=int, default=4096)
+    parser.add_argument("--output", default="grades.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = grade_all(args.submissions, args.data_dir, args.jobs, args.timeout, args.memory_mb)
+    with open(args.output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "submission", "status", "score", "output", "rules_passed", "rules_failed", "duration_s", "cached",
+        ])
+        for r in results:
+            rules = r.get("rules") or {}
+            writer.writerow([
+                r["submission"], r["status"], r.get("score", 0), r.get("output"),
+                rules.get("passed"), " ".join(rules.get("failed", [])), r.get("duration_s"), r["cached"],
+            ])
+            checks = f" règles={rules['passed']}/{rules['passed'] + len(rules['failed'])}" if rules else ""
+            print(f"{r['submission']:40s} {r['status']:8s} score={r.get('score', 0)}/3{checks} cache={r['cached']}")
+    print(f"{len(results)} soumissions en {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
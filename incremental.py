@@ -0,0 +1,462 @@
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+import etl
+from catalog import CATALOG
+from datasets import file_signature
+from kpi_cube import lookups_signature
+from sqlite_load import DATE_FORMAT, records, sql_type
+
+# ---------------------------
+# ETL incrémental de la table intégrée
+# ---------------------------
+#
+# Les fichiers de ventes ne font que grossir (une année par fichier, lignes
+# ajoutées par OrderDate croissant). Pour chaque source, un repère est
+# gardé dans la base : octets déjà traités (fin de la dernière ligne
+# complète), SHA-256 du début du fichier et des octets qui précèdent le
+# repère, dernière OrderDate vue. Une exécution ne lit que les octets
+# ajoutés depuis, par blocs de lignes, puis les nettoie, les enrichit et
+# les insère ou remplace (clé OrderNumber, OrderLineItem) : relancer
+# après une interruption ne crée pas de doublon. Un fichier réécrit (début
+# ou repère modifié, taille réduite) est retraité en entier.
+#
+# Doublons de clé : même règle que etl.clean_sales, la première ligne lue
+# l'emporte (fichiers dans l'ordre de leur nom, puis ordre des lignes). Une
+# clé déjà écrite par la même source ou une source antérieure est ignorée ;
+# écrite par une source postérieure, elle est remplacée. Une ligne ignorée
+# n'est pas reprise si celle retenue disparaît ensuite (fichier réécrit) :
+# --force pour tout retraiter.
+#
+# Les référentiels sont comparés clé par clé (empreinte de chaque ligne
+# utile à la jointure) : seules les ventes qui portent une clé ajoutée,
+# modifiée ou supprimée sont réenrichies. Les ventes sans correspondance
+# dans un référentiel sont gardées à part (orphans) pour être jointes si
+# la clé apparaît plus tard.
+
+STORE_PATH = ".integrated.sqlite3"
+# Taille d'un bloc de lignes lu, nettoyé et écrit en une transaction
+BLOCK_BYTES = 32 << 20
+# Octets hachés en début de fichier et avant le repère
+CHECK_BYTES = 1 << 16
+# Colonnes des fichiers de ventes, relues pour réenrichir une ligne
+SALES_COLUMNS = [*etl.SALES_DATES, *etl.SALES_DTYPES]
+LOOKUP_KEYS = {"customers": "CustomerKey", "products": "ProductKey", "territories": "TerritoryKey"}
+LOOKUP_COLUMNS = {
+    "customers": etl.CUSTOMER_COLUMNS,
+    "products": etl.PRODUCT_COLUMNS,
+    "territories": etl.TERRITORY_COLUMNS,
+}
+# Types de etl.transform, perdus dans SQLite (entiers en int64, catégories en texte)
+LOOKUP_DTYPES = {
+    **etl.CUSTOMER_DTYPES, **etl.PRODUCT_DTYPES, **etl.SUBCATEGORY_DTYPES,
+    **etl.CATEGORY_DTYPES, **etl.TERRITORY_DTYPES,
+}
+READ_DTYPES = {
+    **etl.SALES_DTYPES,
+    **{c: LOOKUP_DTYPES[c] for columns in LOOKUP_COLUMNS.values() for c in columns},
+    "OrderYear": "int16",
+    "OrderMonth": "string",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    file TEXT UNIQUE NOT NULL,
+    header TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    head_sha256 TEXT NOT NULL,
+    tail_sha256 TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    last_order_date TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lookup_rows (
+    lookup TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    PRIMARY KEY (lookup, key)
+) WITHOUT ROWID;
+"""
+
+
+def _digest(path: str, start: int, stop: int) -> str:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(max(stop - start, 0))).hexdigest()
+
+
+def _header(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.readline()
+
+
+def _complete_end(path: str, size: int) -> int:
+    # Fin de la dernière ligne complète : une ligne en cours d'écriture attend
+    with open(path, "rb") as f:
+        position = size
+        while position > 0:
+            start = max(position - CHECK_BYTES, 0)
+            f.seek(start)
+            cut = f.read(position - start).rfind(b"\n")
+            if cut >= 0:
+                return start + cut + 1
+            position = start
+    return 0
+
+
+def line_blocks(path: str, start: int, end: int, block_bytes: int = BLOCK_BYTES) -> Iterator[tuple[bytes, int]]:
+    # Blocs de lignes entières entre start et end ; renvoie aussi la position de fin du bloc
+    with open(path, "rb") as f:
+        f.seek(start)
+        position, carry = start, b""
+        while position < end:
+            data = f.read(min(block_bytes, end - position))
+            position += len(data)
+            data = carry + data
+            cut = data.rfind(b"\n") + 1 if position < end else len(data)
+            if cut:
+                yield data[:cut], position - (len(data) - cut)
+            carry = data[cut:]
+
+
+def parse_sales(block: bytes, columns: list[str]) -> pd.DataFrame:
+    return pd.read_csv(
+        io.BytesIO(block), names=columns, header=None, dtype=etl.SALES_DTYPES, parse_dates=etl.SALES_DATES
+    )
+
+
+def lookup_hashes(indexed: dict[str, pd.DataFrame]) -> dict[str, pd.Series]:
+    # Empreinte par clé des colonnes reportées dans la table intégrée
+    return {
+        name: pd.Series(
+            pd.util.hash_pandas_object(indexed[name][columns], index=True).to_numpy().view(np.int64),
+            index=indexed[name].index,
+        )
+        for name, columns in LOOKUP_COLUMNS.items()
+    }
+
+
+class IncrementalLoad:
+    def __init__(self, path: str = STORE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _has_table(self, table: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def sources(self) -> dict[str, dict]:
+        cursor = self.conn.execute("SELECT * FROM sources")
+        names = [d[0] for d in cursor.description]
+        return {row["file"]: row for row in (dict(zip(names, values)) for values in cursor)}
+
+    # ---------------------------
+    # Écriture
+    # ---------------------------
+
+    def _upsert(self, table: str, df: pd.DataFrame):
+        if df.empty:
+            return
+        if not self._has_table(table):
+            columns = ", ".join(f'"{c}" {sql_type(t)}' for c, t in df.dtypes.items())
+            self.conn.execute(f"CREATE TABLE {table} ({columns}, PRIMARY KEY ({', '.join(etl.SALES_KEY)}))")
+            for key in LOOKUP_KEYS.values():
+                self.conn.execute(f"CREATE INDEX idx_{table}_{key} ON {table}({key})")
+            self.conn.execute(f"CREATE INDEX idx_{table}_source ON {table}(source_id)")
+        names = ", ".join(f'"{c}"' for c in df.columns)
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in df.columns if c not in etl.SALES_KEY)
+        self.conn.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(df.columns))}) "
+            f"ON CONFLICT({', '.join(etl.SALES_KEY)}) DO UPDATE SET {updates}",
+            records(df),
+        )
+
+    def _keep_first(self, df: pd.DataFrame, report: dict) -> pd.DataFrame:
+        # Retire les lignes dont la clé est déjà écrite par la même source ou une source antérieure
+        tables = [t for t in ("sales", "orphans") if self._has_table(t)]
+        if df.empty or not tables:
+            return df
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS incoming_keys (OrderNumber TEXT, OrderLineItem INTEGER, source_id INTEGER)"
+        )
+        self.conn.execute("DELETE FROM incoming_keys")
+        self.conn.executemany(
+            "INSERT INTO incoming_keys VALUES (?, ?, ?)",
+            df[[*etl.SALES_KEY, "source_id"]].astype(object).itertuples(index=False),
+        )
+        query = " UNION ALL ".join(
+            f"SELECT k.OrderNumber, k.OrderLineItem FROM incoming_keys k "
+            f"JOIN {table} t ON t.OrderNumber = k.OrderNumber AND t.OrderLineItem = k.OrderLineItem "
+            f"JOIN sources kept ON kept.id = t.source_id JOIN sources new ON new.id = k.source_id "
+            f"WHERE kept.file <= new.file"
+            for table in tables
+        )
+        written = pd.MultiIndex.from_tuples(self.conn.execute(query).fetchall(), names=etl.SALES_KEY)
+        if written.empty:
+            return df
+        duplicated = pd.MultiIndex.from_frame(df[etl.SALES_KEY].astype(object)).isin(written)
+        report["duplicates"] = report.get("duplicates", 0) + int(duplicated.sum())
+        return df[~duplicated]
+
+    def _delete_keys(self, table: str, df: pd.DataFrame):
+        if df.empty or not self._has_table(table):
+            return
+        self.conn.executemany(
+            f"DELETE FROM {table} WHERE OrderNumber = ? AND OrderLineItem = ?",
+            df[etl.SALES_KEY].astype(object).itertuples(index=False),
+        )
+
+    def _load(self, sales: pd.DataFrame, indexed: dict[str, pd.DataFrame], report: dict) -> pd.DataFrame:
+        # sales porte une colonne source_id ; renvoie les lignes retenues par le nettoyage
+        df = self._keep_first(etl.clean_sales(sales, report), report)
+        found = np.ones(len(df), dtype=bool)
+        for name, key in LOOKUP_KEYS.items():
+            found &= df[key].isin(indexed[name].index).to_numpy()
+        enriched = etl.add_derived_columns(etl.enrich(df, indexed, report))
+        orphans = df[~found]
+        report["rows_out"] = report.get("rows_out", 0) + len(enriched)
+        report["orphans"] = report.get("orphans", 0) + len(orphans)
+        self._upsert("sales", enriched)
+        self._upsert("orphans", orphans)
+        # Une clé passe d'une table à l'autre quand elle est réécrite ou qu'un référentiel change
+        if self._has_table("orphans") and self.conn.execute("SELECT EXISTS(SELECT 1 FROM orphans)").fetchone()[0]:
+            self._delete_keys("orphans", enriched)
+        self._delete_keys("sales", orphans)
+        return df
+
+    # ---------------------------
+    # Référentiels
+    # ---------------------------
+
+    def _changed_keys(self, hashes: dict[str, pd.Series]) -> dict[str, pd.Index]:
+        # Clés ajoutées, supprimées ou dont une colonne reportée a changé
+        changed = {}
+        for name, new in hashes.items():
+            old = pd.Series(dict(self.conn.execute("SELECT key, hash FROM lookup_rows WHERE lookup = ?", (name,))))
+            both = new.index.intersection(old.index)
+            modified = both[new.loc[both].to_numpy() != old.loc[both].to_numpy()]
+            added = new.index.difference(old.index)
+            removed = old.index.difference(new.index)
+            changed[name] = added.union(removed).union(modified)
+            self.conn.executemany(
+                "DELETE FROM lookup_rows WHERE lookup = ? AND key = ?", ((name, int(k)) for k in removed)
+            )
+            self.conn.executemany(
+                "INSERT INTO lookup_rows (lookup, key, hash) VALUES (?, ?, ?) "
+                "ON CONFLICT(lookup, key) DO UPDATE SET hash = excluded.hash",
+                ((name, int(k), int(h)) for k, h in new.loc[added.union(modified)].items()),
+            )
+        return changed
+
+    def _affected_rows(self, changed: dict[str, pd.Index]) -> pd.DataFrame:
+        # Ventes, jointes ou orphelines, qui portent une clé modifiée (colonnes brutes)
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS changed_keys (lookup TEXT, key INTEGER)")
+        self.conn.execute("DELETE FROM changed_keys")
+        self.conn.executemany(
+            "INSERT INTO changed_keys VALUES (?, ?)",
+            ((name, int(k)) for name, keys in changed.items() for k in keys),
+        )
+        columns = ", ".join(f'"{c}"' for c in [*SALES_COLUMNS, "source_id"])
+        conditions = " OR ".join(
+            f"{key} IN (SELECT key FROM changed_keys WHERE lookup = '{name}')" for name, key in LOOKUP_KEYS.items()
+        )
+        frames = [
+            pd.read_sql(f"SELECT {columns} FROM {table} WHERE {conditions}", self.conn)
+            for table in ("sales", "orphans") if self._has_table(table)
+        ]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=[*SALES_COLUMNS, "source_id"])
+        df = pd.concat(frames, ignore_index=True)
+        for column in etl.SALES_DATES:
+            df[column] = pd.to_datetime(df[column], format=DATE_FORMAT)
+        return df.astype(etl.SALES_DTYPES)
+
+    def _refresh_lookups(self, data_dir: str, stats: dict) -> dict[str, pd.DataFrame] | None:
+        signature = lookups_signature(data_dir)
+        if self._get_meta("lookups") == signature:
+            return None
+        indexed = etl.index_lookups(etl.extract_lookups(data_dir))
+        with self.conn:
+            changed = self._changed_keys(lookup_hashes(indexed))
+            affected = self._affected_rows(changed)
+            if not affected.empty:
+                self._delete_keys("sales", affected)
+                self._delete_keys("orphans", affected)
+                self._load(affected, indexed, {})
+            self._set_meta("lookups", signature)
+        stats["lookups_changed"] = {name: len(keys) for name, keys in changed.items()}
+        stats["reenriched"] = len(affected)
+        return indexed
+
+    # ---------------------------
+    # Sources de ventes
+    # ---------------------------
+
+    def _drop_source(self, source_id: int):
+        for table in ("sales", "orphans"):
+            if self._has_table(table):
+                self.conn.execute(f"DELETE FROM {table} WHERE source_id = ?", (source_id,))
+
+    def _resume_offset(self, path: str, source: dict, header: bytes) -> int | None:
+        # Repère conservé si le fichier n'a fait que grossir, None sinon
+        offset = source["offset"]
+        if (
+            os.path.getsize(path) >= offset
+            and source["header"] == header.decode("utf-8", "replace")
+            and _digest(path, 0, min(CHECK_BYTES, offset)) == source["head_sha256"]
+            and _digest(path, max(offset - CHECK_BYTES, 0), offset) == source["tail_sha256"]
+        ):
+            return offset
+        return None
+
+    def _refresh_source(
+        self, name: str, path: str, source: dict | None, lookups: Callable[[], dict], report: dict
+    ) -> str:
+        signature = file_signature(path)
+        if source is not None and (source["mtime_ns"], source["size"]) == signature:
+            return "inchangée"
+        header = _header(path)
+        columns = header.decode("utf-8-sig").strip().split(",")
+        offset = None if source is None else self._resume_offset(path, source, header)
+        with self.conn:
+            if source is None:
+                status = "ajoutée"
+                source_id = self.conn.execute(
+                    "INSERT INTO sources (file, header, mtime_ns, size, offset, head_sha256, tail_sha256, "
+                    "rows, updated_at) VALUES (?, ?, 0, 0, ?, '', '', 0, ?)",
+                    (name, header.decode("utf-8", "replace"), len(header), time.time()),
+                ).lastrowid
+            elif offset is None:
+                # Fichier réécrit : ses lignes sont retirées puis relues en entier
+                status, source_id = "réécrite", source["id"]
+                self._drop_source(source_id)
+                self.conn.execute(
+                    "UPDATE sources SET header = ?, offset = ?, rows = 0, last_order_date = NULL WHERE id = ?",
+                    (header.decode("utf-8", "replace"), len(header), source_id),
+                )
+            else:
+                status, source_id = "complétée", source["id"]
+        start = offset if offset is not None else len(header)
+        end = _complete_end(path, signature[1])
+        for block, block_end in line_blocks(path, start, end):
+            sales = parse_sales(block, columns).assign(source_id=source_id)
+            last = self.conn.execute("SELECT last_order_date FROM sources WHERE id = ?", (source_id,)).fetchone()[0]
+            # Une transaction par bloc : le repère avance avec les lignes écrites
+            with self.conn:
+                kept = self._load(sales, lookups(), report)
+                if last is not None:
+                    late = int((kept["OrderDate"] < pd.Timestamp(last)).sum())
+                    report["late_rows"] = report.get("late_rows", 0) + late
+                newest = kept["OrderDate"].max()
+                self.conn.execute(
+                    "UPDATE sources SET offset = ?, rows = rows + ?, updated_at = ?, "
+                    "last_order_date = MAX(COALESCE(last_order_date, ''), COALESCE(?, '')) WHERE id = ?",
+                    (block_end, len(sales), time.time(),
+                     None if pd.isna(newest) else newest.strftime(DATE_FORMAT), source_id),
+                )
+        with self.conn:
+            self.conn.execute(
+                "UPDATE sources SET mtime_ns = ?, size = ?, head_sha256 = ?, tail_sha256 = ?, offset = ? "
+                "WHERE id = ?",
+                (*signature, _digest(path, 0, min(CHECK_BYTES, end)),
+                 _digest(path, max(end - CHECK_BYTES, 0), end), end, source_id),
+            )
+        return status
+
+    def refresh(self, data_dir: str = etl.DATA_DIR, force: bool = False) -> dict:
+        start = time.perf_counter()
+        stats = {"lookups_changed": {}, "reenriched": 0, "sources": {}, "report": {}}
+        if force:
+            with self.conn:
+                for table in ("sales", "orphans"):
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+                for table in ("sources", "lookup_rows", "meta"):
+                    self.conn.execute(f"DELETE FROM {table}")
+        indexed = self._refresh_lookups(data_dir, stats)
+
+        def lookups() -> dict[str, pd.DataFrame]:
+            # Chargés seulement s'il y a des lignes à traiter
+            nonlocal indexed
+            if indexed is None:
+                indexed = etl.index_lookups(etl.extract_lookups(data_dir))
+            return indexed
+
+        files = {os.path.basename(p): p for p in CATALOG["sales"].paths(data_dir)}
+        known = self.sources()
+        for name in sorted(set(known) - set(files)):
+            with self.conn:
+                self._drop_source(known[name]["id"])
+                self.conn.execute("DELETE FROM sources WHERE id = ?", (known[name]["id"],))
+            stats["sources"][name] = "supprimée"
+        for name, path in sorted(files.items()):
+            stats["sources"][name] = self._refresh_source(name, path, known.get(name), lookups, stats["report"])
+        stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+        return stats
+
+    # ---------------------------
+    # Lecture
+    # ---------------------------
+
+    def watermarks(self) -> pd.DataFrame:
+        return pd.read_sql(
+            "SELECT file, offset, size, rows, last_order_date, updated_at FROM sources ORDER BY file", self.conn
+        )
+
+    def read(self) -> pd.DataFrame:
+        # Table intégrée, mêmes colonnes que etl.transform
+        if not self._has_table("sales"):
+            return pd.DataFrame()
+        df = pd.read_sql("SELECT * FROM sales", self.conn, parse_dates=etl.SALES_DATES)
+        return df.drop(columns="source_id").astype(READ_DTYPES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETL incrémental : table intégrée tenue à jour dans SQLite")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="Tout retraiter")
+    parser.add_argument("--output", help="Exporte la table intégrée en CSV")
+    args = parser.parse_args()
+
+    store = IncrementalLoad(args.store)
+    stats = store.refresh(args.data_dir, args.force)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print(store.watermarks().to_string(index=False))
+    if args.output:
+        etl.load_csv(store.read(), args.output)
+
+
+if __name__ == "__main__":
+    main()
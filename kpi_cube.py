@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import etl
+from datasets import file_signature
+
+# ---------------------------
+# Cube de KPIs matérialisé
+# ---------------------------
+#
+# Les trois KPIs du TP (CA / quantités par mois × catégorie, top 10 clients,
+# CA par territoire) sont précalculés par année de ventes dans une base
+# SQLite : agrégats partiels par année, plus des totaux tenus à jour par
+# ajout / retrait de ces partiels. Quand un fichier Sales Data <année>.csv
+# apparaît, change ou disparaît, seule cette année est (re)calculée ; un
+# changement de référentiel invalide tout le cube. Les KPIs sont ensuite
+# lus dans les tables, sans relire ni regrouper les ventes.
+
+CUBE_PATH = ".kpi_cube.sqlite3"
+
+# Référentiels utilisés par les jointures : leur signature est celle du cube
+LOOKUP_FILES = [
+    etl.CUSTOMER_FILE,
+    etl.PRODUCT_FILE,
+    etl.SUBCATEGORY_FILE,
+    etl.CATEGORY_FILE,
+    etl.TERRITORY_FILE,
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    year INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    rows_in INTEGER NOT NULL,
+    rows_out INTEGER NOT NULL,
+    built_in_s REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS month_category (
+    year INTEGER NOT NULL,
+    OrderMonth TEXT NOT NULL,
+    CategoryName TEXT NOT NULL,
+    Revenue REAL NOT NULL,
+    Quantity INTEGER NOT NULL,
+    PRIMARY KEY (year, OrderMonth, CategoryName)
+);
+CREATE TABLE IF NOT EXISTS customer_year (
+    year INTEGER NOT NULL,
+    CustomerKey INTEGER NOT NULL,
+    Revenue REAL NOT NULL,
+    PRIMARY KEY (year, CustomerKey)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS territory_year (
+    year INTEGER NOT NULL,
+    TerritoryKey INTEGER NOT NULL,
+    Revenue REAL NOT NULL,
+    PRIMARY KEY (year, TerritoryKey)
+);
+CREATE TABLE IF NOT EXISTS customer_totals (
+    CustomerKey INTEGER PRIMARY KEY,
+    Revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS territory_totals (
+    TerritoryKey INTEGER PRIMARY KEY,
+    Revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS territories (
+    TerritoryKey INTEGER PRIMARY KEY,
+    Region TEXT,
+    Country TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customer_totals_revenue ON customer_totals(Revenue DESC);
+"""
+
+PARTIAL_TABLES = ["month_category", "customer_year", "territory_year"]
+KPI_PRODUCT_COLUMNS = ["CategoryName", "ProductPrice", "ProductCost"]
+
+
+def sales_year(path: str) -> int:
+    prefix, suffix = etl.SALES_FILE.split("{year}")
+    return int(os.path.basename(path)[len(prefix):-len(suffix)])
+
+
+def lookups_signature(data_dir: str) -> str:
+    return json.dumps([(name, *file_signature(os.path.join(data_dir, name))) for name in LOOKUP_FILES])
+
+
+def cube_lookups(data_dir: str) -> dict[str, pd.DataFrame]:
+    # Seules les colonnes utiles aux KPIs : des clients, on ne garde que les
+    # clés (la jointure interne écarte les ventes orphelines, comme etl.enrich)
+    customers = pd.read_csv(
+        os.path.join(data_dir, etl.CUSTOMER_FILE), usecols=["CustomerKey"],
+        dtype={"CustomerKey": "string"}, encoding=etl.LOOKUP_ENCODING,
+    )
+    keys = pd.to_numeric(customers["CustomerKey"], errors="coerce").dropna().astype("int32")
+    products = etl.build_products(
+        etl.extract_products(os.path.join(data_dir, etl.PRODUCT_FILE)),
+        etl.extract_subcategories(os.path.join(data_dir, etl.SUBCATEGORY_FILE)),
+        etl.extract_categories(os.path.join(data_dir, etl.CATEGORY_FILE)),
+    )
+    return {
+        "customers": pd.DataFrame(index=pd.Index(keys.unique(), name="CustomerKey")),
+        "products": products.set_index("ProductKey")[KPI_PRODUCT_COLUMNS],
+        "territories": etl.extract_territories(os.path.join(data_dir, etl.TERRITORY_FILE)),
+    }
+
+
+def year_partials(path: str, lookups: dict[str, pd.DataFrame], report: dict) -> dict[str, pd.DataFrame]:
+    # Une année complète en mémoire : les doublons sont détectés sur tout le fichier
+    df = etl.clean_sales(etl.extract_sales(path), report)
+    df = etl.lookup_join(df, lookups["customers"], "CustomerKey", [], report=report)
+    df = etl.lookup_join(df, lookups["products"], "ProductKey", KPI_PRODUCT_COLUMNS, report=report)
+    df = etl.lookup_join(
+        df, lookups["territories"].set_index("TerritoryKey"), "TerritoryKey", [], report=report
+    )
+    df = etl.add_derived_columns(df)
+    report["rows_out"] = report.get("rows_out", 0) + len(df)
+    return {
+        "month_category": etl.kpi_revenue_by_month_category(df).astype({"CategoryName": "string"}),
+        "customer_year": df.groupby("CustomerKey")["LineTotal"].sum().rename("Revenue").reset_index(),
+        "territory_year": df.groupby("TerritoryKey")["LineTotal"].sum().rename("Revenue").reset_index(),
+    }
+
+
+class KpiCube:
+    def __init__(self, path: str = CUBE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def partitions(self) -> dict[int, tuple[int, int]]:
+        rows = self.conn.execute("SELECT year, mtime_ns, size FROM partitions")
+        return {year: (mtime_ns, size) for year, mtime_ns, size in rows}
+
+    # ---------------------------
+    # Rafraîchissement
+    # ---------------------------
+
+    def _apply_totals(self, year: int, sign: int):
+        # Ajout (+1) ou retrait (-1) des partiels d'une année dans les totaux
+        for table, key in (("customer", "CustomerKey"), ("territory", "TerritoryKey")):
+            self.conn.execute(
+                f"INSERT INTO {table}_totals ({key}, Revenue) "
+                f"SELECT {key}, ? * Revenue FROM {table}_year WHERE year = ? "
+                f"ON CONFLICT({key}) DO UPDATE SET Revenue = Revenue + excluded.Revenue",
+                (sign, year),
+            )
+
+    def _drop_year(self, year: int):
+        self._apply_totals(year, -1)
+        for table in PARTIAL_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE year = ?", (year,))
+        self.conn.execute("DELETE FROM partitions WHERE year = ?", (year,))
+
+    def _reset(self, territories: pd.DataFrame):
+        for table in [*PARTIAL_TABLES, "partitions", "customer_totals", "territory_totals", "territories"]:
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.executemany(
+            "INSERT INTO territories (TerritoryKey, Region, Country) VALUES (?, ?, ?)",
+            territories[["TerritoryKey", "Region", "Country"]]
+            .astype({"Region": "string", "Country": "string"})
+            .itertuples(index=False),
+        )
+
+    def refresh(self, data_dir: str = etl.DATA_DIR, force: bool = False) -> dict:
+        stats = {"rebuilt": False, "added": [], "updated": [], "removed": [], "unchanged": []}
+        signature = lookups_signature(data_dir)
+        lookups = None
+        with self.conn:
+            if force or self._get_meta("lookups") != signature:
+                # Référentiels modifiés : toutes les années sont à recalculer
+                lookups = cube_lookups(data_dir)
+                self._reset(lookups["territories"])
+                self._set_meta("lookups", signature)
+                stats["rebuilt"] = True
+
+        known = self.partitions()
+        files = {sales_year(p): p for p in etl.sales_files(data_dir)}
+        for year in sorted(set(known) - set(files)):
+            with self.conn:
+                self._drop_year(year)
+            stats["removed"].append(year)
+
+        for year, path in sorted(files.items()):
+            file_sig = file_signature(path)
+            if known.get(year) == file_sig:
+                stats["unchanged"].append(year)
+                continue
+            if lookups is None:
+                lookups = cube_lookups(data_dir)
+            start = time.perf_counter()
+            report: dict = {}
+            partials = year_partials(path, lookups, report)
+            # Une transaction par année : un cube interrompu reste cohérent
+            with self.conn:
+                if year in known:
+                    self._drop_year(year)
+                for table, df in partials.items():
+                    df.insert(0, "year", year)
+                    df.to_sql(table, self.conn, if_exists="append", index=False, chunksize=50_000)
+                self._apply_totals(year, 1)
+                self.conn.execute(
+                    "INSERT INTO partitions (year, file, mtime_ns, size, rows_in, rows_out, built_in_s) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (year, os.path.basename(path), *file_sig, report["rows_in"],
+                     report.get("rows_out", 0), round(time.perf_counter() - start, 3)),
+                )
+            stats["updated" if year in known else "added"].append(year)
+        return stats
+
+    # ---------------------------
+    # Requêtes
+    # ---------------------------
+
+    def _year_filter(self, years) -> tuple[str, list]:
+        if years is None:
+            return "", []
+        years = list(years)
+        return f"WHERE year IN ({', '.join('?' * len(years))})", years
+
+    def revenue_by_month_category(self, years=None) -> pd.DataFrame:
+        where, params = self._year_filter(years)
+        return pd.read_sql(
+            "SELECT OrderMonth, CategoryName, Revenue, Quantity FROM month_category "
+            f"{where} ORDER BY OrderMonth, CategoryName",
+            self.conn, params=params,
+        )
+
+    def top_customers(self, n: int = 10, years=None) -> pd.DataFrame:
+        if years is None:
+            # Totaux tenus à jour : lecture directe de l'index sur Revenue
+            query, params = "SELECT CustomerKey, Revenue FROM customer_totals ORDER BY Revenue DESC LIMIT ?", [n]
+        else:
+            where, params = self._year_filter(years)
+            query = (
+                f"SELECT CustomerKey, SUM(Revenue) AS Revenue FROM customer_year {where} "
+                "GROUP BY CustomerKey ORDER BY Revenue DESC LIMIT ?"
+            )
+            params.append(n)
+        return pd.read_sql(query, self.conn, params=params)
+
+    def revenue_by_territory(self, years=None) -> pd.DataFrame:
+        if years is None:
+            source, params = "territory_totals", []
+        else:
+            where, params = self._year_filter(years)
+            source = f"(SELECT TerritoryKey, SUM(Revenue) AS Revenue FROM territory_year {where} GROUP BY TerritoryKey)"
+        return pd.read_sql(
+            f"SELECT t.TerritoryKey, l.Region, l.Country, t.Revenue FROM {source} t "
+            "JOIN territories l ON l.TerritoryKey = t.TerritoryKey ORDER BY t.Revenue DESC",
+            self.conn, params=params,
+        )
+
+    def kpis(self, years=None) -> dict[str, pd.DataFrame]:
+        # Même forme que etl.compute_kpis
+        return {
+            "revenue_by_month_category": self.revenue_by_month_category(years),
+            "top_customers": self.top_customers(10, years),
+            "revenue_by_territory": self.revenue_by_territory(years),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cube de KPIs AdventureWorks")
+    parser.add_argument("--cube", default=CUBE_PATH)
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="Recalculer toutes les années")
+    parser.add_argument("--years", type=int, nargs="+", help="KPIs restreints à ces années")
+    args = parser.parse_args()
+
+    cube = KpiCube(args.cube)
+    print(cube.refresh(args.data_dir, args.force))
+    start = time.perf_counter()
+    kpis = cube.kpis(args.years)
+    elapsed = time.perf_counter() - start
+    for name, kpi in kpis.items():
+        print(f"\n{name}\n{kpi.head(10).to_string(index=False)}")
+    print(f"\nKPIs lus en {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
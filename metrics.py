@@ -0,0 +1,295 @@
+import bisect
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# ---------------------------
+# Métriques de fonctionnement (compteurs, jauges, histogrammes)
+# ---------------------------
+#
+# Registre en mémoire partagé par toutes les sessions du processus, exporté
+# au format texte Prometheus. Un thread écrit périodiquement l'export sur
+# disque (dernier état + historique horodaté) : les pics de dépôt à l'heure
+# limite peuvent être analysés après coup, même après un redémarrage.
+
+# Bornes en secondes, des appels API rapides aux dépôts mis en attente
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+# Historique borné : fichiers journaliers gardés, délai minimal entre deux instantanés
+HISTORY_DAYS = 14
+HISTORY_INTERVAL = 300.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+            for key, value in sorted(self.samples().items())
+        ]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn):
+        # Valeur calculée à la lecture (ex. nombre de sessions actives)
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def value(self) -> float:
+        return float(self.fn())
+
+    def render(self) -> list[str]:
+        return [f"{self.name} {self.value():g}"]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu de labels : [compte par seau (+ seau infini), somme, total]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self) -> dict[tuple, tuple[list[int], float, int]]:
+        with self._lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+    def quantile(self, q: float, counts: list[int]) -> float | None:
+        # Estimation par interpolation linéaire dans le seau concerné
+        total = sum(counts)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                low = self.buckets[i - 1] if i else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self) -> list[dict]:
+        rows = []
+        for key, (counts, total, n) in sorted(self.samples().items()):
+            rows.append({
+                **dict(zip(self.labels, key)),
+                "n": n,
+                "moyenne_s": round(total / n, 4) if n else None,
+                "p50_s": _round(self.quantile(0.5, counts)),
+                "p95_s": _round(self.quantile(0.95, counts)),
+                "p99_s": _round(self.quantile(0.99, counts)),
+            })
+        return rows
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, (counts, total, n) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.labels, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 4)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Enregistrement idempotent : on récupère la métrique existante
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, fn) -> Gauge:
+        return self._register(Gauge(name, help, fn))
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def metrics(self) -> list:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, history_dir: str | None = None, history_days: int = HISTORY_DAYS):
+        text = self.render()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Fichier temporaire propre à l'écrivain : le dumper et une écriture
+        # manuelle (admin, CLI) ne se marchent pas dessus
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        if history_dir:
+            # Historique : un fichier par jour, un instantané horodaté par écriture,
+            # ajouté en un seul write (O_APPEND) pour ne pas s'entrelacer
+            now = datetime.now(timezone.utc)
+            os.makedirs(history_dir, exist_ok=True)
+            day = os.path.join(history_dir, f"{now:%Y%m%d}.prom")
+            fd = os.open(day, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, f"# snapshot {now.isoformat()}\n{text}".encode())
+            finally:
+                os.close(fd)
+            prune_history(history_dir, history_days, now)
+
+
+def prune_history(history_dir: str, days: int = HISTORY_DAYS, now: datetime | None = None):
+    # Fichiers journaliers (AAAAMMJJ.prom) plus anciens que days jours supprimés
+    cutoff = f"{(now or datetime.now(timezone.utc)) - timedelta(days=days):%Y%m%d}"
+    for name in os.listdir(history_dir):
+        stem, ext = os.path.splitext(name)
+        if ext == ".prom" and stem.isdigit() and len(stem) == 8 and stem <= cutoff:
+            try:
+                os.remove(os.path.join(history_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+class SessionTracker:
+    # Sessions vues récemment (une session = un onglet de navigateur ouvert)
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._seen: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str):
+        with self._lock:
+            self._seen[session_id] = time.time()
+
+    def active(self) -> int:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for session_id in [s for s, t in self._seen.items() if t < cutoff]:
+                del self._seen[session_id]
+            return len(self._seen)
+
+
+class MetricsDumper:
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        path: str,
+        interval: float = 30.0,
+        history_dir: str | None = None,
+        history_interval: float = HISTORY_INTERVAL,
+        history_days: int = HISTORY_DAYS,
+    ):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.history_dir = history_dir
+        self.history_interval = history_interval
+        self.history_days = history_days
+        self._last_history = 0.0
+        self.stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="metrics-dumper", daemon=True)
+
+    def start(self) -> "MetricsDumper":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self._thread.join()
+        self.registry.write(self.path, self.history_dir, self.history_days)
+
+    def _write(self):
+        # Dernier état à chaque passage, historique au plus une fois par history_interval
+        history = time.monotonic() - self._last_history >= self.history_interval
+        self.registry.write(self.path, self.history_dir if history else None, self.history_days)
+        if history:
+            self._last_history = time.monotonic()
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self._write()
+            except OSError:
+                # Disque plein / non accessible : on réessaiera au prochain passage
+                pass
@@ -0,0 +1,311 @@
+import argparse
+import codecs
+import hashlib
+import json
+import os
+import re
+import time
+from typing import BinaryIO
+
+# ---------------------------
+# Allègement des notebooks déposés (.ipynb)
+# ---------------------------
+#
+# Les notebooks arrivent avec leurs sorties (tableaux HTML, images base64,
+# scripts de widgets), leurs compteurs d'exécution et les métadonnées de
+# l'éditeur (Colab...). Avant l'envoi, le fichier est lu en flux, par blocs :
+# chaque sortie de cellule est mise de côté pendant sa lecture et abandonnée
+# dès qu'elle dépasse la taille autorisée, si bien que la mémoire ne dépend
+# que du code et des petites sorties, jamais des grosses. Le reste du
+# document est ensuite normalisé (compteurs remis à zéro, métadonnées
+# réduites, clés triées) et réécrit comme le fait nbformat.
+# L'original n'est pas modifié : l'application le garde sur le serveur
+# (spool, originals/<sha256>, noté dans meta.txt) et le propose au
+# téléchargement dans l'onglet de revue.
+
+CHUNK_BYTES = 1 << 16
+# Taille maximale d'une sortie conservée, et de l'ensemble des sorties
+MAX_OUTPUT_BYTES = 2048
+MAX_TOTAL_OUTPUT_BYTES = 64 * 1024
+# Métadonnées conservées (notebook, cellules) et types MIME des sorties gardées
+NOTEBOOK_METADATA = {"kernelspec", "language_info"}
+CELL_METADATA = {"tags"}
+OUTPUT_MIME_TYPES = {"text/plain"}
+# Clés repérées dans le flux : au-delà, une chaîne ne peut pas être une clé utile
+MAX_KEY_CHARS = 64
+
+STRUCTURAL = re.compile(r'["{}\[\]:,]')
+# Couleurs des tracebacks IPython
+ANSI_ESCAPES = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class NotebookError(ValueError):
+    pass
+
+
+def placeholder(size: int) -> dict:
+    return {
+        "output_type": "stream",
+        "name": "stdout",
+        "text": [f"[sortie retirée au dépôt : {size / 1024:.1f} Ko]\n"],
+    }
+
+
+class _OutputFilter:
+    # Parcours du JSON en flux : seuls les caractères structurants sont
+    # examinés (recherche par expression régulière), le contenu des chaînes
+    # est recopié par tranches. Le chemin courant est suivi par la pile des
+    # clés des conteneurs ouverts ; les objets de cells[*].outputs[*] sont
+    # détournés vers un tampon plafonné.
+    def __init__(self, max_output_bytes: int, max_total_output_bytes: int):
+        self.max_output = max_output_bytes
+        self.total_budget = max_total_output_bytes
+        self.document: list[str] = []
+        self.stack: list[str | None] = []
+        self.in_string = False
+        self.escape = False
+        self.string_parts: list[str] | None = None
+        self.last_string: str | None = None
+        self.key: str | None = None
+        # Sortie en cours : tampon (None si abandonnée) et taille lue
+        self.output_depth: int | None = None
+        self.output_buf: list[str] | None = None
+        self.output_size = 0
+        self.stats = {"outputs": 0, "outputs_kept": 0, "outputs_removed": 0, "output_bytes_removed": 0}
+
+    def _emit(self, text: str):
+        if not text:
+            return
+        if self.output_depth is None:
+            self.document.append(text)
+            return
+        self.output_size += len(text)
+        if self.output_buf is not None:
+            if self.output_size > min(self.max_output, self.total_budget):
+                self.output_buf = None
+            else:
+                self.output_buf.append(text)
+
+    def _string_text(self, text: str):
+        if self.string_parts is not None:
+            self.string_parts.append(text)
+            if sum(map(len, self.string_parts)) > MAX_KEY_CHARS:
+                self.string_parts = None
+
+    def _start_output(self):
+        self.output_depth = len(self.stack)
+        self.output_buf = []
+        self.output_size = 0
+
+    def _end_output(self):
+        self.stats["outputs"] += 1
+        if self.output_buf is not None:
+            self.document.append("".join(self.output_buf))
+            self.total_budget -= self.output_size
+            self.stats["outputs_kept"] += 1
+        else:
+            self.document.append(json.dumps(placeholder(self.output_size)))
+            self.stats["outputs_removed"] += 1
+            self.stats["output_bytes_removed"] += self.output_size
+        self.output_depth = None
+        self.output_buf = None
+
+    def feed(self, chunk: str):
+        pos, start, n = 0, 0, len(chunk)
+        if self.escape and n:
+            self._string_text(chunk[0])
+            self.escape = False
+            pos = 1
+        while pos < n:
+            if self.in_string:
+                # str.find plutôt qu'une classe de caractères : les longues
+                # chaînes (images base64) sont parcourues bien plus vite
+                quote = chunk.find('"', pos)
+                i = chunk.find("\\", pos, n if quote < 0 else quote)
+                if i < 0:
+                    i = quote
+                if i < 0:
+                    self._string_text(chunk[pos:])
+                    break
+                if chunk[i] == "\\":
+                    self._string_text(chunk[pos:i + 2])
+                    self.escape = i + 1 >= n
+                    pos = i + 2
+                    continue
+                self._string_text(chunk[pos:i])
+                self.in_string = False
+                self.last_string = None if self.string_parts is None else "".join(self.string_parts)
+                pos = i + 1
+                continue
+            m = STRUCTURAL.search(chunk, pos)
+            if m is None:
+                break
+            i = m.start()
+            c = chunk[i]
+            pos = i + 1
+            if c == '"':
+                self.in_string = True
+                self.string_parts = [] if self.output_depth is None else None
+            elif c == ":":
+                self.key = self.last_string
+            elif c == ",":
+                self.key = None
+            elif c in "{[":
+                if (
+                    c == "{" and self.output_depth is None and len(self.stack) == 4
+                    and self.stack[1] == "cells" and self.stack[3] == "outputs"
+                ):
+                    self._emit(chunk[start:i])
+                    start = i
+                    self._start_output()
+                self.stack.append(self.key)
+                self.key = None
+            else:
+                if not self.stack:
+                    raise NotebookError("JSON mal formé : fermeture sans ouverture")
+                self.stack.pop()
+                if self.output_depth is not None and len(self.stack) == self.output_depth:
+                    self._emit(chunk[start:pos])
+                    start = pos
+                    self._end_output()
+        self._emit(chunk[start:])
+
+    def close(self) -> str:
+        if self.stack or self.in_string:
+            raise NotebookError("JSON mal formé : fichier tronqué")
+        return "".join(self.document)
+
+
+def filter_outputs(
+    stream: BinaryIO,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+    max_total_output_bytes: int = MAX_TOTAL_OUTPUT_BYTES,
+) -> tuple[dict, dict]:
+    # Lit le notebook par blocs ; renvoie le notebook (grosses sorties déjà
+    # remplacées par un message) et les statistiques de lecture
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    scanner = _OutputFilter(max_output_bytes, max_total_output_bytes)
+    h, size = hashlib.sha256(), 0
+    try:
+        for block in iter(lambda: stream.read(CHUNK_BYTES), b""):
+            h.update(block)
+            size += len(block)
+            scanner.feed(decoder.decode(block))
+        scanner.feed(decoder.decode(b"", final=True))
+        nb = json.loads(scanner.close())
+    except UnicodeDecodeError as e:
+        raise NotebookError(f"notebook non UTF-8 : {e}") from e
+    except json.JSONDecodeError as e:
+        raise NotebookError(f"JSON invalide : {e}") from e
+    if not isinstance(nb, dict) or not isinstance(nb.get("cells"), list):
+        raise NotebookError("pas un notebook Jupyter (clé cells absente)")
+    return nb, {**scanner.stats, "original_bytes": size, "original_sha256": h.hexdigest()}
+
+
+def _normalize_output(output: dict) -> dict:
+    if "execution_count" in output:
+        output["execution_count"] = None
+    if "metadata" in output:
+        output["metadata"] = {}
+    data = output.get("data")
+    if isinstance(data, dict):
+        kept = {k: v for k, v in data.items() if k in OUTPUT_MIME_TYPES}
+        dropped = sorted(set(data) - set(kept))
+        if not kept and dropped:
+            kept = {"text/plain": [f"[{', '.join(dropped)} retiré au dépôt]"]}
+        output["data"] = kept
+    return output
+
+
+def normalize(nb: dict, keep_outputs: bool = True) -> dict:
+    metadata = nb.get("metadata") or {}
+    nb["metadata"] = {k: v for k, v in metadata.items() if k in NOTEBOOK_METADATA}
+    for cell in nb["cells"]:
+        cell["metadata"] = {k: v for k, v in (cell.get("metadata") or {}).items() if k in CELL_METADATA}
+        if cell.get("cell_type") == "code":
+            cell["execution_count"] = None
+            outputs = (cell.get("outputs") or []) if keep_outputs else []
+            cell["outputs"] = [_normalize_output(o) for o in outputs]
+    return nb
+
+
+def dumps(nb: dict) -> bytes:
+    # Même mise en forme que nbformat.write : diffs lisibles d'un dépôt à l'autre
+    return (json.dumps(nb, sort_keys=True, indent=1, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def strip_notebook(
+    stream: BinaryIO,
+    keep_outputs: bool = True,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+    max_total_output_bytes: int = MAX_TOTAL_OUTPUT_BYTES,
+) -> tuple[bytes, dict]:
+    # keep_outputs=False : toutes les sorties sont retirées
+    start = time.perf_counter()
+    if not keep_outputs:
+        max_output_bytes = max_total_output_bytes = 0
+    nb, stats = filter_outputs(stream, max_output_bytes, max_total_output_bytes)
+    data = dumps(normalize(nb, keep_outputs))
+    stats.update(
+        stripped_bytes=len(data),
+        saved_bytes=stats["original_bytes"] - len(data),
+        elapsed_s=round(time.perf_counter() - start, 4),
+    )
+    return data, stats
+
+
+def _text(value) -> str:
+    return "".join(value) if isinstance(value, list) else (value or "")
+
+
+def _output_text(output: dict) -> str:
+    kind = output.get("output_type")
+    if kind == "stream":
+        return _text(output.get("text"))
+    if kind == "error":
+        return ANSI_ESCAPES.sub("", "\n".join(output.get("traceback") or [])) or (
+            f"{output.get('ename', '')}: {output.get('evalue', '')}"
+        )
+    return _text((output.get("data") or {}).get("text/plain"))
+
+
+def preview_cells(
+    stream: BinaryIO,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+    max_total_output_bytes: int = MAX_TOTAL_OUTPUT_BYTES,
+) -> list[dict]:
+    # Cellules à relire (code, markdown) avec leurs sorties texte ; les
+    # grosses sorties sont écartées pendant la lecture, comme au dépôt
+    nb, _ = filter_outputs(stream, max_output_bytes, max_total_output_bytes)
+    cells = []
+    for cell in nb["cells"]:
+        kind = cell.get("cell_type")
+        if kind not in ("code", "markdown"):
+            continue
+        outputs = [_output_text(o) for o in cell.get("outputs") or []] if kind == "code" else []
+        cells.append({"type": kind, "source": _text(cell.get("source")), "outputs": [o for o in outputs if o]})
+    return cells
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allège des notebooks (.ipynb) comme au dépôt")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--strip-all", action="store_true", help="Retire toutes les sorties")
+    parser.add_argument("--max-output-bytes", type=int, default=MAX_OUTPUT_BYTES)
+    parser.add_argument("--write", action="store_true", help="Écrit <nom>.stripped.ipynb à côté")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        with open(path, "rb") as f:
+            data, stats = strip_notebook(f, not args.strip_all, args.max_output_bytes)
+        if args.write:
+            with open(os.path.splitext(path)[0] + ".stripped.ipynb", "wb") as out:
+                out.write(data)
+        print(
+            f"{path} : {stats['original_bytes'] / 1024:.1f} Ko -> {stats['stripped_bytes'] / 1024:.1f} Ko "
+            f"({stats['outputs_removed']}/{stats['outputs']} sorties retirées, {stats['elapsed_s'] * 1000:.1f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import columnar
+import etl
+from catalog import CATALOG
+
+# ---------------------------
+# Jointure parallèle Sales × référentiels (partitionnement par clé)
+# ---------------------------
+#
+# Même résultat que etl.transform, réparti sur un pool de processus :
+#   1. diffusion : les référentiels indexés (clients, produits avec
+#      sous-catégorie et catégorie, territoires) sont sérialisés une fois en
+#      Arrow IPC dans un segment de mémoire partagée ; chaque processus les
+#      relit sans copie des tampons ;
+#   2. partitionnement : les ventes (copies Arrow projetées en mémoire) sont
+#      découpées en plages ; chaque plage calcule le hachage de OrderNumber
+#      et écrit le numéro de partition de ses lignes dans un tableau partagé ;
+#   3. jointure : chaque partition prend ses lignes, dans l'ordre des
+#      fichiers, puis nettoie, joint et calcule OrderYear / LineTotal /
+#      Margin localement. Toutes les lignes d'une même commande sont dans la
+#      même partition : le dédoublonnage reste exact ;
+#   4. fusion : rapports et agrégats KPI partiels sont additionnés ; les
+#      partitions sont écrites en Parquet (--output-dir) ou concaténées.
+# Plus de partitions que de processus : la mémoire d'une tâche reste bornée
+# à environ PARTITION_ROWS lignes, quelle que soit la taille des ventes.
+
+PARTITION_ROWS = 2_000_000
+HASH_RANGE_ROWS = 1_000_000
+# Octets de fin de clé hachés : la partie variable des numéros de commande
+KEY_TAIL_BYTES = 8
+KEY_COLUMN = "OrderNumber"
+LOOKUP_COLUMNS = {
+    "customers": etl.CUSTOMER_COLUMNS,
+    "products": etl.PRODUCT_COLUMNS,
+    "territories": etl.TERRITORY_COLUMNS,
+}
+
+# État des processus du pool, posé par _init_worker
+_worker: dict = {}
+
+
+def partition_ids(keys: pa.Array | pa.ChunkedArray, partitions: int) -> np.ndarray:
+    # Hachage vectorisé des KEY_TAIL_BYTES derniers octets de chaque chaîne,
+    # lus directement dans les tampons Arrow (pas d'objets Python)
+    if isinstance(keys, pa.ChunkedArray):
+        keys = keys.combine_chunks()
+    offset_type = np.int64 if pa.types.is_large_string(keys.type) else np.int32
+    offsets = np.frombuffer(keys.buffers()[1], dtype=offset_type)[keys.offset:keys.offset + len(keys) + 1]
+    raw = keys.buffers()[2]
+    data = np.frombuffer(raw, dtype=np.uint8) if raw is not None else np.zeros(0, dtype=np.uint8)
+    data = np.concatenate([np.zeros(KEY_TAIL_BYTES, dtype=np.uint8), data])
+    ends = offsets[1:].astype(np.int64)
+    lengths = ends - offsets[:-1]
+    tails = np.lib.stride_tricks.sliding_window_view(data, KEY_TAIL_BYTES)[ends]
+    # Les octets qui précèdent une clé courte appartiennent à la clé précédente
+    tails = tails * (np.arange(KEY_TAIL_BYTES) >= KEY_TAIL_BYTES - np.minimum(lengths, KEY_TAIL_BYTES)[:, None])
+    h = np.ascontiguousarray(tails).view("<u8").ravel() ^ lengths.astype(np.uint64)
+    h *= np.uint64(0x9E3779B97F4A7C15)
+    h ^= h >> np.uint64(32)
+    return (h % np.uint64(partitions)).astype(np.uint16)
+
+
+def sales_inputs(data_dir: str = etl.DATA_DIR, years: list[int] | None = None) -> list[tuple[str, int, int]]:
+    # (fichier, première ligne globale, nombre de lignes) ; les copies Arrow
+    # sont construites ici, une seule fois, avant le démarrage du pool
+    sales = CATALOG["sales"]
+    inputs, offset = [], 0
+    for year, path in sales.partitions(data_dir).items():
+        if years is None or year in years:
+            rows = columnar.open_table(path, **sales.read_options()).num_rows
+            inputs.append((path, offset, rows))
+            offset += rows
+    return inputs
+
+
+def broadcast_lookups(indexed: dict[str, pd.DataFrame]) -> tuple[shared_memory.SharedMemory, dict[str, tuple[int, int]]]:
+    # Un flux IPC par référentiel, à la suite dans un même segment
+    buffers = {}
+    for name, columns in LOOKUP_COLUMNS.items():
+        table = pa.Table.from_pandas(indexed[name][columns], preserve_index=True)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        buffers[name] = sink.getvalue()
+    shm = shared_memory.SharedMemory(create=True, size=max(sum(b.size for b in buffers.values()), 1))
+    layout, position = {}, 0
+    for name, buf in buffers.items():
+        shm.buf[position:position + buf.size] = memoryview(buf).cast("B")
+        layout[name] = (position, buf.size)
+        position += buf.size
+    return shm, layout
+
+
+def _init_worker(
+    inputs: list[tuple[str, int, int]], lookups_name: str, layout: dict, ids_name: str, partitions: int
+):
+    # Segments créés et libérés par le processus parent
+    lookups = shared_memory.SharedMemory(name=lookups_name)
+    ids = shared_memory.SharedMemory(name=ids_name)
+    total = sum(rows for _, _, rows in inputs)
+    indexed = {
+        name: pa.ipc.open_stream(pa.py_buffer(lookups.buf[start:start + size])).read_all().to_pandas(split_blocks=True)
+        for name, (start, size) in layout.items()
+    }
+    _worker.update(
+        inputs=inputs,
+        partitions=partitions,
+        indexed=indexed,
+        # Les segments restent ouverts tant que le processus vit
+        shm=(lookups, ids),
+        ids=np.ndarray(total, dtype=np.uint16, buffer=ids.buf),
+        tables={},
+    )
+
+
+def _table(path: str) -> pa.Table:
+    tables = _worker["tables"]
+    if path not in tables:
+        tables[path] = columnar.open_table(path, **CATALOG["sales"].read_options())
+    return tables[path]
+
+
+def _hash_range(task: tuple[int, int, int]) -> int:
+    file_index, start, stop = task
+    path, offset, _ = _worker["inputs"][file_index]
+    keys = _table(path).column(KEY_COLUMN).slice(start, stop - start)
+    _worker["ids"][offset + start:offset + stop] = partition_ids(keys, _worker["partitions"])
+    return stop - start
+
+
+def partial_kpis(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    # Sommes par groupe, additionnables d'une partition à l'autre
+    return {
+        "revenue_by_month_category": df.groupby(["OrderMonth", "CategoryName"], observed=True)[
+            ["LineTotal", "OrderQuantity"]
+        ].sum(),
+        "top_customers": df.groupby("CustomerKey")[["LineTotal"]].sum(),
+        "revenue_by_territory": df.groupby(["TerritoryKey", "Region", "Country"], observed=True)[
+            ["LineTotal"]
+        ].sum(),
+    }
+
+
+def merge_kpis(partials: list[dict[str, pd.DataFrame]], top: int = 10) -> dict[str, pd.DataFrame]:
+    # Mêmes tables que etl.compute_kpis sur la table intégrée complète
+    def combine(name: str) -> pd.DataFrame:
+        parts = pd.concat([p[name] for p in partials])
+        return parts.groupby(level=list(parts.index.names), observed=True).sum()
+
+    month_category = combine("revenue_by_month_category").rename(
+        columns={"LineTotal": "Revenue", "OrderQuantity": "Quantity"}
+    )
+    customers = combine("top_customers").rename(columns={"LineTotal": "Revenue"})
+    territories = combine("revenue_by_territory").rename(columns={"LineTotal": "Revenue"})
+    return {
+        "revenue_by_month_category": month_category.reset_index(),
+        "top_customers": customers.nlargest(top, "Revenue").reset_index(),
+        "revenue_by_territory": territories.reset_index().sort_values(
+            "Revenue", ascending=False, ignore_index=True
+        ),
+    }
+
+
+def _join_partition(partition: int, out_dir: str | None, collect: bool) -> dict:
+    start = time.perf_counter()
+    ids = _worker["ids"]
+    pieces = []
+    for path, offset, rows in _worker["inputs"]:
+        mine = np.flatnonzero(ids[offset:offset + rows] == partition)
+        if len(mine):
+            pieces.append(_table(path).take(mine))
+    report: dict = {}
+    if not pieces:
+        return {"partition": partition, "report": report, "kpis": None, "frame": None, "path": None,
+                "elapsed_s": 0.0}
+    sales = pa.concat_tables(pieces).to_pandas()
+    df = etl.clean_sales(sales, report)
+    df = etl.enrich(df, _worker["indexed"], report)
+    df = etl.add_derived_columns(df)
+    report["rows_out"] = len(df)
+    path = None
+    if out_dir is not None:
+        path = os.path.join(out_dir, f"part-{partition:05d}.parquet")
+        df.to_parquet(path, index=False)
+    return {
+        "partition": partition,
+        "report": report,
+        "kpis": partial_kpis(df) if len(df) else None,
+        "frame": df if collect else None,
+        "path": path,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_parallel(
+    data_dir: str = etl.DATA_DIR,
+    years: list[int] | None = None,
+    workers: int | None = None,
+    partitions: int | None = None,
+    out_dir: str | None = None,
+    collect: bool = False,
+) -> tuple[pd.DataFrame | None, dict[str, pd.DataFrame], dict]:
+    # Renvoie (table intégrée si collect, KPIs, rapport avec durées par étape)
+    timings = {}
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    inputs = sales_inputs(data_dir, years)
+    total = sum(rows for _, _, rows in inputs)
+    partitions = partitions or max(workers, -(-total // PARTITION_ROWS))
+    if not 0 < partitions <= np.iinfo(np.uint16).max:
+        raise ValueError(f"nombre de partitions invalide : {partitions}")
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    lookups, layout = broadcast_lookups(etl.index_lookups(etl.extract_lookups(data_dir)))
+    ids = shared_memory.SharedMemory(create=True, size=max(total * 2, 1))
+    timings["broadcast_s"] = time.perf_counter() - start
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(inputs, lookups.name, layout, ids.name, partitions),
+        ) as pool:
+            t0 = time.perf_counter()
+            ranges = [
+                (i, s, min(s + HASH_RANGE_ROWS, rows))
+                for i, (_, _, rows) in enumerate(inputs)
+                for s in range(0, rows, HASH_RANGE_ROWS)
+            ]
+            list(pool.map(_hash_range, ranges))
+            timings["partition_s"] = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            results = list(pool.map(
+                functools.partial(_join_partition, out_dir=out_dir, collect=collect), range(partitions)
+            ))
+            timings["join_s"] = time.perf_counter() - t0
+    finally:
+        lookups.close()
+        lookups.unlink()
+        ids.close()
+        ids.unlink()
+
+    report: dict = {}
+    for r in results:
+        for key, value in r["report"].items():
+            report[key] = report.get(key, 0) + value
+    partials = [r["kpis"] for r in results if r["kpis"] is not None]
+    kpis = merge_kpis(partials) if partials else {}
+    frame = None
+    if collect:
+        frames = [r["frame"] for r in results if r["frame"] is not None]
+        frame = pd.concat(frames, ignore_index=True) if frames else None
+    sizes = [r["report"].get("rows_in", 0) for r in results]
+    report.update(
+        workers=workers,
+        partitions=partitions,
+        largest_partition=max(sizes, default=0),
+        **{k: round(v, 3) for k, v in timings.items()},
+        elapsed_s=round(time.perf_counter() - start, 3),
+    )
+    return frame, kpis, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jointure Sales × référentiels sur plusieurs cœurs")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--years", type=int, nargs="+", help="Années de ventes (défaut : toutes)")
+    parser.add_argument("--workers", type=int, help="Processus (défaut : nombre de cœurs)")
+    parser.add_argument("--partitions", type=int, help=f"Défaut : une pour {PARTITION_ROWS:,d} lignes")
+    parser.add_argument("--output-dir", help="Écrit chaque partition en Parquet (part-NNNNN.parquet)")
+    args = parser.parse_args()
+
+    _, kpis, report = run_parallel(args.data_dir, args.years, args.workers, args.partitions, args.output_dir)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    for name, kpi in kpis.items():
+        print(f"\n{name}\n{kpi.head(10).to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+import argparse
+import re
+import zlib
+from typing import NamedTuple
+
+# ---------------------------
+# Texte des rapports PDF (sans dépendance)
+# ---------------------------
+#
+# Juste assez de PDF pour lire les rapports déposés (Word, LibreOffice,
+# imprimantes PDF) : objets indirects et flux d'objets (ObjStm), filtre
+# FlateDecode, arbre des pages avec ressources héritées, opérateurs de
+# texte (Tj, TJ, ', ") et formulaires (Do). Les codes des chaînes sont
+# traduits par la CMap ToUnicode de la police (polices Identity-H de Word),
+# sinon en Windows-1252. Retours à la ligne : changement d'ordonnée du
+# texte dans le repère de la page (matrices cm / Tm / Td suivies). Pas de
+# rendu, pas de mise en page : de quoi relire, pas plus.
+
+MAX_PAGES = 50
+MAX_CHARS = 200_000
+# Taille décompressée bornée (bombes zlib) : par flux (au-delà : tronqué) et par document
+MAX_STREAM_BYTES = 8 * 1024 * 1024
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+# Décalage TJ (millièmes de cadratin) au-delà duquel on insère une espace
+TJ_SPACE = -200
+MAX_FORM_DEPTH = 4
+# Écart d'ordonnée (points) à partir duquel deux morceaux de texte sont sur deux lignes
+LINE_TOLERANCE = 2.0
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
+WHITESPACE = b"\x00\t\n\x0c\r "
+DELIMITERS = b"()<>[]{}/%"
+OBJECT_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+REF_RE = re.compile(rb"(\d+)\s+(\d+)\s+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])")
+NUMBER_RE = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)")
+ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+
+
+class PdfError(ValueError):
+    pass
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class Name(str):
+    pass
+
+
+class Op(str):
+    pass
+
+
+class Stream(NamedTuple):
+    meta: dict
+    raw: bytes
+
+
+class _Lexer:
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _skip(self):
+        data, n = self.data, len(self.data)
+        while self.pos < n:
+            c = data[self.pos]
+            if c in WHITESPACE:
+                self.pos += 1
+            elif c == 0x25:  # % commentaire
+                while self.pos < n and data[self.pos] not in b"\r\n":
+                    self.pos += 1
+            else:
+                break
+
+    def _regular(self) -> bytes:
+        start = self.pos
+        data, n = self.data, len(self.data)
+        while self.pos < n and data[self.pos] not in WHITESPACE and data[self.pos] not in DELIMITERS:
+            self.pos += 1
+        return data[start:self.pos]
+
+    def _literal(self) -> bytes:
+        data, n = self.data, len(self.data)
+        self.pos += 1
+        out, depth = bytearray(), 1
+        while self.pos < n:
+            c = data[self.pos]
+            self.pos += 1
+            if c == 0x5C:  # \
+                e = data[self.pos] if self.pos < n else 0
+                self.pos += 1
+                if e in ESCAPES:
+                    out += ESCAPES[e]
+                elif 0x30 <= e <= 0x37:
+                    digits = bytes([e])
+                    while len(digits) < 3 and self.pos < n and 0x30 <= data[self.pos] <= 0x37:
+                        digits += data[self.pos:self.pos + 1]
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif e == 0x0D:
+                    if self.pos < n and data[self.pos] == 0x0A:
+                        self.pos += 1
+                elif e != 0x0A:
+                    out.append(e)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                depth -= 1
+                if depth == 0:
+                    break
+                out.append(c)
+            else:
+                out.append(c)
+        return bytes(out)
+
+    def _hex(self) -> bytes:
+        end = self.data.find(b">", self.pos)
+        if end < 0:
+            raise PdfError("chaîne hexadécimale non terminée")
+        digits = re.sub(rb"[^0-9A-Fa-f]", b"", self.data[self.pos + 1:end])
+        self.pos = end + 1
+        if len(digits) % 2:
+            digits += b"0"
+        return bytes.fromhex(digits.decode())
+
+    def next(self):
+        # Objet suivant ; lève EOFError en fin de données
+        self._skip()
+        data = self.data
+        if self.pos >= len(data):
+            raise EOFError
+        c = data[self.pos]
+        if c == 0x2F:  # /nom
+            self.pos += 1
+            name = self._regular()
+            return Name(re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes.fromhex(m[1].decode()), name).decode("latin-1"))
+        if c == 0x28:
+            return self._literal()
+        if c == 0x3C:
+            if data[self.pos:self.pos + 2] == b"<<":
+                self.pos += 2
+                items = self._until(b">>")
+                return {str(items[i]): items[i + 1] for i in range(0, len(items) - 1, 2)}
+            return self._hex()
+        if c == 0x5B:
+            self.pos += 1
+            return self._until(b"]")
+        if c in b"]>)":
+            self.pos += 1
+            return Op(chr(c))
+        if c in b"{}":
+            self.pos += 1
+            return Op(chr(c))
+        ref = REF_RE.match(data, self.pos)
+        if ref:
+            self.pos = ref.end()
+            return Ref(int(ref[1]), int(ref[2]))
+        token = self._regular()
+        if not token:
+            self.pos += 1
+            return Op(chr(c))
+        if NUMBER_RE.fullmatch(token):
+            return float(token) if b"." in token else int(token)
+        word = token.decode("latin-1")
+        return {"true": True, "false": False, "null": None}.get(word, Op(word))
+
+    def _until(self, closing: bytes) -> list:
+        items = []
+        while True:
+            self._skip()
+            if self.data.startswith(closing, self.pos):
+                self.pos += len(closing)
+                return items
+            try:
+                items.append(self.next())
+            except EOFError:
+                return items
+
+
+def _filters(meta) -> list[str]:
+    f = meta.get("Filter") if isinstance(meta, dict) else None
+    return [f] if isinstance(f, str) else [v for v in f if isinstance(v, str)] if isinstance(f, list) else []
+
+
+class PdfDocument:
+    def __init__(self, data: bytes):
+        if not data.startswith(b"%PDF"):
+            raise PdfError("pas un fichier PDF")
+        self.data = data
+        self.objects: dict[int, object] = {}
+        # Octets décompressés jusqu'ici, bornés par MAX_DECODED_BYTES
+        self._decoded = 0
+        for m in OBJECT_RE.finditer(data):
+            # Mise à jour incrémentale : la dernière définition l'emporte
+            lexer = _Lexer(data, m.end())
+            try:
+                value = lexer.next()
+            except (EOFError, PdfError, ValueError):
+                continue
+            if isinstance(value, dict):
+                lexer._skip()
+                if data.startswith(b"stream", lexer.pos):
+                    value = self._stream(value, lexer.pos + len(b"stream"))
+            self.objects[int(m[1])] = value
+        for value in list(self.objects.values()):
+            if isinstance(value, Stream) and value.meta.get("Type") == "ObjStm":
+                self._unpack(value)
+        self._fonts: dict[int, tuple[dict, int]] = {}
+
+    def _stream(self, meta: dict, pos: int) -> Stream:
+        data = self.data
+        if data.startswith(b"\r\n", pos):
+            pos += 2
+        elif data[pos:pos + 1] in (b"\n", b"\r"):
+            pos += 1
+        length = meta.get("Length")
+        if isinstance(length, int):
+            # Longueur directe, contrôlée par la présence de endstream juste après
+            tail = data[pos + length:pos + length + 12].lstrip(WHITESPACE)
+            length = length if tail.startswith(b"endstream") else None
+        if not isinstance(length, int):
+            end = data.find(b"endstream", pos)
+            length = (end if end >= 0 else len(data)) - pos
+        return Stream(meta, data[pos:pos + length])
+
+    def _unpack(self, stream: Stream):
+        raw = self.decode(stream)
+        if raw is None:
+            return
+        lexer = _Lexer(raw)
+        try:
+            header = [lexer.next() for _ in range(2 * int(stream.meta.get("N", 0)))]
+        except (EOFError, PdfError, ValueError):
+            return
+        first = stream.meta.get("First", 0)
+        if not isinstance(first, int):
+            return
+        for num, offset in zip(header[::2], header[1::2]):
+            if not (isinstance(num, int) and isinstance(offset, int)) or offset < 0:
+                continue
+            if num not in self.objects:
+                try:
+                    self.objects[num] = _Lexer(raw, first + offset).next()
+                except (EOFError, PdfError, ValueError):
+                    continue
+
+    def resolve(self, value):
+        seen = 0
+        while isinstance(value, Ref) and seen < 32:
+            value = self.objects.get(value.num)
+            seen += 1
+        return value
+
+    def decode(self, stream: Stream) -> bytes | None:
+        raw = stream.raw
+        for name in _filters(self.resolve(stream.meta)):
+            if name in ("FlateDecode", "Fl"):
+                try:
+                    # Flux tronqué à MAX_STREAM_BYTES : assez pour du texte
+                    raw = zlib.decompressobj().decompress(raw, MAX_STREAM_BYTES)
+                except zlib.error:
+                    return None
+                self._decoded += len(raw)
+                if self._decoded > MAX_DECODED_BYTES:
+                    raise PdfError("contenu décompressé trop volumineux")
+            else:
+                # Images (DCT, JBIG2...) : sans texte
+                return None
+        return raw
+
+    # ---------------------------
+    # Pages et polices
+    # ---------------------------
+
+    def pages(self) -> list[tuple[dict, dict]]:
+        # (page, ressources héritées) dans l'ordre de lecture
+        catalog = next(
+            (v for v in reversed(list(self.objects.values())) if isinstance(v, dict) and v.get("Type") == "Catalog"),
+            None,
+        )
+        if catalog is None:
+            raise PdfError("catalogue introuvable")
+        out = []
+        stack = [(self.resolve(catalog.get("Pages")), {})]
+        seen = set()
+        while stack:
+            node, inherited = stack.pop()
+            if not isinstance(node, dict) or id(node) in seen:
+                continue
+            seen.add(id(node))
+            resources = self.resolve(node.get("Resources"))
+            if not isinstance(resources, dict):
+                resources = inherited
+            if node.get("Type") == "Pages" or "Kids" in node:
+                kids = self.resolve(node.get("Kids"))
+                kids = kids if isinstance(kids, list) else []
+                stack.extend((self.resolve(k), resources) for k in reversed(kids))
+            else:
+                out.append((node, resources))
+        return out
+
+    def _font(self, ref) -> tuple[dict, int]:
+        # Table code -> texte et longueur des codes, d'après ToUnicode
+        key = ref.num if isinstance(ref, Ref) else id(ref)
+        if key not in self._fonts:
+            font = self.resolve(ref)
+            font = font if isinstance(font, dict) else {}
+            width = 2 if font.get("Subtype") == "Type0" else 1
+            cmap = {}
+            to_unicode = self.resolve(font.get("ToUnicode"))
+            if isinstance(to_unicode, Stream):
+                raw = self.decode(to_unicode)
+                if raw:
+                    cmap, width = parse_cmap(raw, width)
+            self._fonts[key] = (cmap, width)
+        return self._fonts[key]
+
+    def _content(self, page: dict) -> bytes:
+        contents = self.resolve(page.get("Contents"))
+        streams = contents if isinstance(contents, list) else [contents]
+        parts = [self.decode(s) for s in map(self.resolve, streams) if isinstance(s, Stream)]
+        return b"\n".join(p for p in parts if p)
+
+    def page_text(self, content: bytes, resources: dict, ctm: tuple = IDENTITY, depth: int = 0) -> str:
+        # Valeurs mal typées (/Resources 5...) : ignorées comme si absentes
+        resources = resources if isinstance(resources, dict) else {}
+        fonts = self.resolve(resources.get("Font"))
+        fonts = fonts if isinstance(fonts, dict) else {}
+        xobjects = self.resolve(resources.get("XObject"))
+        xobjects = xobjects if isinstance(xobjects, dict) else {}
+        out: list[str] = []
+        operands: list = []
+        cmap, width = {}, 1
+        saved: list[tuple] = []
+        line = IDENTITY
+        last_y = None
+        lexer = _Lexer(content)
+
+        def newline():
+            if out and not out[-1].endswith("\n"):
+                out.append("\n")
+
+        def show(value: bytes):
+            # Nouvelle ligne quand l'ordonnée du texte (repère de la page) change
+            nonlocal last_y
+            y = line[4] * ctm[1] + line[5] * ctm[3] + ctm[5]
+            if last_y is not None and abs(y - last_y) > LINE_TOLERANCE:
+                newline()
+            last_y = y
+            out.append(decode_text(value, cmap, width))
+
+        while True:
+            try:
+                token = lexer.next()
+            except (EOFError, PdfError):
+                break
+            if not isinstance(token, Op):
+                operands.append(token)
+                continue
+            numbers = [v for v in operands if isinstance(v, (int, float))]
+            if token == "BI":
+                # Image en ligne : données brutes jusqu'à EI
+                end = content.find(b"EI", lexer.pos)
+                lexer.pos = len(content) if end < 0 else end + 2
+            elif token == "q":
+                saved.append(ctm)
+            elif token == "Q" and saved:
+                ctm = saved.pop()
+            elif token == "cm" and len(numbers) >= 6:
+                ctm = _multiply(tuple(numbers[-6:]), ctm)
+            elif token == "BT":
+                line = IDENTITY
+            elif token in ("Td", "TD") and len(numbers) >= 2:
+                line = _multiply((1, 0, 0, 1, numbers[-2], numbers[-1]), line)
+            elif token == "Tm" and len(numbers) >= 6:
+                line = tuple(numbers[-6:])
+            elif token == "T*":
+                newline()
+            elif token == "Tf" and len(operands) >= 2:
+                cmap, width = self._font(fonts.get(operands[-2]))
+            elif token == "Tj" and operands:
+                show(operands[-1])
+            elif token in ("'", '"') and operands:
+                newline()
+                show(operands[-1])
+            elif token == "TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, bytes):
+                        show(item)
+                    elif isinstance(item, (int, float)) and item < TJ_SPACE:
+                        out.append(" ")
+            elif token == "Do" and operands and depth < MAX_FORM_DEPTH:
+                form = self.resolve(xobjects.get(operands[-1]))
+                if isinstance(form, Stream) and form.meta.get("Subtype") == "Form":
+                    raw = self.decode(form)
+                    matrix = self.resolve(form.meta.get("Matrix"))
+                    if not (isinstance(matrix, list) and len(matrix) == 6
+                            and all(isinstance(v, (int, float)) for v in matrix)):
+                        matrix = IDENTITY
+                    if raw:
+                        newline()
+                        out.append(self.page_text(
+                            raw, self.resolve(form.meta.get("Resources")) or resources,
+                            _multiply(tuple(matrix), ctm), depth + 1,
+                        ))
+            operands = []
+        return "".join(out)
+
+    def text(self, max_pages: int = MAX_PAGES, max_chars: int = MAX_CHARS) -> str:
+        pages, total = [], 0
+        for page, resources in self.pages()[:max_pages]:
+            text = _tidy(self.page_text(self._content(page), resources))
+            pages.append(text)
+            total += len(text)
+            if total >= max_chars:
+                break
+        return "\n\n".join(pages)[:max_chars]
+
+
+def _multiply(m: tuple, n: tuple) -> tuple:
+    # Produit de matrices PDF [a b c d e f] (m appliquée avant n)
+    return (
+        m[0] * n[0] + m[1] * n[2], m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2], m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4], m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+def parse_cmap(raw: bytes, width: int = 1) -> tuple[dict[bytes, str], int]:
+    cmap: dict[bytes, str] = {}
+    lexer = _Lexer(raw)
+    operands: list = []
+    while True:
+        try:
+            token = lexer.next()
+        except (EOFError, PdfError):
+            break
+        if not isinstance(token, Op):
+            operands.append(token)
+            continue
+        if token == "endcodespacerange" and operands and isinstance(operands[0], bytes):
+            width = len(operands[0])
+        elif token == "endbfchar":
+            for src, dst in zip(operands[::2], operands[1::2]):
+                if isinstance(src, bytes) and isinstance(dst, bytes):
+                    cmap[src] = _utf16(dst)
+        elif token == "endbfrange":
+            for lo, hi, dst in zip(operands[::3], operands[1::3], operands[2::3]):
+                if not (isinstance(lo, bytes) and isinstance(hi, bytes)):
+                    continue
+                start, stop, size = int.from_bytes(lo, "big"), int.from_bytes(hi, "big"), len(lo)
+                for i, code in enumerate(range(start, min(stop, start + 0xFFFF) + 1)):
+                    if isinstance(dst, list):
+                        if i >= len(dst):
+                            break
+                        text = _utf16(dst[i])
+                    else:
+                        # Dernier octet incrémenté, comme le prévoit la norme
+                        text = _utf16(dst[:-1] + bytes([(dst[-1] + i) & 0xFF])) if dst else ""
+                    cmap[code.to_bytes(size, "big")] = text
+        operands = []
+    return cmap, width
+
+
+def _utf16(value: bytes) -> str:
+    return value.decode("utf-16-be", "replace") if isinstance(value, bytes) else ""
+
+
+def decode_text(value: bytes, cmap: dict[bytes, str], width: int) -> str:
+    if not cmap:
+        return value.decode("cp1252", "replace") if width == 1 else ""
+    return "".join(
+        cmap.get(value[i:i + width], value[i:i + width].decode("cp1252", "replace") if width == 1 else "")
+        for i in range(0, len(value), width)
+    )
+
+
+def _tidy(text: str) -> str:
+    lines = [re.sub(r"[ \t\xa0]+", " ", line).strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def extract_text(data: bytes, max_pages: int = MAX_PAGES, max_chars: int = MAX_CHARS) -> str:
+    # Toute erreur d'analyse d'un fichier déposé devient une PdfError
+    try:
+        return PdfDocument(data).text(max_pages, max_chars)
+    except PdfError:
+        raise
+    except Exception as e:
+        raise PdfError(f"PDF illisible ({type(e).__name__} : {e})") from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texte brut d'un ou plusieurs PDF")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        with open(path, "rb") as f:
+            print(f"== {path}\n{extract_text(f.read(), args.max_pages)}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import etl
+from datasets import file_sha256, file_signature
+
+# ---------------------------
+# Profils des jeux de données (fichiers annexes JSON)
+# ---------------------------
+#
+# Pour chaque CSV de data/ : nombre de lignes, types, valeurs manquantes,
+# cardinalités, min / max et défauts de qualité du TP (quantités <= 0,
+# doublons de ligne de commande, clés orphelines ou invalides), calculés en
+# une passe vectorisée sur le fichier brut. Le résultat est écrit à côté du
+# fichier (<nom>.csv.profile.json) avec son SHA-256 et ceux des référentiels
+# utilisés : il n'est recalculé que si l'un de ces fichiers change.
+
+PROFILE_VERSION = 1
+PROFILE_SUFFIX = ".profile.json"
+
+# Clé étrangère -> (référentiel, nom de la clé dans le référentiel)
+KEY_LOOKUPS = {
+    "CustomerKey": (etl.CUSTOMER_FILE, "CustomerKey"),
+    "ProductKey": (etl.PRODUCT_FILE, "ProductKey"),
+    "TerritoryKey": (etl.TERRITORY_FILE, "SalesTerritoryKey"),
+    "ProductSubcategoryKey": (etl.SUBCATEGORY_FILE, "ProductSubcategoryKey"),
+    "ProductCategoryKey": (etl.CATEGORY_FILE, "ProductCategoryKey"),
+}
+
+
+def profile_path(path: str) -> str:
+    return path + PROFILE_SUFFIX
+
+
+def read_raw(path: str, **read_csv_kwargs) -> pd.DataFrame:
+    # Fichier tel que le verront les étudiant·e·s, sans typage imposé (copie
+    # Arrow partagée avec le téléchargement Parquet)
+    return columnar.read_raw(path, **read_csv_kwargs)
+
+
+def _scalar(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+@functools.lru_cache(maxsize=16)
+def _lookup_keys(path: str, signature: tuple[int, int], column: str) -> np.ndarray:
+    # Relu une seule fois par version du référentiel (plusieurs années de ventes)
+    keys = pd.to_numeric(read_raw(path, usecols=[column])[column], errors="coerce")
+    return keys.dropna().to_numpy()
+
+
+def lookup_keys(data_dir: str, name: str, column: str) -> np.ndarray:
+    path = os.path.join(data_dir, name)
+    return _lookup_keys(path, file_signature(path), column)
+
+
+def compute_profile(path: str) -> dict:
+    start = time.perf_counter()
+    data_dir, name = os.path.split(path)
+    df = read_raw(path)
+
+    # Colonnes *Date : min / max sur les dates ; les autres non numériques n'en ont pas
+    dates = {
+        c: pd.to_datetime(df[c], errors="coerce", format="%Y-%m-%d")
+        for c in df.columns if c.endswith("Date")
+    }
+    numeric = df.select_dtypes("number")
+    minmax = numeric.agg(["min", "max"]) if not numeric.empty else pd.DataFrame()
+    nulls = df.isna().sum()
+    unique = df.nunique()
+    columns = []
+    for c in df.columns:
+        col = {
+            "name": c,
+            "dtype": "date" if c in dates else str(df[c].dtype),
+            "non_null": int(len(df) - nulls[c]),
+            "nulls": int(nulls[c]),
+            "unique": int(unique[c]),
+            "min": None,
+            "max": None,
+        }
+        if c in dates:
+            col["min"], col["max"] = _scalar(dates[c].min()), _scalar(dates[c].max())
+        elif c in minmax.columns:
+            col["min"], col["max"] = _scalar(minmax.at["min", c]), _scalar(minmax.at["max", c])
+        columns.append(col)
+
+    defects: dict[str, int] = {}
+    depends: dict[str, dict] = {}
+    for c, values in dates.items():
+        defects[f"invalid_{c}"] = int((values.isna() & df[c].notna()).sum())
+    if "OrderQuantity" in df:
+        defects["non_positive_OrderQuantity"] = int((df["OrderQuantity"] <= 0).sum())
+    if set(etl.SALES_KEY) <= set(df.columns):
+        defects["duplicate_lines"] = int(df.duplicated(etl.SALES_KEY).sum())
+    for key, (lookup, lookup_column) in KEY_LOOKUPS.items():
+        column = lookup_column if name == lookup else key
+        if column not in df:
+            continue
+        values = pd.to_numeric(df[column], errors="coerce")
+        if name == lookup:
+            # Référentiel : clé primaire invalide (lignes parasites) ou dupliquée
+            defects[f"invalid_{column}"] = int(values.isna().sum())
+            defects[f"duplicate_{column}"] = int(values.dropna().duplicated().sum())
+        elif os.path.exists(os.path.join(data_dir, lookup)):
+            known = lookup_keys(data_dir, lookup, lookup_column)
+            defects[f"orphan_{key}"] = int((~np.isin(values.to_numpy(), known)).sum())
+            depends[lookup] = fingerprint(os.path.join(data_dir, lookup))
+
+    return {
+        "version": PROFILE_VERSION,
+        "file": name,
+        **fingerprint(path),
+        "depends": depends,
+        "rows": len(df),
+        "columns": columns,
+        "defects": defects,
+        "computed_in_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def fingerprint(path: str) -> dict:
+    mtime_ns, size = file_signature(path)
+    return {"sha256": file_sha256(path), "size": size, "mtime_ns": mtime_ns}
+
+
+def unchanged(entry: dict, path: str) -> bool:
+    # Signature (mtime, taille) d'abord ; le hash n'est recalculé que si elle a
+    # changé, et la signature est mise à jour si le contenu est identique
+    if not os.path.exists(path):
+        return False
+    signature = file_signature(path)
+    if (entry["mtime_ns"], entry["size"]) == signature:
+        return True
+    if entry["sha256"] != file_sha256(path):
+        return False
+    entry["mtime_ns"], entry["size"] = signature
+    return True
+
+
+def _fresh(profile: dict, path: str) -> bool:
+    data_dir = os.path.dirname(path)
+    return profile.get("version") == PROFILE_VERSION and unchanged(profile, path) and all(
+        unchanged(entry, os.path.join(data_dir, lookup))
+        for lookup, entry in profile["depends"].items()
+    )
+
+
+def write_profile(path: str, profile: dict):
+    tmp = f"{profile_path(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, profile_path(path))
+    except OSError:
+        # data/ en lecture seule ou disque plein : le profil est servi sans être gardé
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def get_profile(path: str, force: bool = False) -> dict:
+    sidecar = profile_path(path)
+    if not force and os.path.exists(sidecar):
+        try:
+            with open(sidecar, encoding="utf-8") as f:
+                raw = f.read()
+            profile = json.loads(raw)
+        except (OSError, ValueError):
+            # Fichier illisible ou tronqué : profil recalculé
+            profile = None
+        if profile is not None and _fresh(profile, path):
+            if json.dumps(profile, indent=1, ensure_ascii=False) != raw:
+                # Contenu identique (copie, checkout) : seules les signatures changent
+                write_profile(path, profile)
+            return profile
+    profile = compute_profile(path)
+    write_profile(path, profile)
+    return profile
+
+
+def profile_all(data_dir: str = etl.DATA_DIR, force: bool = False) -> dict[str, dict]:
+    return {
+        name: get_profile(os.path.join(data_dir, name), force)
+        for name in sorted(os.listdir(data_dir)) if name.endswith(".csv")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profils des fichiers de data/")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="Recalculer tous les profils")
+    args = parser.parse_args()
+
+    for name, profile in profile_all(args.data_dir, args.force).items():
+        defects = {k: v for k, v in profile["defects"].items() if v}
+        print(f"{name:50s} {profile['rows']:>8,d} lignes  défauts={defects or '-'}")
+
+
+if __name__ == "__main__":
+    main()
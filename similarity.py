@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import tokenize
+from collections import defaultdict
+
+import numpy as np
+
+# ---------------------------
+# Détection de soumissions similaires (MinHash + LSH)
+# ---------------------------
+#
+# Le code de chaque soumission (.py ou cellules de code d'un .ipynb) est
+# normalisé en jetons (commentaires et chaînes neutralisés, identifiants
+# conservés), découpé en shingles de k jetons puis résumé par une signature
+# MinHash. Le LSH par bandes ne propose que les paires qui partagent au
+# moins une bande : le coût reste quasi linéaire en nombre de soumissions,
+# au lieu de comparer toutes les paires.
+
+SUBMISSIONS_DIR = "submissions"
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def read_code(path: str) -> str:
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.endswith(".ipynb"):
+        nb = json.loads(raw)
+        cells = []
+        for cell in nb.get("cells", []):
+            if cell.get("cell_type") == "code":
+                source = cell.get("source", "")
+                cells.append("".join(source) if isinstance(source, list) else source)
+        return "\n\n".join(cells)
+    return raw.decode("utf-8", "replace")
+
+
+def code_tokens(code: str) -> list[str]:
+    skip = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT}
+    # Commandes shell / magics IPython retirées avant l'analyse
+    code = "\n".join(l for l in code.splitlines() if not l.lstrip().startswith(("!", "%")))
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in skip:
+                continue
+            tokens.append("<str>" if tok.type == tokenize.STRING else tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Code non analysable : découpage grossier sur les blancs
+        tokens = code.split()
+    return tokens
+
+
+def shingles(tokens: list[str], k: int = SHINGLE_SIZE) -> np.ndarray:
+    if len(tokens) < k:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little")
+        for g in grams
+    ]
+    return np.unique(np.array(hashes, dtype=np.uint64))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if len(hashes) == 0:
+            return np.full(len(self.a), MERSENNE_PRIME, dtype=np.uint64)
+        # (a*x + b) mod p sur toutes les permutations à la fois ; a, x < 2^31 : pas de débordement
+        values = (np.outer(self.a, hashes % MERSENNE_PRIME) + self.b[:, None]) % MERSENNE_PRIME
+        return values.min(axis=1)
+
+
+def lsh_parameters(threshold: float, num_perm: int = NUM_PERM) -> tuple[int, int]:
+    # Choix (bandes, lignes) dont le seuil (1/b)^(1/r) est le plus proche de threshold
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def find_clusters(
+    codes: dict[str, str], threshold: float = 0.8, num_perm: int = NUM_PERM
+) -> list[dict]:
+    hasher = MinHasher(num_perm)
+    names = list(codes)
+    all_signatures = [hasher.signature(shingles(code_tokens(codes[n]))) for n in names]
+
+    # Copies exactes regroupées d'abord : le LSH ne voit qu'un représentant
+    representatives: dict[bytes, int] = {}
+    copies = defaultdict(list)
+    for i, sig in enumerate(all_signatures):
+        rep = representatives.setdefault(sig.tobytes(), i)
+        if rep != i:
+            copies[rep].append(i)
+    reps = sorted(representatives.values())
+    signatures = np.array([all_signatures[i] for i in reps]).reshape(len(reps), num_perm)
+    bands, rows = lsh_parameters(threshold, num_perm)
+
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        block = signatures[:, band * rows:(band + 1) * rows]
+        for i, row in enumerate(block):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+
+    # Union-find sur les paires candidates confirmées par la similarité estimée
+    parent = list(range(len(reps)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    pairs = []
+    for i, j in sorted(candidates):
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            pairs.append((names[reps[i]], names[reps[j]], round(similarity, 3)))
+            parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i, rep in enumerate(reps):
+        groups[find(i)].append(rep)
+    clusters = []
+    for members in groups.values():
+        expanded = [names[m] for rep in members for m in [rep, *copies[rep]]]
+        if len(expanded) < 2:
+            continue
+        member_set = set(expanded)
+        exact = [(names[rep], names[c], 1.0) for rep in members for c in copies[rep]]
+        clusters.append({
+            "members": sorted(expanded),
+            "pairs": exact + [p for p in pairs if p[0] in member_set],
+        })
+    return sorted(clusters, key=lambda c: -len(c["members"]))
+
+
+def load_submissions(root: str = SUBMISSIONS_DIR) -> dict[str, str]:
+    codes = {}
+    for folder in sorted(os.listdir(root)):
+        for name in ("code.py", "code.ipynb"):
+            path = os.path.join(root, folder, name)
+            if os.path.exists(path):
+                codes[folder] = read_code(path)
+                break
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regroupe les soumissions au code similaire")
+    parser.add_argument("--submissions", default=SUBMISSIONS_DIR)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--output", help="Fichier JSON des clusters")
+    args = parser.parse_args()
+
+    clusters = find_clusters(load_submissions(args.submissions), args.threshold)
+    for i, cluster in enumerate(clusters, 1):
+        print(f"Cluster {i} ({len(cluster['members'])} soumissions)")
+        for a, b, sim in cluster["pairs"]:
+            print(f"  {a} ~ {b} : {sim:.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(clusters, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
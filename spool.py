@@ -0,0 +1,369 @@
+import contextlib
+import hashlib
+import io
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
+import requests
+
+from github_api import STREAM_CHUNK_BYTES, FileTooLargeError, GitHubError, GitHubRepo
+from metrics import MetricsRegistry
+
+# ---------------------------
+# File d'attente locale des soumissions
+# ---------------------------
+#
+# Chaque soumission est d'abord écrite sur disque puis acquittée tout de
+# suite. Les contenus sont stockés une seule fois sous objects/<sha256>, la
+# base SQLite ne garde que les métadonnées et l'état d'envoi. Un thread
+# d'arrière-plan pousse ensuite les éléments vers GitHub.
+# originals/<sha256> garde, hors file d'envoi, les fichiers remplacés au dépôt
+# par une version allégée (notebooks) : le ménage n'y touche jamais.
+
+PENDING = "en attente"
+UPLOADING = "envoi en cours"
+DONE = "envoyé"
+FAILED = "échec"
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    commit_sha TEXT,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS submission_files (
+    submission_id INTEGER NOT NULL REFERENCES submissions(id),
+    dest_path TEXT NOT NULL,
+    object_sha TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (submission_id, dest_path)
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions(status, next_attempt_at);
+"""
+
+
+class SubmissionSpool:
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.originals_dir = os.path.join(root, "originals")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.db_path = os.path.join(root, "spool.sqlite3")
+        # Protège les objets partagés entre un dépôt en cours et le ménage
+        self._objects_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Éléments interrompus par un redémarrage : on les remet en file
+            conn.execute(
+                "UPDATE submissions SET status = ? WHERE status = ?", (PENDING, UPLOADING)
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _object_path(self, sha: str, directory: str | None = None) -> str:
+        return os.path.join(directory or self.objects_dir, sha[:2], sha)
+
+    def _write_object(self, data: bytes | BinaryIO, directory: str | None = None) -> tuple[str, int]:
+        # Copie par blocs vers un fichier temporaire, hashée au passage : un
+        # UploadedFile n'est jamais recopié en entier en mémoire.
+        stream = io.BytesIO(data) if isinstance(data, bytes) else data
+        directory = directory or self.objects_dir
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, f"{os.getpid()}.{threading.get_ident()}.tmp")
+        h, size = hashlib.sha256(), 0
+        with open(tmp, "wb") as f:
+            for block in iter(lambda: stream.read(STREAM_CHUNK_BYTES), b""):
+                h.update(block)
+                f.write(block)
+                size += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        sha = h.hexdigest()
+        path = self._object_path(sha, directory)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        return sha, size
+
+    def enqueue(self, files: dict[str, bytes | BinaryIO], message: str) -> int:
+        now = time.time()
+        with self._objects_lock, self._connect() as conn:
+            entries = [(dest, *self._write_object(data)) for dest, data in files.items()]
+            cur = conn.execute(
+                "INSERT INTO submissions (message, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (message, PENDING, now, now),
+            )
+            conn.executemany(
+                "INSERT INTO submission_files (submission_id, dest_path, object_sha, size) "
+                "VALUES (?, ?, ?, ?)",
+                [(cur.lastrowid, dest, sha, size) for dest, sha, size in entries],
+            )
+            return cur.lastrowid
+
+    def archive(self, data: bytes | BinaryIO) -> tuple[str, int]:
+        # Original conservé sur le serveur, retrouvé par son SHA-256
+        with self._objects_lock:
+            return self._write_object(data, self.originals_dir)
+
+    def original_path(self, sha: str) -> str | None:
+        # sha lu dans meta.txt : jamais utilisé tel quel dans un chemin
+        if not re.fullmatch(r"[0-9a-f]{64}", sha):
+            return None
+        path = self._object_path(sha, self.originals_dir)
+        return path if os.path.exists(path) else None
+
+    def claim(self, limit: int) -> list[int]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [
+                row["id"]
+                for row in conn.execute(
+                    "SELECT id FROM submissions WHERE status = ? AND next_attempt_at <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (PENDING, now, limit),
+                )
+            ]
+            conn.executemany(
+                "UPDATE submissions SET status = ?, updated_at = ? WHERE id = ?",
+                [(UPLOADING, now, i) for i in ids],
+            )
+            return ids
+
+    def paths(self, submission_id: int) -> dict[str, str]:
+        # Chemin dans le dépôt -> fichier objet local, relu en flux à l'envoi
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT dest_path, object_sha FROM submission_files WHERE submission_id = ?",
+                (submission_id,),
+            ).fetchall()
+        return {row["dest_path"]: self._object_path(row["object_sha"]) for row in rows}
+
+    def message(self, submission_id: int) -> str:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT message FROM submissions WHERE id = ?", (submission_id,)
+            ).fetchone()["message"]
+
+    def mark_done(self, submission_id: int, commit_sha: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET status = ?, commit_sha = ?, last_error = NULL, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (DONE, commit_sha, time.time(), submission_id),
+            )
+        self._collect_garbage(submission_id)
+
+    def mark_retry(self, submission_id: int, error: str, delay: float):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET status = ?, last_error = ?, attempts = attempts + 1, "
+                "next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (PENDING, error, now + delay, now, submission_id),
+            )
+
+    def mark_failed(self, submission_id: int, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE submissions SET status = ?, last_error = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), submission_id),
+            )
+
+    def attempts(self, submission_id: int) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT attempts FROM submissions WHERE id = ?", (submission_id,)
+            ).fetchone()["attempts"]
+
+    def _collect_garbage(self, submission_id: int):
+        # Supprime les objets qui ne servent plus à aucune soumission non envoyée
+        with self._objects_lock:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT f.object_sha FROM submission_files f WHERE f.submission_id = ? "
+                    "AND NOT EXISTS (SELECT 1 FROM submission_files g JOIN submissions s "
+                    "ON s.id = g.submission_id WHERE g.object_sha = f.object_sha AND s.status != ?)",
+                    (submission_id, DONE),
+                ).fetchall()
+            for row in rows:
+                try:
+                    os.remove(self._object_path(row["object_sha"]))
+                except FileNotFoundError:
+                    pass
+
+    def depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE status IN (?, ?)", (PENDING, UPLOADING)
+            ).fetchone()[0]
+
+    def status(self, ids: list[int] | None = None, limit: int = 50) -> list[dict]:
+        query = (
+            "SELECT id, message, status, attempts, commit_sha, last_error, created_at, updated_at "
+            "FROM submissions"
+        )
+        params: list = []
+        if ids is not None:
+            query += f" WHERE id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+
+class UploadWorker:
+    def __init__(
+        self,
+        spool: SubmissionSpool,
+        github: GitHubRepo,
+        max_workers: int = 4,
+        max_attempts: int = 8,
+        poll_interval: float = 1.0,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.spool = spool
+        self.github = github
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.paused_until = 0.0
+        self._slots = threading.Semaphore(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self._thread = threading.Thread(target=self._loop, name="spool-worker", daemon=True)
+        self.metrics = metrics
+        if metrics is not None:
+            self._outcomes = metrics.counter(
+                "submission_attempts_total", "Tentatives d'envoi des dépôts par issue", ("outcome",)
+            )
+            self._attempt_latency = metrics.histogram(
+                "submission_attempt_seconds", "Durée d'une tentative d'envoi (commit compris)"
+            )
+            self._end_to_end = metrics.histogram(
+                "submission_end_to_end_seconds", "Délai entre la mise en file et le commit sur GitHub"
+            )
+            metrics.gauge("submission_queue_depth", "Dépôts en attente d'envoi", spool.depth)
+
+    def start(self) -> "UploadWorker":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def notify(self):
+        self.wakeup.set()
+
+    def _loop(self):
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            delay = self.paused_until - time.time()
+            if delay > 0:
+                self.stopped.wait(delay)
+                continue
+            free = 0
+            while self._slots.acquire(blocking=False):
+                free += 1
+            ids = self.spool.claim(free) if free else []
+            for _ in range(free - len(ids)):
+                self._slots.release()
+            for submission_id in ids:
+                self._pool.submit(self._upload, submission_id)
+            if not ids:
+                self.wakeup.wait(self.poll_interval)
+
+    def _upload(self, submission_id: int):
+        start = time.perf_counter()
+        outcome = "retry"
+        try:
+            with contextlib.ExitStack() as stack:
+                files = {
+                    dest: stack.enter_context(open(path, "rb"))
+                    for dest, path in self.spool.paths(submission_id).items()
+                }
+                result = self.github.commit_files(files, self.spool.message(submission_id))
+            self.spool.mark_done(submission_id, result["sha"])
+            outcome = "done"
+        except FileTooLargeError as e:
+            self.spool.mark_failed(submission_id, str(e))
+            outcome = "failed"
+        except GitHubError as e:
+            if e.retryable:
+                if e.retry_after is not None:
+                    # Limite de débit : tout le worker se met en pause
+                    self.paused_until = max(self.paused_until, time.time() + e.retry_after)
+                    outcome = "rate_limited"
+                elif e.ref_conflict:
+                    # Rafale de dépôts concurrents : le dépôt repasse en file avec backoff
+                    outcome = "conflict"
+                if not self._retry(submission_id, str(e), e.retry_after):
+                    outcome = "failed"
+            else:
+                self.spool.mark_failed(submission_id, str(e))
+                outcome = "failed"
+        except requests.RequestException as e:
+            if not self._retry(submission_id, str(e), None):
+                outcome = "failed"
+        except FileNotFoundError as e:
+            # Objet du spool disparu : le dépôt ne pourra jamais être envoyé
+            logger.exception("Dépôt %s : fichier du spool introuvable", submission_id)
+            self.spool.mark_failed(submission_id, f"Fichier introuvable dans le spool : {e}")
+            outcome = "failed"
+        except Exception as e:
+            # Disque plein, réponse de l'API inattendue... : sans ce filet, l'erreur
+            # se perdait dans le Future et le dépôt restait « envoi en cours »
+            logger.exception("Dépôt %s : erreur inattendue pendant l'envoi", submission_id)
+            outcome = "error"
+            if not self._retry(submission_id, f"{type(e).__name__}: {e}", None):
+                outcome = "failed"
+        finally:
+            if self.metrics is not None:
+                self._record(submission_id, outcome, time.perf_counter() - start)
+            self._slots.release()
+            self.wakeup.set()
+
+    def _record(self, submission_id: int, outcome: str, elapsed: float):
+        self._outcomes.inc(outcome=outcome)
+        self._attempt_latency.observe(elapsed)
+        if outcome == "done":
+            created_at = self.spool.status([submission_id])[0]["created_at"]
+            self._end_to_end.observe(time.time() - created_at)
+
+    def _retry(self, submission_id: int, error: str, retry_after: float | None) -> bool:
+        # Renvoie False si le dépôt est abandonné (trop de tentatives)
+        attempts = self.spool.attempts(submission_id) + 1
+        if attempts >= self.max_attempts:
+            self.spool.mark_failed(submission_id, error)
+            return False
+        delay = retry_after if retry_after is not None else min(300.0, 2.0 ** attempts)
+        self.spool.mark_retry(submission_id, error, delay + random.uniform(0, 1))
+        return True
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import etl
+from catalog import iter_sales
+from datasets import file_signature
+from sqlite_load import create_table, insert_frame
+
+# ---------------------------
+# Console SQL en lecture seule sur les données AdventureWorks
+# ---------------------------
+#
+# Les CSV de data/ sont chargés une seule fois dans une base SQLite partagée
+# (index sur les clés de jointure), reconstruite seulement si les fichiers
+# changent. Chaque session ouvre sa propre connexion en lecture seule : un
+# autorisateur refuse tout ce qui n'est pas une lecture, un progress handler
+# interrompt les requêtes trop longues et les résultats sont lus par pages
+# (LIMIT / OFFSET) sous un plafond de lignes.
+
+SANDBOX_DB = ".sandbox/adventureworks.sqlite3"
+
+# Table -> fichier et fonction de lecture typée
+TABLES = {
+    "customers": (etl.CUSTOMER_FILE, etl.extract_customers),
+    "products": (etl.PRODUCT_FILE, etl.extract_products),
+    "subcategories": (etl.SUBCATEGORY_FILE, etl.extract_subcategories),
+    "categories": (etl.CATEGORY_FILE, etl.extract_categories),
+    "territories": (etl.TERRITORY_FILE, etl.extract_territories),
+    "returns": (etl.RETURNS_FILE, etl.extract_returns),
+    "calendar": (etl.CALENDAR_FILE, etl.extract_calendar),
+}
+INDEXES = [
+    ("sales", "CustomerKey"),
+    ("sales", "ProductKey"),
+    ("sales", "TerritoryKey"),
+    ("sales", "OrderDate"),
+    ("customers", "CustomerKey"),
+    ("products", "ProductKey"),
+    ("products", "ProductSubcategoryKey"),
+    ("subcategories", "ProductSubcategoryKey"),
+    ("categories", "ProductCategoryKey"),
+    ("territories", "TerritoryKey"),
+    ("returns", "ProductKey"),
+    ("returns", "TerritoryKey"),
+]
+
+# Actions autorisées sur une connexion de la console
+ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+# Chaînes et identifiants entre guillemets (gardés tels quels), commentaires -- et /* */
+SQL_TOKENS = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?(?:\*/|$)""", re.DOTALL)
+
+_build_lock = threading.Lock()
+
+
+class QueryError(Exception):
+    pass
+
+
+def data_fingerprint(data_dir: str = etl.DATA_DIR) -> str:
+    paths = etl.sales_files(data_dir) + sorted(os.path.join(data_dir, n) for n, _ in TABLES.values())
+    return json.dumps([(os.path.basename(p), *file_signature(p)) for p in paths if os.path.exists(p)])
+
+
+def _dates_as_text(df: pd.DataFrame) -> pd.DataFrame:
+    # Dates stockées en 'AAAA-MM-JJ' : comparables et lisibles en SQL
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d")
+    return df
+
+
+def build_database(data_dir: str = etl.DATA_DIR, path: str = SANDBOX_DB) -> dict:
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    fingerprint = data_fingerprint(data_dir)
+    counts = {}
+    with sqlite3.connect(tmp) as conn:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        # Toutes les années, lot par lot : jamais plus d'un lot en mémoire
+        for i, sales in enumerate(iter_sales(data_dir)):
+            sales = _dates_as_text(sales)
+            if i == 0:
+                create_table(conn, "sales", sales)
+            counts["sales"] = counts.get("sales", 0) + insert_frame(conn, "sales", sales)
+        for table, (name, extract) in TABLES.items():
+            file_path = os.path.join(data_dir, name)
+            if not os.path.exists(file_path):
+                continue
+            df = _dates_as_text(extract(file_path))
+            df.to_sql(table, conn, index=False)
+            counts[table] = len(df)
+        for table, column in INDEXES:
+            if table in counts:
+                conn.execute(f'CREATE INDEX "idx_{table}_{column}" ON "{table}" ("{column}")')
+        conn.execute("ANALYZE")
+        conn.execute("CREATE TABLE _meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO _meta VALUES ('fingerprint', ?)", (fingerprint,))
+    os.replace(tmp, path)
+    return {"tables": counts, "elapsed_s": round(time.perf_counter() - start, 2)}
+
+
+def _stored_fingerprint(path: str) -> str | None:
+    try:
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+            return conn.execute("SELECT value FROM _meta WHERE key = 'fingerprint'").fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+
+def ensure_database(data_dir: str = etl.DATA_DIR, path: str = SANDBOX_DB) -> str:
+    # Les connexions déjà ouvertes gardent l'ancienne base (os.replace)
+    with _build_lock:
+        if not os.path.exists(path) or _stored_fingerprint(path) != data_fingerprint(data_dir):
+            build_database(data_dir, path)
+    return path
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    if action in ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def connect_readonly(path: str = SANDBOX_DB) -> sqlite3.Connection:
+    # Connexion propre à une session : légère, lecture seule, cache mémoire borné
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute("PRAGMA cache_size = -8000")
+    conn.setlimit(sqlite3.SQLITE_LIMIT_SQL_LENGTH, 100_000)
+    conn.set_authorizer(_authorize)
+    return conn
+
+
+def schema(conn: sqlite3.Connection) -> dict[str, list[tuple[str, str]]]:
+    conn.set_authorizer(None)
+    try:
+        tables = [
+            r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name NOT LIKE '\\_%' ESCAPE '\\' AND name NOT LIKE 'sqlite%' ORDER BY name"
+            )
+        ]
+        return {t: [(c[1], c[2]) for c in conn.execute(f'PRAGMA table_info("{t}")')] for t in tables}
+    finally:
+        conn.set_authorizer(_authorize)
+
+
+def _strip_comments(sql: str) -> str:
+    return SQL_TOKENS.sub(lambda m: " " if m[0][0] in "-/" else m[0], sql)
+
+
+def _single_select(sql: str) -> str:
+    # Commentaires retirés avant tout contrôle : mot-clé de tête et ; y sont ignorés
+    sql = _strip_comments(sql).strip()
+    while sql.endswith(";"):
+        sql = sql[:-1].rstrip()
+    if not sql:
+        raise QueryError("Requête vide.")
+    if not re.match(r"^(SELECT|WITH|VALUES)\b", sql, flags=re.IGNORECASE):
+        raise QueryError("Seules les requêtes de lecture (SELECT / WITH) sont autorisées.")
+    if ";" in SQL_TOKENS.sub("", sql):
+        raise QueryError("Une seule requête à la fois.")
+    return sql
+
+
+def run_query(
+    conn: sqlite3.Connection,
+    sql: str,
+    page: int = 0,
+    page_size: int = 200,
+    max_rows: int = 10_000,
+    timeout_s: float = 5.0,
+) -> dict:
+    # Une page de résultat : la requête est réexécutée avec LIMIT / OFFSET, seule
+    # la page demandée est lue et le temps d'exécution est borné.
+    sql = _single_select(sql)
+    offset = page * page_size
+    if offset >= max_rows:
+        raise QueryError(f"Résultat plafonné à {max_rows} lignes.")
+    limit = min(page_size, max_rows - offset)
+    deadline = time.perf_counter() + timeout_s
+    conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), 10_000)
+    start = time.perf_counter()
+    try:
+        cur = conn.execute(
+            f"SELECT * FROM ({sql}\n) LIMIT ? OFFSET ?", (limit + 1, offset)
+        )
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    except sqlite3.OperationalError as e:
+        if time.perf_counter() > deadline:
+            raise QueryError(f"Requête interrompue après {timeout_s:g} s.") from e
+        raise QueryError(str(e)) from e
+    except sqlite3.DatabaseError as e:
+        raise QueryError(str(e)) from e
+    finally:
+        conn.set_progress_handler(None, 0)
+    has_more = len(rows) > limit
+    return {
+        "columns": columns,
+        "rows": rows[:limit],
+        "page": page,
+        "offset": offset,
+        # Page suivante disponible tant que le plafond n'est pas atteint
+        "has_more": has_more and offset + limit < max_rows,
+        "capped": has_more and offset + limit >= max_rows,
+        "elapsed_s": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base SQLite de la console SQL")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--db", default=SANDBOX_DB)
+    parser.add_argument("--query", help="Requête à exécuter sur la base")
+    args = parser.parse_args()
+
+    if args.query:
+        ensure_database(args.data_dir, args.db)
+        result = run_query(connect_readonly(args.db), args.query)
+        print(pd.DataFrame(result["rows"], columns=result["columns"]).to_string(index=False))
+        print(f"({len(result['rows'])} lignes, {result['elapsed_s'] * 1000:.1f} ms)")
+    else:
+        print(json.dumps(build_database(args.data_dir, args.db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
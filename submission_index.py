@@ -0,0 +1,285 @@
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+from github_api import GITHUB_API_URL, GitHubRepo, git_blob_sha
+
+# ---------------------------
+# Index local des soumissions
+# ---------------------------
+#
+# Une ligne par dossier submissions/<slug>_<AAAAMMJJ_HHMMSS>/ avec les
+# champs de meta.txt, et une ligne par fichier (taille, hash, extension).
+# La synchronisation est incrémentale : chaque dossier garde la signature
+# vue au dernier passage (SHA de l'arbre git côté GitHub, empreinte
+# noms / tailles / dates côté disque) et seuls les dossiers nouveaux ou
+# modifiés sont relus.
+
+INDEX_PATH = ".submissions_index.sqlite3"
+SUBMISSIONS_DIR = "submissions"
+
+FOLDER_RE = re.compile(r"^(?P<student>.+)_(?P<timestamp>\d{8}_\d{6})$")
+META_FIELDS = {
+    "Nom complet": "name",
+    "Groupe / Promo": "group_name",
+    "E-mail": "email",
+    "Commentaire": "comment",
+    "Date (UTC)": "submitted_at",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    folder TEXT PRIMARY KEY,
+    student_slug TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    name TEXT,
+    group_name TEXT,
+    group_key TEXT,
+    email TEXT,
+    comment TEXT,
+    submitted_at TEXT,
+    signature TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    folder TEXT NOT NULL REFERENCES submissions(folder) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (folder, name)
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_group
+    ON submissions(group_key, student_slug, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_files_sha ON files(sha);
+"""
+
+
+def parse_meta(text: str) -> dict:
+    meta, current = {}, None
+    for line in text.splitlines():
+        label, sep, value = line.partition(" : ")
+        if sep and label.strip() in META_FIELDS:
+            current = META_FIELDS[label.strip()]
+            meta[current] = value.strip()
+        elif current == "comment":
+            # Commentaire sur plusieurs lignes
+            meta[current] += "\n" + line
+    return meta
+
+
+def group_key(group: str | None) -> str:
+    return re.sub(r"\s+", " ", (group or "").strip().lower())
+
+
+class SubmissionIndex:
+    def __init__(self, path: str = INDEX_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        # Connexion partagée entre sessions : une synchronisation à la fois
+        self._sync_lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def signatures(self) -> dict[str, str]:
+        return dict(self.conn.execute("SELECT folder, signature FROM submissions"))
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def upsert(self, folder: str, signature: str, files: list[dict], meta_text: str | None):
+        m = FOLDER_RE.match(folder)
+        student, timestamp = (m["student"], m["timestamp"]) if m else (folder, "")
+        meta = parse_meta(meta_text or "")
+        self.conn.execute("DELETE FROM submissions WHERE folder = ?", (folder,))
+        self.conn.execute(
+            "INSERT INTO submissions (folder, student_slug, timestamp, name, group_name, group_key, "
+            "email, comment, submitted_at, signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                folder, student, timestamp, meta.get("name"), meta.get("group_name"),
+                group_key(meta.get("group_name")), meta.get("email"), meta.get("comment"),
+                meta.get("submitted_at"), signature,
+            ),
+        )
+        self.conn.executemany(
+            "INSERT INTO files (folder, name, extension, size, sha) VALUES (?, ?, ?, ?, ?)",
+            [
+                (folder, f["name"], os.path.splitext(f["name"])[1].lower(), f["size"], f["sha"])
+                for f in files
+            ],
+        )
+
+    def _remove_missing(self, seen: set[str]) -> int:
+        gone = set(self.signatures()) - seen
+        self.conn.executemany("DELETE FROM submissions WHERE folder = ?", [(f,) for f in gone])
+        return len(gone)
+
+    # ---------------------------
+    # Synchronisation
+    # ---------------------------
+
+    def sync_github(self, github: GitHubRepo, submissions_dir: str = SUBMISSIONS_DIR) -> dict:
+        with self._sync_lock:
+            return self._sync_github(github, submissions_dir)
+
+    def _sync_github(self, github: GitHubRepo, submissions_dir: str) -> dict:
+        stats = {"unchanged": 0, "fetched": 0, "removed": 0, "api_calls": 2}
+        _, root_tree = github.head()
+        entry = next(
+            (e for e in github.tree(root_tree) if e["path"] == submissions_dir and e["type"] == "tree"),
+            None,
+        )
+        stats["api_calls"] += 1
+        if entry is None:
+            return stats
+        if entry["sha"] == self._get_meta("github_tree_sha"):
+            # Rien n'a bougé sous submissions/ depuis la dernière synchronisation
+            stats["unchanged"] = len(self.signatures())
+            return stats
+
+        known = self.signatures()
+        folders = [e for e in github.tree(entry["sha"]) if e["type"] == "tree"]
+        stats["api_calls"] += 1
+        with self.conn:
+            for folder in folders:
+                if known.get(folder["path"]) == folder["sha"]:
+                    stats["unchanged"] += 1
+                    continue
+                files = [
+                    {"name": f["path"], "size": f.get("size", 0), "sha": f["sha"]}
+                    for f in github.tree(folder["sha"]) if f["type"] == "blob"
+                ]
+                stats["api_calls"] += 1
+                meta_sha = next((f["sha"] for f in files if f["name"] == "meta.txt"), None)
+                meta_text = None
+                if meta_sha:
+                    meta_text = github.blob(meta_sha).decode("utf-8", "replace")
+                    stats["api_calls"] += 1
+                self.upsert(folder["path"], folder["sha"], files, meta_text)
+                stats["fetched"] += 1
+            stats["removed"] = self._remove_missing({f["path"] for f in folders})
+            self._set_meta("github_tree_sha", entry["sha"])
+        return stats
+
+    def sync_local(self, root: str = SUBMISSIONS_DIR) -> dict:
+        stats = {"unchanged": 0, "fetched": 0, "removed": 0}
+        known = self.signatures()
+        seen = set()
+        with self.conn:
+            for folder in sorted(os.listdir(root)):
+                path = os.path.join(root, folder)
+                if not os.path.isdir(path):
+                    continue
+                seen.add(folder)
+                entries = sorted(os.scandir(path), key=lambda e: e.name)
+                stat = [(e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in entries if e.is_file()]
+                signature = hashlib.sha1(repr(stat).encode()).hexdigest()
+                if known.get(folder) == signature:
+                    stats["unchanged"] += 1
+                    continue
+                files, meta_text = [], None
+                for name, size, _ in stat:
+                    with open(os.path.join(path, name), "rb") as f:
+                        data = f.read()
+                    files.append({"name": name, "size": size, "sha": git_blob_sha(data)})
+                    if name == "meta.txt":
+                        meta_text = data.decode("utf-8", "replace")
+                self.upsert(folder, signature, files, meta_text)
+                stats["fetched"] += 1
+            stats["removed"] = self._remove_missing(seen)
+        return stats
+
+    # ---------------------------
+    # Requêtes
+    # ---------------------------
+
+    def latest_per_student(self, group: str | None = None) -> list[dict]:
+        query = """
+            SELECT * FROM (
+                SELECT s.*, ROW_NUMBER() OVER (
+                    PARTITION BY s.student_slug ORDER BY s.timestamp DESC
+                ) AS rank,
+                COUNT(*) OVER (PARTITION BY s.student_slug) AS submission_count
+                FROM submissions s
+                {where}
+            ) WHERE rank = 1 ORDER BY student_slug
+        """
+        if group is None:
+            rows = self.conn.execute(query.format(where=""))
+        else:
+            rows = self.conn.execute(query.format(where="WHERE s.group_key = ?"), (group_key(group),))
+        return [dict(r) for r in rows]
+
+    def submissions(self, group: str | None = None, limit: int = 50, offset: int = 0) -> list[dict]:
+        where, params = "", []
+        if group is not None:
+            where, params = "WHERE group_key = ?", [group_key(group)]
+        rows = self.conn.execute(
+            f"SELECT * FROM submissions {where} ORDER BY timestamp DESC, folder LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        )
+        return [dict(r) for r in rows]
+
+    def count(self, group: str | None = None) -> int:
+        if group is None:
+            return self.conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM submissions WHERE group_key = ?", (group_key(group),)
+        ).fetchone()[0]
+
+    def files(self, folder: str) -> list[dict]:
+        rows = self.conn.execute("SELECT * FROM files WHERE folder = ? ORDER BY name", (folder,))
+        return [dict(r) for r in rows]
+
+    def groups(self) -> list[str]:
+        rows = self.conn.execute(
+            "SELECT MIN(group_name) FROM submissions WHERE group_key != '' "
+            "GROUP BY group_key ORDER BY group_key"
+        )
+        return [r[0] for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index local des soumissions")
+    parser.add_argument("--index", default=INDEX_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync")
+    sync.add_argument("--local", metavar="DIR", help="Synchroniser depuis un dossier local")
+    sync.add_argument("--repo", default="orkhoven/etl_epsi")
+    sync.add_argument("--branch", default="main")
+    sync.add_argument("--api-url", default=GITHUB_API_URL)
+    latest = sub.add_parser("latest")
+    latest.add_argument("--group")
+    args = parser.parse_args()
+
+    index = SubmissionIndex(args.index)
+    if args.command == "sync":
+        if args.local:
+            print(index.sync_local(args.local))
+        else:
+            github = GitHubRepo(args.repo, os.environ["GITHUB_TOKEN"], args.branch, args.api_url)
+            print(index.sync_github(github))
+    else:
+        for row in index.latest_per_student(args.group):
+            print(f"{row['student_slug']:30s} {row['timestamp']} {row['group_name']} ({row['submission_count']} dépôt(s))")
+
+
+if __name__ == "__main__":
+    main()
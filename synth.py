@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import etl
+
+# ---------------------------
+# Générateur synthétique AdventureWorks
+# ---------------------------
+#
+# Reproduit les schémas et les distributions de clés des fichiers de data/
+# à n'importe quelle échelle : lignes par commande, quantités, délai de
+# stock, popularité des produits et des clients, territoire fixe par client,
+# répartition des ventes par année et dans l'année. Les fichiers sont écrits
+# par lots : la mémoire ne dépend que de chunk_rows (et du nombre de clients).
+# Les défauts de qualité listés dans le TP peuvent être injectés à la demande.
+
+FIRST_ORDER_NUMBER = 45079
+
+
+class SalesProfile:
+    def __init__(self, data_dir: str = etl.DATA_DIR):
+        sales = pd.concat([etl.extract_sales(p) for p in etl.sales_files(data_dir)], ignore_index=True)
+        self.customers = etl.extract_customers(os.path.join(data_dir, etl.CUSTOMER_FILE))
+        self.data_dir = data_dir
+
+        years = sales["OrderDate"].dt.year
+        counts = years.value_counts().sort_index()
+        self.year_weights = (counts / counts.sum()).to_dict()
+        # Quantiles de la date de commande dans l'année (jour de l'année, trié)
+        self.day_of_year = {
+            int(y): np.sort(sales.loc[years == y, "OrderDate"].dt.dayofyear.to_numpy() - 1)
+            for y in counts.index
+        }
+        self.all_days = np.sort(sales["OrderDate"].dt.dayofyear.to_numpy() - 1)
+
+        lines = sales.groupby("OrderNumber").size().value_counts(normalize=True).sort_index()
+        self.lines_values, self.lines_p = lines.index.to_numpy(), lines.to_numpy()
+        qty = sales["OrderQuantity"].value_counts(normalize=True).sort_index()
+        self.qty_values, self.qty_p = qty.index.to_numpy(), qty.to_numpy()
+        self.stock_lags = (sales["OrderDate"] - sales["StockDate"]).dt.days.to_numpy()
+        products = sales["ProductKey"].value_counts(normalize=True)
+        self.product_values, self.product_p = products.index.to_numpy(), products.to_numpy()
+        territories = sales["TerritoryKey"].value_counts(normalize=True)
+        self.territory_values = territories.index.to_numpy()
+        self.territory_p = territories.to_numpy()
+
+        # Poids et territoire de chaque client réel (un client = un territoire)
+        per_customer = sales.groupby("CustomerKey").agg(
+            orders=("OrderNumber", "nunique"), territory=("TerritoryKey", "first")
+        )
+        keys = self.customers["CustomerKey"]
+        self.customer_weight = per_customer["orders"].reindex(keys).fillna(0.1).to_numpy()
+        territory = per_customer["territory"].reindex(keys).to_numpy(dtype="float64", copy=True)
+        missing = np.isnan(territory)
+        rng = np.random.default_rng(0)
+        territory[missing] = rng.choice(self.territory_values, missing.sum(), p=self.territory_p)
+        self.customer_territory = territory.astype("int32")
+
+
+def _write_chunk(df: pd.DataFrame, path: str, first: bool, encoding: str = "utf-8"):
+    df.to_csv(
+        path, mode="w" if first else "a", header=first, index=False,
+        date_format="%Y-%m-%d", encoding=encoding,
+    )
+
+
+def generate_customers(
+    profile: SalesProfile, path: str, count: int, rng: np.random.Generator, chunk_rows: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # Chaque client synthétique clone les attributs d'un client réel.
+    # Renvoie la CDF de popularité et le territoire de chaque nouveau client.
+    real = profile.customers
+    source = rng.integers(0, len(real), count)
+    for start in range(0, count, chunk_rows):
+        idx = source[start:start + chunk_rows]
+        chunk = real.iloc[idx].reset_index(drop=True)
+        keys = np.arange(start, start + len(idx)) + 11000
+        chunk["CustomerKey"] = keys
+        # Entiers écrits sans ".0", comme dans l'export d'origine
+        chunk = chunk.astype({"AnnualIncome": "Int64", "TotalChildren": "Int64"})
+        chunk["EmailAddress"] = (
+            chunk["FirstName"].str.lower().fillna("client") + pd.Series(keys).astype(str)
+            + "@adventure-works.com"
+        )
+        _write_chunk(chunk, path, first=start == 0, encoding=etl.LOOKUP_ENCODING)
+    # Lignes parasites de fin d'export, comme dans le fichier d'origine
+    with open(os.path.join(profile.data_dir, etl.CUSTOMER_FILE), encoding=etl.LOOKUP_ENCODING) as f:
+        footer = [line for line in f if not line.split(",", 1)[0].isdigit()][1:]
+    with open(path, "a", encoding=etl.LOOKUP_ENCODING) as f:
+        f.writelines(footer)
+    cdf = np.cumsum(profile.customer_weight[source], dtype="float64")
+    return cdf / cdf[-1], profile.customer_territory[source]
+
+
+def generate_sales_year(
+    profile: SalesProfile,
+    path: str,
+    year: int,
+    rows: int,
+    customer_cdf: np.ndarray,
+    customer_territory: np.ndarray,
+    rng: np.random.Generator,
+    chunk_rows: int,
+    next_order: int,
+    defects: dict[str, float],
+    stats: dict,
+) -> int:
+    days = profile.day_of_year.get(year, profile.all_days)
+    year_start = np.datetime64(f"{year}-01-01")
+    mean_lines = float(np.dot(profile.lines_values, profile.lines_p))
+    written = 0
+    first = True
+    while written < rows:
+        target = min(chunk_rows, rows - written)
+        lines = rng.choice(profile.lines_values, int(target / mean_lines * 1.05) + 16, p=profile.lines_p)
+        while lines.sum() < target:
+            lines = np.concatenate([lines, rng.choice(profile.lines_values, 64, p=profile.lines_p)])
+        n_orders = len(lines)
+        # Les commandes arrivent dans l'ordre chronologique, comme les fichiers réels
+        order_pos = (written + np.cumsum(lines) - lines) / rows
+        order_days = days[np.minimum((order_pos * len(days)).astype(np.int64), len(days) - 1)]
+        customer = np.searchsorted(customer_cdf, rng.random(n_orders))
+        order_idx = np.repeat(np.arange(n_orders), lines)[:target]
+        line_item = (np.arange(len(order_idx)) - np.repeat(np.cumsum(lines) - lines, lines)[:target]) + 1
+
+        order_date = year_start + order_days[order_idx].astype("timedelta64[D]")
+        lag = rng.choice(profile.stock_lags, len(order_idx)).astype("timedelta64[D]")
+        chunk = pd.DataFrame({
+            "OrderDate": order_date,
+            "StockDate": order_date - lag,
+            "OrderNumber": "SO" + pd.Series(next_order + order_idx).astype(str),
+            "ProductKey": rng.choice(profile.product_values, len(order_idx), p=profile.product_p),
+            "CustomerKey": (customer[order_idx] + 11000).astype("int32"),
+            "TerritoryKey": customer_territory[customer[order_idx]],
+            "OrderLineItem": line_item.astype("int32"),
+            "OrderQuantity": rng.choice(profile.qty_values, len(order_idx), p=profile.qty_p),
+        })
+        chunk = inject_defects(chunk, rng, defects, stats, len(customer_cdf))
+        _write_chunk(chunk, path, first)
+        first = False
+        written += target
+        next_order += int(order_idx[-1]) + 1
+    return next_order
+
+
+def inject_defects(
+    chunk: pd.DataFrame,
+    rng: np.random.Generator,
+    defects: dict[str, float],
+    stats: dict,
+    n_customers: int,
+) -> pd.DataFrame:
+    n = len(chunk)
+    rate = defects.get("bad_quantity", 0.0)
+    if rate:
+        mask = rng.random(n) < rate
+        bad = rng.choice([0, -1], mask.sum()).astype(chunk["OrderQuantity"].dtype)
+        chunk.loc[mask, "OrderQuantity"] = bad
+        stats["bad_quantity"] += int(mask.sum())
+    rate = defects.get("orphan", 0.0)
+    if rate:
+        mask = rng.random(n) < rate
+        column = rng.integers(0, 3, n)
+        for i, (col, value) in enumerate(
+            [("CustomerKey", 11000 + n_customers + 1), ("ProductKey", 9999), ("TerritoryKey", 99)]
+        ):
+            sel = mask & (column == i)
+            chunk.loc[sel, col] = value
+            stats[f"orphan_{col}"] += int(sel.sum())
+    rate = defects.get("duplicate", 0.0)
+    if rate:
+        # Doublon exact placé juste après la ligne d'origine
+        repeats = 1 + (rng.random(n) < rate)
+        stats["duplicates"] += int((repeats - 1).sum())
+        chunk = chunk.iloc[np.repeat(np.arange(n), repeats)]
+    return chunk
+
+
+def generate(
+    out_dir: str,
+    rows: int,
+    data_dir: str = etl.DATA_DIR,
+    years: list[int] | None = None,
+    customers: int | None = None,
+    chunk_rows: int = 1_000_000,
+    seed: int = 0,
+    bad_quantity_rate: float = 0.0,
+    duplicate_rate: float = 0.0,
+    orphan_rate: float = 0.0,
+) -> dict:
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    profile = SalesProfile(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Référentiels statiques recopiés tels quels
+    for name in os.listdir(data_dir):
+        if name.endswith(".csv") and not name.startswith("AdventureWorks Sales Data ") \
+                and name != etl.CUSTOMER_FILE:
+            shutil.copyfile(os.path.join(data_dir, name), os.path.join(out_dir, name))
+
+    n_customers = customers or max(len(profile.customers), rows // 3)
+    customer_cdf, customer_territory = generate_customers(
+        profile, os.path.join(out_dir, etl.CUSTOMER_FILE), n_customers, rng, chunk_rows
+    )
+
+    years = years or sorted(profile.year_weights)
+    weights = np.array([profile.year_weights.get(y, 1.0 / len(years)) for y in years])
+    per_year = np.floor(rows * weights / weights.sum()).astype(np.int64)
+    per_year[-1] += rows - per_year.sum()
+
+    defects = {"bad_quantity": bad_quantity_rate, "duplicate": duplicate_rate, "orphan": orphan_rate}
+    stats = {
+        "bad_quantity": 0, "duplicates": 0,
+        "orphan_CustomerKey": 0, "orphan_ProductKey": 0, "orphan_TerritoryKey": 0,
+    }
+    next_order = FIRST_ORDER_NUMBER
+    for year, n in zip(years, per_year):
+        next_order = generate_sales_year(
+            profile, os.path.join(out_dir, etl.SALES_FILE.format(year=year)), year, int(n),
+            customer_cdf, customer_territory, rng, chunk_rows, next_order, defects, stats,
+        )
+
+    summary = {
+        "rows": rows,
+        "customers": n_customers,
+        "rows_per_year": {int(y): int(n) for y, n in zip(years, per_year)},
+        "defects": stats,
+        "seed": seed,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(out_dir, "synth.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur synthétique AdventureWorks")
+    parser.add_argument("--rows", type=int, required=True, help="Nombre total de lignes de ventes")
+    parser.add_argument("--out", required=True, help="Répertoire de sortie")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--years", type=int, nargs="+")
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bad-quantity-rate", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--orphan-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    summary = generate(
+        args.out, args.rows, data_dir=args.data_dir, years=args.years,
+        customers=args.customers, chunk_rows=args.chunk_rows, seed=args.seed,
+        bad_quantity_rate=args.bad_quantity_rate, duplicate_rate=args.duplicate_rate,
+        orphan_rate=args.orphan_rate,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
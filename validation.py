@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import etl
+
+# ---------------------------
+# Validation de la table intégrée produite par les étudiant·e·s
+# ---------------------------
+#
+# Règles déclaratives (présence et type des colonnes, quantités positives,
+# unicité des lignes de commande, intégrité référentielle, cohérence de
+# LineTotal) évaluées en opérations vectorisées : chaque colonne n'est
+# convertie qu'une fois, les clés étrangères sont cherchées dans un index
+# haché du référentiel. Chaque règle rend le nombre de lignes en défaut et
+# quelques numéros de ligne en exemple.
+
+# Noms acceptés pour le chiffre d'affaires de ligne (en minuscules)
+REVENUE_COLUMNS = ["linetotal", "line_total", "revenue", "salesamount", "sales_amount", "ca", "montant"]
+
+# Colonne attendue -> (type, noms acceptés en minuscules)
+EXPECTED_COLUMNS = {
+    "OrderDate": ("date", ["orderdate", "order_date"]),
+    "OrderNumber": ("text", ["ordernumber", "order_number"]),
+    "OrderLineItem": ("int", ["orderlineitem", "order_line_item"]),
+    "ProductKey": ("int", ["productkey", "product_key"]),
+    "CustomerKey": ("int", ["customerkey", "customer_key"]),
+    "TerritoryKey": ("int", ["territorykey", "salesterritorykey", "territory_key"]),
+    "OrderQuantity": ("int", ["orderquantity", "order_quantity", "quantity"]),
+    "ProductPrice": ("float", ["productprice", "product_price", "price", "unitprice"]),
+    "LineTotal": ("float", REVENUE_COLUMNS),
+}
+
+LINE_TOTAL_RTOL = 1e-6
+LINE_TOTAL_ATOL = 0.01
+EXAMPLES = 5
+
+
+class Table:
+    # Table à valider : résolution des noms de colonnes et conversions
+    # typées faites une seule fois, partagées par toutes les règles
+    def __init__(self, df: pd.DataFrame, lookups: dict[str, pd.DataFrame] | None = None):
+        self.df = df
+        self.lookups = lookups or {}
+        self._names = {c.lower(): c for c in df.columns}
+        self._typed: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._indexes: dict[tuple[str, str], pd.Index] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def resolve(self, column: str) -> str | None:
+        _, aliases = EXPECTED_COLUMNS[column]
+        return next((self._names[a] for a in [column.lower(), *aliases] if a in self._names), None)
+
+    def typed(self, column: str) -> tuple[np.ndarray, np.ndarray] | None:
+        # (valeurs converties, masque des valeurs présentes mais non convertibles)
+        if column not in self._typed:
+            name = self.resolve(column)
+            if name is None:
+                return None
+            self._typed[column] = convert(self.df[name], EXPECTED_COLUMNS[column][0])
+        return self._typed[column]
+
+    def values(self, column: str) -> np.ndarray | None:
+        typed = self.typed(column)
+        return None if typed is None else typed[0]
+
+    def codes(self, column: str) -> tuple[np.ndarray, int] | None:
+        # Codes entiers (factorisation) et cardinalité, pour les règles d'unicité
+        name = self.resolve(column)
+        if name is None:
+            return None
+        codes, uniques = pd.factorize(self.df[name])
+        return codes, len(uniques)
+
+    def key_index(self, lookup: str, key: str) -> pd.Index:
+        # Index haché des clés du référentiel, construit au premier usage
+        if (lookup, key) not in self._indexes:
+            keys = self.lookups[lookup][key].dropna().unique()
+            self._indexes[(lookup, key)] = pd.Index(keys.astype("int64"))
+        return self._indexes[(lookup, key)]
+
+
+def convert(series: pd.Series, kind: str) -> tuple[np.ndarray | pd.Series, np.ndarray]:
+    present = series.notna().to_numpy()
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(series):
+            converted = series.to_numpy()
+        else:
+            # Peu de dates distinctes : chaque valeur distincte n'est analysée qu'une fois
+            codes, uniques = pd.factorize(series)
+            parsed = pd.to_datetime(pd.Series(uniques), errors="coerce").to_numpy()
+            converted = np.where(codes >= 0, parsed[codes], np.datetime64("NaT"))
+        return converted, present & pd.isna(converted)
+    if kind in ("int", "float"):
+        converted = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        invalid = present & np.isnan(converted)
+        if kind == "int":
+            invalid |= ~np.isnan(converted) & (converted != np.floor(converted))
+        return converted, invalid
+    return series, np.zeros(len(series), dtype=bool)
+
+
+# ---------------------------
+# Règles
+# ---------------------------
+
+class ColumnType:
+    def __init__(self, column: str):
+        self.column = column
+        self.kind = EXPECTED_COLUMNS[column][0]
+        self.name = f"type_{column}"
+        self.description = f"{column} présente et de type {self.kind}"
+
+    def evaluate(self, table: Table) -> np.ndarray:
+        typed = table.typed(self.column)
+        # Colonne absente : toutes les lignes sont en défaut
+        return np.ones(len(table), dtype=bool) if typed is None else typed[1]
+
+
+class NotNull:
+    def __init__(self, column: str):
+        self.column = column
+        self.name = f"not_null_{column}"
+        self.description = f"{column} renseignée"
+
+    def evaluate(self, table: Table) -> np.ndarray | None:
+        name = table.resolve(self.column)
+        return None if name is None else table.df[name].isna().to_numpy()
+
+
+class Positive:
+    def __init__(self, column: str):
+        self.column = column
+        self.name = f"positive_{column}"
+        self.description = f"{column} > 0"
+
+    def evaluate(self, table: Table) -> np.ndarray | None:
+        values = table.values(self.column)
+        # Valeurs manquantes ou non numériques : relevées par les autres règles
+        return None if values is None else values <= 0
+
+
+class Unique:
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+        self.name = "unique_" + "_".join(columns)
+        self.description = f"pas de doublon sur ({', '.join(columns)})"
+
+    def evaluate(self, table: Table) -> np.ndarray | None:
+        # Une clé entière par ligne (codes combinés) : hachage d'entiers au lieu de tuples
+        factorized = [table.codes(c) for c in self.columns]
+        if None in factorized:
+            return None
+        combined = np.zeros(len(table), dtype=np.int64)
+        for codes, cardinality in factorized:
+            combined = combined * (cardinality + 1) + (codes + 1)
+        return pd.Series(combined).duplicated().to_numpy()
+
+
+class ForeignKey:
+    def __init__(self, column: str, lookup: str, key: str):
+        self.column = column
+        self.lookup = lookup
+        self.key = key
+        self.name = f"fk_{column}"
+        self.description = f"{column} présente dans le référentiel {lookup}"
+
+    def evaluate(self, table: Table) -> np.ndarray | None:
+        values = table.values(self.column)
+        if values is None or self.lookup not in table.lookups:
+            return None
+        # Recherche sur des entiers ; les valeurs manquantes ou non entières
+        # sont relevées par les règles de type et de présence
+        comparable = ~np.isnan(values) & (values == np.floor(values))
+        keys = np.where(comparable, values, 0).astype(np.int64)
+        found = table.key_index(self.lookup, self.key).get_indexer(keys) >= 0
+        return comparable & ~found
+
+
+class LineTotal:
+    def __init__(self, rtol: float = LINE_TOTAL_RTOL, atol: float = LINE_TOTAL_ATOL):
+        self.rtol = rtol
+        self.atol = atol
+        self.name = "line_total"
+        self.description = f"LineTotal = OrderQuantity × ProductPrice (± {atol:g})"
+
+    def evaluate(self, table: Table) -> np.ndarray | None:
+        total, qty = table.values("LineTotal"), table.values("OrderQuantity")
+        price = table.values("ProductPrice")
+        keys = table.values("ProductKey")
+        if price is None and keys is not None and "products" in table.lookups:
+            # Prix absent de la table : repris du référentiel via ProductKey
+            prices = table.lookups["products"].drop_duplicates("ProductKey").set_index("ProductKey")["ProductPrice"]
+            positions = prices.index.get_indexer(keys)
+            price = np.where(positions >= 0, prices.to_numpy(dtype="float64")[positions], np.nan)
+        if total is None or qty is None or price is None:
+            return None
+        return ~np.isclose(total, qty * price, rtol=self.rtol, atol=self.atol)
+
+
+RULES = [
+    *[ColumnType(c) for c in EXPECTED_COLUMNS],
+    *[NotNull(c) for c in ["OrderDate", "OrderNumber", "OrderLineItem", "ProductKey", "CustomerKey", "TerritoryKey"]],
+    Positive("OrderQuantity"),
+    Unique(["OrderNumber", "OrderLineItem"]),
+    ForeignKey("CustomerKey", "customers", "CustomerKey"),
+    ForeignKey("ProductKey", "products", "ProductKey"),
+    ForeignKey("TerritoryKey", "territories", "TerritoryKey"),
+    LineTotal(),
+]
+
+
+def validate(
+    df: pd.DataFrame, lookups: dict[str, pd.DataFrame] | None = None, rules=RULES
+) -> list[dict]:
+    table = Table(df, lookups)
+    report = []
+    for rule in rules:
+        start = time.perf_counter()
+        mask = rule.evaluate(table)
+        entry = {"rule": rule.name, "description": rule.description}
+        if mask is None:
+            entry.update(status="skipped", violations=None, examples=[])
+        else:
+            rows = np.flatnonzero(mask)
+            entry.update(
+                status="ok" if len(rows) == 0 else "failed",
+                violations=int(len(rows)),
+                rate=round(len(rows) / max(len(table), 1), 6),
+                examples=[int(r) for r in rows[:EXAMPLES]],
+            )
+        entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        report.append(entry)
+    return report
+
+
+def summarize(report: list[dict]) -> dict:
+    return {
+        "passed": sum(r["status"] == "ok" for r in report),
+        "failed": [r["rule"] for r in report if r["status"] == "failed"],
+        "skipped": [r["rule"] for r in report if r["status"] == "skipped"],
+    }
+
+
+def load_table(path: str, table: str | None = None) -> pd.DataFrame:
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        with sqlite3.connect(path) as conn:
+            if table is None:
+                table = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+            return pd.read_sql(f'SELECT * FROM "{table}"', conn)
+    return pd.read_csv(path, low_memory=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valide une table intégrée (CSV ou SQLite)")
+    parser.add_argument("path", help="CSV ou base SQLite produite")
+    parser.add_argument("--table", help="Table SQLite (par défaut la première)")
+    parser.add_argument("--data-dir", default=etl.DATA_DIR)
+    parser.add_argument("--json", action="store_true", help="Rapport complet en JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_table(args.path, args.table)
+    loaded = time.perf_counter()
+    report = validate(df, etl.extract_lookups(args.data_dir))
+    elapsed = time.perf_counter() - loaded
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    for r in report:
+        count = "-" if r["violations"] is None else f"{r['violations']:,d}"
+        print(f"{r['status']:8s} {r['rule']:32s} {count:>10s}  {r['description']}")
+    print(
+        f"{len(df):,d} lignes, lecture {loaded - start:.2f}s, validation {elapsed:.2f}s "
+        f"({os.path.basename(args.path)})"
+    )
+
+
+if __name__ == "__main__":
+    main()